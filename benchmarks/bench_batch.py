@@ -0,0 +1,87 @@
+"""
+Пропускная способность пакетного исполнения заявок по числу шардов.
+
+Пользователи и курсы генерируются benchmarks.datagen во временном каталоге;
+один и тот же набор заявок исполняется с разным числом процессов-шардов,
+перед каждым прогоном портфели восстанавливаются из копии. Печатается
+время, заявок в секунду, ускорение относительно первого прогона и сверка
+агрегатов с портфелями.
+
+Запуск:
+    python -m benchmarks.bench_batch --users 10000 --orders 200000 --workers 1,2,4
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def make_orders(users: int, count: int, seed: int = 0):
+    """Покупки и продажи небольших сумм BTC/ETH случайными пользователями."""
+    rng = random.Random(seed)
+    return [
+        {
+            "action": rng.choice(("buy", "sell")),
+            "user_id": rng.randint(1, users),
+            "currency": rng.choice(("BTC", "ETH")),
+            "amount": 0.001,
+        }
+        for _ in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Пропускная способность пакетного исполнения")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Список чисел процессов")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(REPO_ROOT))
+    os.chdir(tempfile.mkdtemp(prefix="valutatrade-batch-"))
+    # Журнал действий по каждой заявке не входит в измерение
+    import logging
+    logging.getLogger("valutatrade").setLevel(logging.WARNING)
+
+    from benchmarks import datagen
+    import valutatrade_hub.constants as const
+    from valutatrade_hub.core.aggregates import platform_aggregates
+    from valutatrade_hub.core.executor import ShardedTradeExecutor
+
+    data_dir = Path("data")
+    datagen.generate_users(data_dir, args.users, seed=args.seed)
+    datagen.generate_rates(data_dir)
+    snapshot = data_dir / "portfolios.snapshot.json"
+    shutil.copyfile(const.PORTFOLIOS_FILE, snapshot)
+    orders = make_orders(args.users, args.orders, seed=args.seed)
+    print(f"Пользователей: {args.users:,}, заявок: {len(orders):,}")
+
+    baseline = None
+    for workers in (int(value) for value in args.workers.split(",")):
+        shutil.copyfile(snapshot, const.PORTFOLIOS_FILE)
+        const.TRADES_FILE.unlink(missing_ok=True)
+
+        started = time.perf_counter()
+        with ShardedTradeExecutor(workers) as executor:
+            results = executor.execute_many(orders)
+        elapsed = time.perf_counter() - started
+
+        baseline = baseline or elapsed
+        ok = sum(1 for r in results if r.get("success"))
+        check = "ок" if platform_aggregates.verify()["ok"] else "РАСХОЖДЕНИЕ"
+        print(
+            f"процессов: {workers:>2}  {elapsed:6.2f} с  {len(orders) / elapsed:9.0f} заявок/с  "
+            f"ускорение: {baseline / elapsed:4.2f}x  исполнено: {ok:,}  агрегаты: {check}"
+        )
+
+
+if __name__ == "__main__":
+    main()
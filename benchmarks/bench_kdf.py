@@ -0,0 +1,52 @@
+"""
+Бенчмарк функций хеширования паролей и входа по токену.
+
+Показывает цену одного хеширования для каждой KDF и пропускную способность
+входа по паролю и по токену сессии, чтобы выбрать параметры KDF
+(password_kdf, password_kdf_iterations, password_scrypt_n в config.json).
+
+Запуск:
+    python -m benchmarks.bench_kdf
+"""
+
+import secrets
+import time
+from typing import Callable
+from valutatrade_hub.core.models import hash_password, verify_password_hash
+from valutatrade_hub.core.sessions import SessionStore
+
+
+def _rate(func: Callable[[], object], min_seconds: float = 0.5) -> float:
+    """Число вызовов func в секунду."""
+    count = 0
+    started = time.perf_counter()
+    while True:
+        func()
+        count += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return count / elapsed
+
+
+def main() -> None:
+    salt = secrets.token_hex(16)
+    password = "correct horse battery staple"
+
+    print("Хеширование пароля (один вызов = одна регистрация/вход):")
+    for kdf in ("sha256", "pbkdf2_sha256", "scrypt"):
+        stored = hash_password(password, salt, kdf=kdf)
+        per_second = _rate(lambda: verify_password_hash(password, salt, stored))
+        print(f"   {kdf:<14} {1000 / per_second:8.3f} мс   {per_second:10.0f} входов/с")
+
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(Path(tmp) / "sessions.json", ttl_seconds=3600)
+        token = store.issue(1, "bench")
+        per_second = _rate(lambda: store.validate(token))
+        print(f"\nПроверка токена сессии: {1e6 / per_second:.2f} мкс   {per_second:,.0f} проверок/с")
+
+
+if __name__ == "__main__":
+    main()
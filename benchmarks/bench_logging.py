@@ -0,0 +1,68 @@
+"""
+Бенчмарк накладных расходов логирования на сделку.
+
+Сравнивает обёртку log_action вокруг пустой «сделки» при:
+- синхронной записи через RotatingFileHandler (как было раньше);
+- записи через очередь и фоновый поток (setup_logging);
+- выключенном уровне INFO.
+
+Запуск:
+    python -m benchmarks.bench_logging
+"""
+
+import logging
+import logging.handlers
+import tempfile
+import time
+from pathlib import Path
+from valutatrade_hub.decorators import log_action
+
+N = 20_000
+
+
+@log_action(action="BUY", verbose=True)
+def _fake_trade(user_id: int, currency_code: str, amount: float):
+    return {"success": True, "message": "ok", "rate": 59337.21, "base": "USD", "currency_code": currency_code}
+
+
+def _measure() -> float:
+    """Среднее время вызова в микросекундах."""
+    started = time.perf_counter()
+    for i in range(N):
+        _fake_trade(1, "BTC", 0.01)
+    return (time.perf_counter() - started) / N * 1e6
+
+
+def main() -> None:
+    logger = logging.getLogger("valutatrade")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 1. Синхронная запись в файл
+        sync_handler = logging.handlers.RotatingFileHandler(Path(tmp) / "sync.log", encoding="utf-8")
+        sync_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        logger.handlers = [sync_handler]
+        sync_us = _measure()
+        sync_handler.close()
+
+        # 2. Очередь + фоновый поток
+        from valutatrade_hub import logging_config
+
+        logger.handlers = []
+        logging_config.stop_logging()
+        logging_config.setup_logging()
+        queued_us = _measure()
+        logging_config.stop_logging()
+
+        # 3. Уровень выключен
+        logger.setLevel(logging.WARNING)
+        disabled_us = _measure()
+
+    print(f"Синхронный RotatingFileHandler: {sync_us:7.2f} мкс/сделка")
+    print(f"Очередь + QueueListener:        {queued_us:7.2f} мкс/сделка")
+    print(f"INFO выключен:                  {disabled_us:7.2f} мкс/сделка")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Бенчмарк обновления курсов против локального stub-сервера.
+
+Сервер запускается в этом же процессе с заданной вселенной монет и
+параметрами сбоев; RatesUpdater опрашивает его N раз. Печатается доля
+успешных обновлений, задержка обновления и ошибки по клиентам — без
+доступа к сети и детерминированно (--seed).
+
+Запуск:
+    python -m benchmarks.bench_refresh --coins 2000 --runs 20 \\
+        --latency-ms 50 --latency-dist exponential --error-rate 0.05 \\
+        --rate-limit-rate 0.05 --timeout 0.5
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк обновления курсов (stub-сервер)")
+    parser.add_argument("--coins", type=int, default=100, help="Размер вселенной монет")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "exponential"], default="fixed")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--slow-body-ms", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=2.0, help="Таймаут запроса клиента, с")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Данные пишутся во временный каталог
+    sys.path.insert(0, str(REPO_ROOT))
+    os.chdir(tempfile.mkdtemp(prefix="valutatrade-refresh-"))
+    os.environ.setdefault("EXCHANGERATE_API_KEY", "benchmark")
+    # Ошибки клиентов подсчитываются ниже, в консоль их не выводим
+    logging.getLogger("valutatrade.parser").setLevel(logging.CRITICAL)
+
+    from valutatrade_hub.core.exceptions import ApiRequestError
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.storage import RatesStorage
+    from valutatrade_hub.parser_service.stub_server import StubOptions, StubServer
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    options = StubOptions(
+        coins=args.coins, latency_ms=args.latency_ms, latency_dist=args.latency_dist,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        slow_body_ms=args.slow_body_ms, seed=args.seed,
+    )
+    with StubServer(options) as server:
+        coin_ids = list(server.provider.coins)
+        config = ParserConfig(
+            COINGECKO_URL=server.coingecko_url,
+            EXCHANGERATE_API_URL=server.exchangerate_url,
+            REQUEST_TIMEOUT=args.timeout,
+            CRYPTO_CURRENCIES=tuple(coin_id.upper() for coin_id in coin_ids),
+            CRYPTO_ID_MAP={coin_id.upper(): coin_id for coin_id in coin_ids},
+        )
+        updater = RatesUpdater(config, RatesStorage(config))
+
+        durations, rates_counts = [], []
+        client_errors: Counter = Counter()
+        failed = 0
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            try:
+                result = updater.run_update()
+                rates_counts.append(result["rates_count"])
+                for error in result.get("errors") or []:
+                    client_errors[error.split(":", 1)[0]] += 1
+            except ApiRequestError:
+                failed += 1
+            durations.append((time.perf_counter() - started) * 1000)
+        requests_served = server.provider.requests
+
+    durations.sort()
+    print(f"Монет: {len(coin_ids)}, обновлений: {args.runs}, запросов к серверу: {requests_served}")
+    print(f"Полностью неудачных обновлений: {failed}")
+    print(f"Обновление: p50 {durations[len(durations) // 2]:.1f} мс, "
+          f"p95 {durations[min(len(durations) - 1, int(len(durations) * 0.95))]:.1f} мс, "
+          f"max {durations[-1]:.1f} мс")
+    if rates_counts:
+        print(f"Курсов за обновление (с обратными): {sum(rates_counts) / len(rates_counts):.0f}")
+    for source, count in client_errors.most_common():
+        print(f"   {source}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Воспроизведение обновлений курсов на виртуальных часах.
+
+Строит синтетическую кассету (или берёт готовую / историю курсов) и
+проигрывает её через RateUpdateScheduler с VirtualClock: интервалы не
+ждутся, поэтому скорость ограничена только самим обновлением.
+
+Запуск:
+    python -m benchmarks.bench_replay --days 30 --interval-minutes 1
+    python -m benchmarks.bench_replay --cassette data/cassette.jsonl --days 7
+    python -m benchmarks.bench_replay --history data/history --interval-minutes 60
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def synthetic_frames(days: float, step_seconds: float, start: float, seed: int = 0):
+    """Кадры случайного блуждания курсов с шагом step_seconds."""
+    from benchmarks.datagen import BASE_RATES
+
+    rng = random.Random(seed)
+    rates = {f"{code}_USD": rate for code, rate in BASE_RATES.items()}
+    frames = []
+    for step in range(int(days * 86400 / step_seconds)):
+        rates = {pair: rate * (1 + rng.gauss(0, 0.001)) for pair, rate in rates.items()}
+        frames.append((start + step * step_seconds, dict(rates), None))
+    return frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Воспроизведение курсов на виртуальных часах")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--interval-minutes", type=float, default=1)
+    parser.add_argument("--cassette", type=str, default=None, help="Кассета JSONL (RecordingClient)")
+    parser.add_argument("--history", type=str, default=None,
+                        help="Каталог архива истории или exchange_rates.json как источник")
+    parser.add_argument("--keep-history", action="store_true",
+                        help="Писать историю в архив (иначе измеряется только обновление)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cassette = Path(args.cassette).resolve() if args.cassette else None
+    history = Path(args.history).resolve() if args.history else None
+
+    sys.path.insert(0, str(REPO_ROOT))
+    os.chdir(tempfile.mkdtemp(prefix="valutatrade-replay-"))
+    os.environ.setdefault("EXCHANGERATE_API_KEY", "benchmark")
+    logging.getLogger("valutatrade.parser").setLevel(logging.WARNING)
+
+    from valutatrade_hub.infra.clock import VirtualClock
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.replay import ReplayClient
+    from valutatrade_hub.parser_service.scheduler import RateUpdateScheduler
+    from valutatrade_hub.parser_service.storage import RatesStorage
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    clock = VirtualClock(start=0)
+    if cassette:
+        client = ReplayClient.from_cassette(cassette, clock=clock)
+    elif history:
+        client = ReplayClient.from_history(history, clock=clock)
+    else:
+        client = ReplayClient(
+            synthetic_frames(args.days, args.interval_minutes * 60, start=1_700_000_000, seed=args.seed),
+            clock=clock,
+        )
+    # Время воспроизведения совпадает со временем записи
+    clock.advance(client.start_at)
+    client.rewind()
+    end_time = min(client.start_at + args.days * 86400, client.frames[-1][0] + 1)
+
+    config = ParserConfig()
+    storage = RatesStorage(config)
+    if not args.keep_history:
+        # Без записи истории измеряется только цикл обновления
+        storage.save_to_history = lambda rates, timestamp: None
+    updater = RatesUpdater(config, storage, clock=clock)
+    updater.clients = {"replay": client}
+    scheduler = RateUpdateScheduler(config, interval_minutes=args.interval_minutes,
+                                    profile=False, clock=clock, updater=updater)
+
+    started = time.perf_counter()
+    scheduler.run_until(end_time)
+    elapsed = time.perf_counter() - started
+
+    from valutatrade_hub.infra.metrics import registry
+    runs = registry.snapshot()["counters"].get("updater.runs", 0)
+    simulated_days = (clock.time() - client.start_at) / 86400
+    print(f"Кадров: {len(client.frames)}, обновлений: {runs:g}, виртуальное время: {simulated_days:.1f} дн.")
+    print(f"Реальное время: {elapsed:.2f} с ({runs / elapsed if elapsed else 0:.0f} обновлений/с)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Масштабирование перебора параметров бэктеста по числу процессов.
+
+Минутные синтетические курсы за --days дней передаются рабочим через
+shared memory; один и тот же набор прогонов выполняется с разным числом
+процессов, печатается время и ускорение относительно одного процесса.
+
+Запуск:
+    python -m benchmarks.bench_sweep --days 90 --workers 1,2,4,8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from array import array
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Масштабирование перебора параметров бэктеста")
+    parser.add_argument("--days", type=float, default=90)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Список чисел процессов")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(REPO_ROOT))
+    os.chdir(tempfile.mkdtemp(prefix="valutatrade-sweep-"))
+
+    from benchmarks.bench_backtest import synthetic_prices
+    from valutatrade_hub.core import backtest, sweep
+
+    count = int(args.days * 1440)
+    grid = array("d", (1_700_000_000 + i * 60.0 for i in range(count)))
+    prices = synthetic_prices(["BTC", "ETH"], count, seed=args.seed)
+    strategies = [
+        backtest.MomentumStrategy(code, lookback, fraction)
+        for code in ("BTC", "ETH")
+        for lookback in (60, 240, 720, 1440)
+        for fraction in (0.25, 0.5, 1.0)
+    ]
+    print(f"Точек сетки: {count:,}, прогонов: {len(strategies)}")
+
+    baseline = None
+    reference = None
+    for workers in (int(value) for value in args.workers.split(",")):
+        started = time.perf_counter()
+        summaries = sweep.run_sweep(strategies, grid, prices, 10_000.0, workers=workers)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        reference = reference or summaries
+        same = "да" if summaries == reference else "НЕТ"
+        print(f"процессов: {workers:>2}  {elapsed:6.2f} с  ускорение: {baseline / elapsed:4.2f}x  совпадает: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Генератор синтетических данных для бенчмарков.
+
+Создаёт в каталоге data/ текущей директории:
+- users.json и portfolios.json на N пользователей (у всех один пароль,
+  хеш вычисляется один раз — иначе генерация 1M пользователей заняла бы часы);
+- rates.json с текущими курсами;
+- exchange_rates.json с историей курсов за заданное число дней.
+
+Запуск:
+    python -m benchmarks.datagen --users 100000 --history-days 365 --dir /tmp/vt-bench
+"""
+
+import argparse
+import json
+import os
+import random
+import secrets
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict
+
+PASSWORD = "bench-pass"
+
+# Базовые курсы к USD
+BASE_RATES: Dict[str, float] = {
+    "BTC": 60000.0,
+    "ETH": 3000.0,
+    "SOL": 150.0,
+    "EUR": 1.08,
+    "GBP": 1.27,
+    "RUB": 0.011,
+}
+
+
+def _write_json(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def generate_users(data_dir: Path, count: int, seed: int = 0) -> None:
+    """Пользователи и портфели: USD, BTC и ещё одна случайная валюта."""
+    from valutatrade_hub.core.models import hash_password
+
+    rng = random.Random(seed)
+    salt = secrets.token_hex(16)
+    hashed = hash_password(PASSWORD, salt)
+    registered = datetime.now().isoformat()
+
+    users, portfolios = [], []
+    for user_id in range(1, count + 1):
+        users.append({
+            "user_id": user_id,
+            "username": f"user{user_id}",
+            "hashed_password": hashed,
+            "salt": salt,
+            "registration_date": registered,
+        })
+        wallets = {
+            "USD": {"balance": round(rng.uniform(1_000, 100_000), 2)},
+            "BTC": {"balance": round(rng.uniform(0.01, 1), 6)},
+        }
+        code = rng.choice(["ETH", "SOL", "EUR"])
+        wallets[code] = {"balance": round(rng.uniform(0.01, 10), 6)}
+        portfolios.append({"user_id": user_id, "wallets": wallets, "version": 1})
+
+    _write_json(data_dir / "users.json", {"users": users})
+    _write_json(data_dir / "portfolios.json", {"portfolios": portfolios})
+
+
+def current_pairs(timestamp: str) -> Dict[str, dict]:
+    """Текущие курсы (прямые и обратные пары) в формате rates.json."""
+    pairs = {}
+    for code, rate in BASE_RATES.items():
+        pairs[f"{code}_USD"] = {"rate": rate, "updated_at": timestamp, "source": "benchmark"}
+        pairs[f"USD_{code}"] = {"rate": 1 / rate, "updated_at": timestamp, "source": "benchmark"}
+    return pairs
+
+
+def generate_rates(data_dir: Path) -> None:
+    """rates.json с текущими курсами."""
+    timestamp = datetime.now(timezone.utc).isoformat()
+    _write_json(data_dir / "rates.json", {"pairs": current_pairs(timestamp), "last_refresh": timestamp})
+
+
+def generate_history(data_dir: Path, records: int, step_minutes: int = 60, seed: int = 0) -> None:
+    """
+    История курсов: records записей, по одной на валюту за шаг времени.
+
+    Курсы — случайное блуждание от BASE_RATES.
+    """
+    rng = random.Random(seed)
+    codes = list(BASE_RATES)
+    steps = max(1, records // len(codes))
+    start = datetime.now(timezone.utc) - timedelta(minutes=step_minutes * steps)
+    rates = dict(BASE_RATES)
+
+    history = []
+    for step in range(steps):
+        timestamp = (start + timedelta(minutes=step_minutes * step)).isoformat()
+        stamp = timestamp.replace(":", "-").replace("+", "-")
+        for code in codes:
+            rates[code] *= 1 + rng.gauss(0, 0.005)
+            history.append({
+                "id": f"{code}_USD_{stamp}",
+                "from_currency": code,
+                "to_currency": "USD",
+                "rate": rates[code],
+                "timestamp": timestamp,
+                "source": "benchmark",
+                "meta": {"record_id": secrets.token_hex(4), "status_code": 200},
+            })
+    _write_json(data_dir / "exchange_rates.json", history)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--history-records", type=int, default=None,
+                        help="Число записей истории (по умолчанию — из --history-days)")
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--dir", type=str, default=".", help="Рабочий каталог (данные пишутся в <dir>/data)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    Path(args.dir).mkdir(parents=True, exist_ok=True)
+    os.chdir(args.dir)
+    data_dir = Path("data")
+    records = args.history_records or args.history_days * 24 * len(BASE_RATES)
+    generate_users(data_dir, args.users, seed=args.seed)
+    generate_rates(data_dir)
+    generate_history(data_dir, records, seed=args.seed)
+    print(f"Сгенерировано: {args.users} пользователей, {records} записей истории в {Path.cwd() / data_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Генератор нагрузки: N одновременных трейдеров против слоя use case'ов.
+
+Каждый трейдер входит в систему и до конца теста выполняет операции по
+заданной смеси (login/buy/sell/show/rate) с паузой между ними. Трейдеры
+запускаются постепенно (ramp-up). Режимы:
+- threads   — трейдеры-потоки в одном процессе;
+- processes — трейдеры-процессы (каждый со своим GIL);
+- executor  — трейдеры-потоки, сделки идут через ShardedTradeExecutor
+  (как команда batch).
+
+В конце печатаются пропускная способность, перцентили задержки и доля
+ошибок по операциям, а балансы BTC сверяются с суммой успешных сделок:
+расхождение означает потерянное обновление.
+
+Запуск (данные генерируются во временном каталоге):
+    python -m benchmarks.loadgen --traders 16 --duration 30 --ramp-up 5 \\
+        --mix buy=40,sell=30,show=20,rate=8,login=2 --think-ms 50 --shared-users 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+from benchmarks import datagen
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+OPERATIONS = ("login", "buy", "sell", "show", "rate")
+AMOUNT = 0.0001  # BTC за сделку
+
+# Запись об операции: (операция, задержка в секундах, успех)
+Sample = Tuple[str, float, bool]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'buy=40,sell=30' -> {'buy': 40.0, 'sell': 30.0}."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Неизвестная операция '{name}', допустимы: {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _trader(task: dict) -> Tuple[List[Sample], Dict[int, float]]:
+    """
+    Цикл одного трейдера.
+
+    Возвращает замеры и ожидаемое изменение баланса BTC по пользователям.
+    """
+    from valutatrade_hub.core import usecases
+
+    rng = random.Random(task["seed"])
+    user_id = task["user_id"]
+    username = f"user{user_id}"
+    names, weights = zip(*task["mix"].items())
+    executor = task.get("executor")
+
+    time.sleep(task["start_delay"])
+    deadline = task["deadline"]
+    samples: List[Sample] = []
+    btc_delta: Dict[int, float] = defaultdict(float)
+
+    usecases.login_user(username, datagen.PASSWORD)
+    while time.time() < deadline:
+        op = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            if op == "login":
+                result = usecases.login_user(username, datagen.PASSWORD)
+            elif op in ("buy", "sell"):
+                order = {"action": op, "user_id": user_id, "currency": "BTC", "amount": AMOUNT}
+                if executor is not None:
+                    result = executor.submit(order).result()
+                elif op == "buy":
+                    result = usecases.buy_currency(user_id, "BTC", AMOUNT)
+                else:
+                    result = usecases.sell_currency(user_id, "BTC", AMOUNT)
+                if result.get("success"):
+                    btc_delta[user_id] += AMOUNT if op == "buy" else -AMOUNT
+            elif op == "show":
+                result = usecases.show_portfolio(user_id)
+            else:
+                result = usecases.get_rate("BTC", "USD")
+            ok = bool(result.get("success"))
+        except Exception:
+            ok = False
+        samples.append((op, time.perf_counter() - started, ok))
+
+        if task["think_ms"]:
+            time.sleep(rng.expovariate(1000 / task["think_ms"]))
+    return samples, dict(btc_delta)
+
+
+def _btc_balances() -> Dict[int, float]:
+    from valutatrade_hub.core.usecases import load_json
+    import valutatrade_hub.constants as const
+
+    data = load_json(const.PORTFOLIOS_FILE)
+    return {
+        p["user_id"]: p["wallets"].get("BTC", {}).get("balance", 0.0)
+        for p in data.get("portfolios", [])
+    }
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def report(samples: List[Sample], elapsed: float) -> None:
+    """Печатает пропускную способность и перцентили по операциям."""
+    by_op: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_op[sample[0]].append(sample)
+
+    total_errors = sum(1 for _op, _lat, ok in samples if not ok)
+    print(f"\nОпераций: {len(samples)} за {elapsed:.1f} с — {len(samples) / elapsed:.1f} оп/с, "
+          f"ошибок {total_errors} ({total_errors / max(1, len(samples)):.1%})")
+    print(f"{'Операция':<8} {'кол-во':>8} {'оп/с':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'ошибки':>8}")
+    for op in OPERATIONS:
+        items = by_op.get(op)
+        if not items:
+            continue
+        latencies = sorted(lat * 1000 for _op, lat, _ok in items)
+        errors = sum(1 for _op, _lat, ok in items if not ok)
+        print(f"{op:<8} {len(items):>8} {len(items) / elapsed:>8.1f} "
+              f"{_percentile(latencies, 0.50):>9.2f} {_percentile(latencies, 0.95):>9.2f} "
+              f"{_percentile(latencies, 0.99):>9.2f} {errors / len(items):>8.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест ValutaTrade Hub")
+    parser.add_argument("--traders", type=int, default=8)
+    parser.add_argument("--mode", choices=["threads", "processes", "executor"], default="threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность, с")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Время запуска всех трейдеров, с")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Средняя пауза между операциями, мс")
+    parser.add_argument("--mix", type=str, default="buy=40,sell=30,show=20,rate=8,login=2")
+    parser.add_argument("--shared-users", type=int, default=0,
+                        help="Число общих пользователей (0 — у каждого трейдера свой)")
+    parser.add_argument("--users", type=int, default=1000, help="Пользователей в сгенерированных данных")
+    parser.add_argument("--workdir", type=str, default=None, help="Каталог для данных (по умолчанию временный)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    user_pool = args.shared_users or args.traders
+    if user_pool > args.users:
+        parser.error("--users должно быть не меньше числа трейдеров/общих пользователей")
+
+    # Данные — во временном каталоге, пакет импортируется из репозитория
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="valutatrade-load-")).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    sys.path.insert(0, str(REPO_ROOT))
+    os.chdir(workdir)
+    os.environ.setdefault("EXCHANGERATE_API_KEY", "benchmark")
+    data_dir = Path("data")
+    datagen.generate_users(data_dir, args.users, seed=args.seed)
+    datagen.generate_rates(data_dir)
+    datagen.generate_history(data_dir, 1000, seed=args.seed)
+    print(f"Данные: {workdir / data_dir}; трейдеров {args.traders} ({args.mode}), пользователей {user_pool}")
+
+    before = _btc_balances()
+    deadline = time.time() + args.ramp_up + args.duration
+    tasks = [
+        {
+            "user_id": 1 + i % user_pool,
+            "mix": mix,
+            "seed": args.seed + i,
+            "think_ms": args.think_ms,
+            "start_delay": args.ramp_up * i / args.traders,
+            "deadline": deadline,
+        }
+        for i in range(args.traders)
+    ]
+
+    started = time.time()
+    executor = None
+    if args.mode == "processes":
+        with multiprocessing.Pool(args.traders) as pool:
+            outcomes = pool.map(_trader, tasks)
+    else:
+        if args.mode == "executor":
+            from valutatrade_hub.core.executor import ShardedTradeExecutor
+            executor = ShardedTradeExecutor()
+            for task in tasks:
+                task["executor"] = executor
+        try:
+            with ThreadPoolExecutor(max_workers=args.traders) as pool:
+                outcomes = list(pool.map(_trader, tasks))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    elapsed = time.time() - started
+
+    samples = [sample for trader_samples, _ in outcomes for sample in trader_samples]
+    report(samples, elapsed)
+
+    # Сверка балансов: итог = начало + сумма успешных сделок
+    expected: Dict[int, float] = defaultdict(float)
+    for _, deltas in outcomes:
+        for user_id, delta in deltas.items():
+            expected[user_id] += delta
+    after = _btc_balances()
+    lost = {
+        user_id: (before.get(user_id, 0.0) + delta, after.get(user_id, 0.0))
+        for user_id, delta in expected.items()
+        if abs(before.get(user_id, 0.0) + delta - after.get(user_id, 0.0)) > 1e-9
+    }
+    if lost:
+        print(f"\nПОТЕРЯННЫЕ ОБНОВЛЕНИЯ у {len(lost)} пользователей:")
+        for user_id, (want, got) in sorted(lost.items())[:10]:
+            print(f"   user {user_id}: ожидалось {want:.6f} BTC, фактически {got:.6f}")
+        sys.exit(1)
+    print(f"\nСверка балансов: OK ({len(expected)} пользователей, потерянных обновлений нет)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Многопроцессный стресс-тест блокировок.
+
+Несколько процессов одновременно покупают валюту: часть — для общего
+пользователя, часть — каждый для своего. В конце балансы сверяются
+с ожидаемыми; потерянное обновление даёт расхождение.
+
+Запуск из каталога с данными (rates.json должен содержать BTC_USD):
+    python -m benchmarks.stress_locks --processes 8 --trades 50
+"""
+
+import argparse
+import multiprocessing
+import time
+
+
+def _worker(args) -> int:
+    user_ids, trades, amount = args
+    from valutatrade_hub.core.usecases import buy_currency
+
+    done = 0
+    for _ in range(trades):
+        for user_id in user_ids:
+            result = buy_currency(user_id=user_id, currency_code="BTC", amount=amount)
+            if result["success"]:
+                done += 1
+    return done
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Стресс-тест параллельных сделок")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--trades", type=int, default=50)
+    parser.add_argument("--amount", type=float, default=0.0001)
+    args = parser.parse_args()
+
+    from valutatrade_hub.core.usecases import register_user, login_user, load_json
+    import valutatrade_hub.constants as const
+
+    def ensure_user(name: str) -> int:
+        register_user(username=name, password="stress-pass")
+        return login_user(username=name, password="stress-pass")["user_id"]
+
+    shared = ensure_user("stress_shared")
+    own = [ensure_user(f"stress_{i}") for i in range(args.processes)]
+
+    def balances():
+        data = load_json(const.PORTFOLIOS_FILE)
+        return {
+            p["user_id"]: p["wallets"].get("BTC", {}).get("balance", 0.0)
+            for p in data.get("portfolios", [])
+        }
+
+    before = balances()
+    tasks = [([shared, own[i]], args.trades, args.amount) for i in range(args.processes)]
+
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        done = sum(pool.map(_worker, tasks))
+    elapsed = time.perf_counter() - started
+
+    after = balances()
+    expected_shared = before.get(shared, 0.0) + args.processes * args.trades * args.amount
+    lost = round((expected_shared - after[shared]) / args.amount)
+    for user_id in own:
+        lost += round((before.get(user_id, 0.0) + args.trades * args.amount - after[user_id]) / args.amount)
+
+    print(f"Сделок: {done} за {elapsed:.2f} с ({done / elapsed:.0f} сделок/с)")
+    print(f"Потерянных обновлений: {lost}")
+    if lost:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
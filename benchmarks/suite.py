@@ -0,0 +1,224 @@
+"""
+Набор бенчмарков use case'ов и хранилища курсов.
+
+Данные генерируются в отдельном рабочем каталоге (benchmarks.datagen) для
+выбранного масштаба: 1k/100k/1m — число пользователей и записей истории.
+Результат — JSON с версией схемы, коммитом и временем каждой операции
+(p50/p95/среднее в мс); его можно сохранить как базовую линию и сравнить
+с новым прогоном.
+
+Запуск:
+    python -m benchmarks.suite run --scale 1k --output benchmarks/results/1k.json
+    python -m benchmarks.suite compare base.json new.json --threshold 0.2
+
+compare завершается с кодом 1, если p50 какой-либо операции вырос больше
+чем на threshold (доля).
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+from benchmarks import datagen
+
+SCHEMA_VERSION = 1
+
+# Масштаб -> число пользователей и записей истории
+SCALES: Dict[str, int] = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(func: Callable[[int], object], min_runs: int = 3, max_runs: int = 200,
+            budget_seconds: float = 2.0) -> Dict[str, float]:
+    """
+    Вызывает func(i) до max_runs раз или пока не исчерпан бюджет времени.
+
+    Возвращает статистику одного вызова в миллисекундах.
+    """
+    samples: List[float] = []
+    started = time.perf_counter()
+    for i in range(max_runs):
+        t0 = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - t0) * 1000)
+        if len(samples) >= min_runs and time.perf_counter() - started >= budget_seconds:
+            break
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(scale: str, workdir: Path, budget_seconds: float, seed: int = 0) -> Dict[str, dict]:
+    """Генерирует данные в workdir и измеряет все операции."""
+    size = SCALES[scale]
+    workdir.mkdir(parents=True, exist_ok=True)
+    # Пути данных в config.json относительные — работаем внутри workdir;
+    # пакет при этом должен импортироваться из репозитория
+    sys.path.insert(0, str(REPO_ROOT))
+    os.chdir(workdir)
+    os.environ.setdefault("EXCHANGERATE_API_KEY", "benchmark")
+    # Предупреждения о волатильности синтетических курсов не нужны в отчёте
+    logging.getLogger("valutatrade.parser").setLevel(logging.ERROR)
+
+    data_dir = Path("data")
+    print(f"Генерация данных ({scale}) в {workdir} ...")
+    datagen.generate_users(data_dir, size, seed=seed)
+    datagen.generate_rates(data_dir)
+    datagen.generate_history(data_dir, size, seed=seed)
+
+    from valutatrade_hub.core import usecases
+    from valutatrade_hub.parser_service.api_clients import BaseApiClient
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.storage import RatesStorage
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    class StubClient(BaseApiClient):
+        """Клиент без сети: возвращает фиксированные курсы."""
+
+        def __init__(self, rates: Dict[str, float]):
+            self.rates = rates
+
+        def fetch_rates(self) -> Dict[str, float]:
+            return dict(self.rates)
+
+    rng = random.Random(seed)
+    config = ParserConfig()
+    storage = RatesStorage(config)
+    updater = RatesUpdater(config, storage)
+    crypto = {f"{c}_USD": datagen.BASE_RATES[c] for c in ("BTC", "ETH", "SOL")}
+    fiat = {f"{c}_USD": datagen.BASE_RATES[c] for c in ("EUR", "GBP", "RUB")}
+    updater.clients = {"coingecko": StubClient(crypto), "exchangerate": StubClient(fiat)}
+
+    def random_user() -> int:
+        return rng.randint(1, size)
+
+    def timestamp() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    benchmarks: Dict[str, Callable[[int], object]] = {
+        "register_user": lambda i: usecases.register_user(f"bench_new_{i}", datagen.PASSWORD),
+        "login_user": lambda i: usecases.login_user(f"user{random_user()}", datagen.PASSWORD),
+        "buy_currency": lambda i: usecases.buy_currency(random_user(), "BTC", 0.0001),
+        "sell_currency": lambda i: usecases.sell_currency(random_user(), "BTC", 0.0001),
+        "show_portfolio": lambda i: usecases.show_portfolio(random_user()),
+        "get_rate": lambda i: usecases.get_rate("BTC", "USD"),
+        "run_update": lambda i: updater.run_update(),
+        "save_to_history": lambda i: storage.save_to_history(crypto, timestamp()),
+    }
+
+    results = {}
+    for name, func in benchmarks.items():
+        stats = measure(func, budget_seconds=budget_seconds)
+        results[name] = stats
+        print(f"   {name:<16} p50 {stats['p50_ms']:10.3f} мс   p95 {stats['p95_ms']:10.3f} мс   ({stats['runs']} вызовов)")
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta_ms: float = 0.05) -> List[str]:
+    """
+    Печатает сравнение p50 и возвращает список операций с регрессией.
+
+    Рост меньше min_delta_ms не считается регрессией: у операций в десятки
+    микросекунд относительный шум слишком велик.
+    """
+    if baseline.get("scale") != current.get("scale"):
+        print(f"Внимание: разный масштаб ({baseline.get('scale')} и {current.get('scale')})")
+    regressions = []
+    print(f"{'Операция':<16} {'было, мс':>12} {'стало, мс':>12} {'изменение':>10}")
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:<16} {'-':>12} {new['p50_ms']:12.3f} {'новая':>10}")
+            continue
+        change = new["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        mark = ""
+        if change > threshold and new["p50_ms"] - old["p50_ms"] > min_delta_ms:
+            regressions.append(name)
+            mark = "  РЕГРЕССИЯ"
+        print(f"{name:<16} {old['p50_ms']:12.3f} {new['p50_ms']:12.3f} {change:+10.1%}{mark}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарки ValutaTrade Hub")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Выполнить бенчмарки")
+    run_parser.add_argument("--scale", choices=list(SCALES), default="1k")
+    run_parser.add_argument("--output", type=str, default=None,
+                            help="Файл результата (по умолчанию benchmarks/results/<scale>-<commit>.json)")
+    run_parser.add_argument("--workdir", type=str, default=None,
+                            help="Каталог для данных (по умолчанию временный)")
+    run_parser.add_argument("--budget", type=float, default=2.0, help="Секунд на одну операцию")
+    run_parser.add_argument("--seed", type=int, default=0)
+
+    compare_parser = commands.add_parser("compare", help="Сравнить с базовой линией")
+    compare_parser.add_argument("baseline", type=str)
+    compare_parser.add_argument("current", type=str)
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="Допустимый рост p50 (доля, 0.2 = 20%%)")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                                help="Минимальный абсолютный рост p50 для регрессии")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, "r", encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\nРегрессии: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nРегрессий нет")
+        return
+
+    commit = _git_commit()
+    output = Path(args.output or REPO_ROOT / "benchmarks" / "results" / f"{args.scale}-{commit}.json").resolve()
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="valutatrade-bench-")).resolve()
+
+    results = run_suite(args.scale, workdir, args.budget, seed=args.seed)
+    report = {
+        "schema_version": SCHEMA_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scale": args.scale,
+        "results": results,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультат сохранён: {output}")
+
+
+if __name__ == "__main__":
+    main()
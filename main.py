@@ -2,7 +2,12 @@
 Точка входа в приложение ValutaTrade Hub.
 """
 
+import atexit
+import valutatrade_hub.constants as const
 from valutatrade_hub.cli.interface import run_cli
+from valutatrade_hub.infra.metrics import MetricsExporter
+from valutatrade_hub.infra.prometheus import MetricsServer
+from valutatrade_hub.infra.tracing import tracer
 from valutatrade_hub.infra.settings import SettingsLoader
 from valutatrade_hub.logging_config import setup_logging
 from valutatrade_hub.parser_service.scheduler import RateUpdateScheduler
@@ -13,12 +18,16 @@ from valutatrade_hub.parser_service.updater import RatesUpdater
 
 def main():
     # Загружаем настройки
-    SettingsLoader()
+    settings = SettingsLoader()
 
     # Настраиваем логирование
     logger = setup_logging()
     logger.info("\nЗапуск ValutaTrade Hub CLI")
 
+    # Трассировка с самого запуска (иначе включается командой trace on)
+    if settings.get("tracing_enabled", False):
+        tracer.enable()
+
     # Обновляем курсы при запуске
     try:
         print("\nОбновление курсов ...")
@@ -51,6 +60,26 @@ def main():
     except Exception as e:
         print(f"Не удалось запустить планировщик: {e}")
 
+    # Периодический экспорт метрик
+    exporter = MetricsExporter(
+        const.METRICS_FILE,
+        interval_seconds=settings.get("metrics_export_interval_seconds", 60),
+    )
+    exporter.start()
+    atexit.register(exporter.stop)
+
+    # HTTP-эндпоинт для Prometheus (по умолчанию выключен)
+    if settings.get("metrics_http_enabled", False):
+        try:
+            server = MetricsServer(
+                host=settings.get("metrics_http_host", "127.0.0.1"),
+                port=settings.get("metrics_http_port", 9108),
+            )
+            server.start()
+            print(f"\nМетрики Prometheus: http://{server.host}:{server.port}/metrics")
+        except OSError as e:
+            print(f"Не удалось запустить сервер метрик: {e}")
+
     # Запускаем CLI
     run_cli()
 
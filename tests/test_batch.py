@@ -0,0 +1,52 @@
+"""Пакетное исполнение заявок: владелец заявок и неподтверждённое сохранение."""
+
+import json
+
+import pytest
+
+
+@pytest.fixture
+def trading(tmp_path, monkeypatch):
+    """Пустой каталог данных с двумя пользователями и курсом BTC→USD."""
+    monkeypatch.chdir(tmp_path)
+    from valutatrade_hub.core import usecases
+
+    (tmp_path / "data").mkdir(exist_ok=True)
+    (tmp_path / "data" / "rates.json").write_text(
+        json.dumps({"pairs": {"BTC_USD": {"rate": 60000.0, "updated_at": "2026-01-01T00:00:00Z"}}}),
+        encoding="utf-8",
+    )
+    assert usecases.register_user("alice", "secret1")["success"]
+    assert usecases.register_user("bob", "secret2")["success"]
+    return usecases
+
+
+def write_orders(path, user_ids):
+    path.write_text(
+        "\n".join(
+            json.dumps({"action": "buy", "user_id": user_id, "currency": "BTC", "amount": 0.01})
+            for user_id in user_ids
+        ),
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_orders_of_other_users_are_rejected(trading, tmp_path):
+    file_path = write_orders(tmp_path / "orders.jsonl", [1, 2, 1])
+
+    result = trading.execute_batch(file_path, user_id=1, workers=1)
+
+    assert [r["success"] for r in result["results"]] == [True, False, True]
+
+
+def test_failed_save_reports_unconfirmed_lines(trading, tmp_path):
+    file_path = write_orders(tmp_path / "orders.jsonl", [1, 1])
+    # Временный файл атомарной записи занят каталогом: сохранение портфелей падает
+    (tmp_path / "data" / "portfolios.tmp").mkdir()
+
+    result = trading.execute_batch(file_path, user_id=1, workers=1)
+
+    assert not result["success"]
+    assert all(r.get("unconfirmed") for r in result["results"])
+    assert "Сохранение не подтверждено: 1-2" in result["message"]
@@ -0,0 +1,55 @@
+"""Котировки (RFQ): одноразовое использование и владелец."""
+
+import json
+
+import pytest
+
+
+@pytest.fixture
+def trading(tmp_path, monkeypatch):
+    """Пустой каталог данных с одним пользователем и курсом BTC→USD."""
+    monkeypatch.chdir(tmp_path)
+    from valutatrade_hub.core import usecases
+
+    (tmp_path / "data").mkdir(exist_ok=True)
+    (tmp_path / "data" / "rates.json").write_text(
+        json.dumps({"pairs": {"BTC_USD": {"rate": 60000.0, "updated_at": "2026-01-01T00:00:00Z"}}}),
+        encoding="utf-8",
+    )
+    assert usecases.register_user("alice", "secret1")["success"]
+    return usecases
+
+
+def test_second_buy_with_same_quote_is_rejected(trading):
+    quote = trading.request_quote("BTC", user_id=1)
+
+    first = trading.buy_currency(1, "BTC", 0.01, quote_id=quote["quote_id"])
+    second = trading.buy_currency(1, "BTC", 0.01, quote_id=quote["quote_id"])
+
+    assert first["success"]
+    assert not second["success"]
+    assert quote["quote_id"] in second["message"]
+
+
+def test_quote_is_not_consumed_by_failed_trade(trading):
+    quote = trading.request_quote("BTC", user_id=1)
+
+    failed = trading.buy_currency(1, "BTC", 1000.0, quote_id=quote["quote_id"])
+    retried = trading.buy_currency(1, "BTC", 0.01, quote_id=quote["quote_id"])
+
+    assert not failed["success"]
+    assert retried["success"]
+
+
+def test_quote_of_another_user_is_rejected(trading):
+    quote = trading.request_quote("BTC", user_id=2)
+
+    result = trading.buy_currency(1, "BTC", 0.01, quote_id=quote["quote_id"])
+
+    assert not result["success"]
+
+
+def test_quote_id_has_64_bits(trading):
+    quote = trading.request_quote("BTC", user_id=1)
+
+    assert len(quote["quote_id"]) == 16
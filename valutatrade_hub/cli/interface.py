@@ -4,14 +4,34 @@
 
 import argparse # Для парсинга команд
 import logging # Для логирования
+import math # Для проверки NaN
+from prettytable import PrettyTable # Таблицы в консоли
 from valutatrade_hub.core.usecases import ( # Команды CLI
     register_user,
+    import_users,
     login_user,
+    resume_session,
+    logout_user,
     show_portfolio,
+    show_portfolio_history,
+    show_leaderboard,
+    show_exposure,
     buy_currency,
     sell_currency,
+    request_quote,
+    execute_batch,
     get_rate,
+    get_rate_at,
+    get_rates_at,
+    show_rate_history,
+    get_rate_stats,
+    run_backtest,
+    run_sweep,
 )
+from valutatrade_hub.core.cache import valuation_cache # Кеш оценок портфелей
+from valutatrade_hub.infra import metrics # Метрики задержек
+from valutatrade_hub.infra.profiling import CommandProfiler # Профилирование команд
+from valutatrade_hub.infra.tracing import tracer # Трассировка команд
 from valutatrade_hub.parser_service.config import ParserConfig # Импорт классов для сервиса парсинга
 from valutatrade_hub.parser_service.updater import RatesUpdater # Импорт классов для сервиса парсинга
 from valutatrade_hub.parser_service.storage import RatesStorage # Импорт классов для сервиса парсинга
@@ -30,29 +50,97 @@ def parse_command_line(line: str) -> argparse.Namespace:
     register_parser.add_argument("--username", required=True, help="Имя пользователя")
     register_parser.add_argument("--password", required=True, help="Пароль")
 
+    # import-users
+    import_parser = subparsers.add_parser("import-users", help="Массовый импорт пользователей из CSV")
+    import_parser.add_argument("--file", required=True, help="CSV с колонками username,password")
+    import_parser.add_argument("--workers", type=int, help="Число процессов для хеширования")
+
     # login
     login_parser = subparsers.add_parser("login", help="Войти в систему")
-    login_parser.add_argument("--username", required=True, help="Имя пользователя")
-    login_parser.add_argument("--password", required=True, help="Пароль")
+    login_parser.add_argument("--username", help="Имя пользователя")
+    login_parser.add_argument("--password", help="Пароль")
+    login_parser.add_argument("--token", help="Токен сессии (вместо имени и пароля)")
 
     # show-portfolio
     portfolio_parser = subparsers.add_parser("show-portfolio", help="Показать портфель")
     portfolio_parser.add_argument("--base", default="USD", help="Базовая валюта (по умолчанию USD)")
+    portfolio_parser.add_argument("--history", help="Период истории стоимости (например, 30d)")
+    portfolio_parser.add_argument("--step", default="1h", help="Шаг истории (по умолчанию 1h)")
 
     # buy
     buy_parser = subparsers.add_parser("buy", help="Купить валюту")
-    buy_parser.add_argument("--currency", required=True, help="Код валюты")
+    buy_parser.add_argument("--currency", help="Код валюты (можно не указывать при --quote)")
     buy_parser.add_argument("--amount", type=float, required=True, help="Количество валюты")
+    buy_parser.add_argument("--quote", help="ID котировки, полученной командой quote")
+    buy_parser.add_argument("--client-order-id", help="Ключ идемпотентности заявки")
 
     # sell
     sell_parser = subparsers.add_parser("sell", help="Продать валюту")
-    sell_parser.add_argument("--currency", required=True, help="Код валюты")
+    sell_parser.add_argument("--currency", help="Код валюты (можно не указывать при --quote)")
     sell_parser.add_argument("--amount", type=float, required=True, help="Количество валюты")
+    sell_parser.add_argument("--quote", help="ID котировки, полученной командой quote")
+    sell_parser.add_argument("--client-order-id", help="Ключ идемпотентности заявки")
+
+    # quote
+    quote_parser = subparsers.add_parser("quote", help="Зафиксировать курс валюты для сделки")
+    quote_parser.add_argument("--currency", required=True, help="Код валюты")
+
+    # batch
+    batch_parser = subparsers.add_parser("batch", help="Исполнить заявки из файла JSON Lines (чужие портфели — только операторам)")
+    batch_parser.add_argument("--file", required=True, help="Файл с заявками")
+    batch_parser.add_argument("--workers", type=int, help="Число процессов (по умолчанию — число ядер)")
 
     # get-rate
     rate_parser = subparsers.add_parser("get-rate", help="Получить курс валюты")
     rate_parser.add_argument("--from", required=True, help="Исходная валюта (например, USD)")
     rate_parser.add_argument("--to", required=True, help="Целевая валюта (например, BTC)")
+    rate_parser.add_argument("--at", help="Момент времени ISO 8601 — курс по истории (например, 2024-06-01T12:00)")
+
+    # get-rate-bulk
+    rate_bulk_parser = subparsers.add_parser("get-rate-bulk", help="Курсы по истории для списка (пара, время)")
+    rate_bulk_parser.add_argument("--file", required=True, help="Файл со строками FROM_TO,timestamp")
+
+    # show-history
+    history_parser = subparsers.add_parser("show-history", help="Свечи OHLC по истории курсов")
+    history_parser.add_argument("--pair", required=True, help="Валютная пара (например, BTC_USD)")
+    history_parser.add_argument("--interval", choices=["1m", "1h", "1d"], default="1h", help="Интервал свечей")
+    history_parser.add_argument("--period", help="Период (например, 7d); по умолчанию — последние --limit свечей")
+    history_parser.add_argument("--limit", type=int, default=48, help="Количество последних свечей (по умолчанию 48)")
+
+    # backtest
+    backtest_parser = subparsers.add_parser("backtest", help="Бэктест стратегии по истории курсов")
+    backtest_parser.add_argument("--strategy", choices=["dca", "rebalance", "momentum"], required=True, help="Стратегия")
+    backtest_parser.add_argument("--period", help="Период (например, 365d); по умолчанию — вся история")
+    backtest_parser.add_argument("--step", default="1h", help="Шаг сетки времени (например, 1m, 1h)")
+    backtest_parser.add_argument("--initial", type=float, default=10_000.0, help="Начальный капитал в USD")
+    backtest_parser.add_argument("--currency", default="BTC", help="Валюта (dca, momentum)")
+    backtest_parser.add_argument("--amount", type=float, default=100.0, help="Сумма покупки в USD (dca)")
+    backtest_parser.add_argument("--every", default="1d", help="Интервал покупок (dca) или проверок (rebalance)")
+    backtest_parser.add_argument("--weights", help="Целевые доли (rebalance), например BTC=0.5,ETH=0.3")
+    backtest_parser.add_argument("--threshold", type=float, default=0.05, help="Допустимое отклонение доли (rebalance)")
+    backtest_parser.add_argument("--lookback", default="1d", help="Окно скользящей средней (momentum)")
+    backtest_parser.add_argument("--fraction", type=float, default=1.0, help="Доля свободных USD на покупку (momentum)")
+    backtest_parser.add_argument("--output", help="Каталог для equity.csv и trades.csv")
+
+    # sweep
+    sweep_parser = subparsers.add_parser("sweep", help="Перебор параметров стратегии в пуле процессов")
+    sweep_parser.add_argument("--strategy", choices=["dca", "rebalance", "momentum"], required=True, help="Стратегия")
+    sweep_parser.add_argument("--param", action="append", required=True,
+                              help="Значения параметра, например every=1h,6h,1d (варианты weights — через '|')")
+    sweep_parser.add_argument("--period", help="Период (например, 365d); по умолчанию — вся история")
+    sweep_parser.add_argument("--step", default="1h", help="Шаг сетки времени (например, 1m, 1h)")
+    sweep_parser.add_argument("--initial", type=float, default=10_000.0, help="Начальный капитал в USD")
+    sweep_parser.add_argument("--currency", default="BTC", help="Валюта (dca, momentum)")
+    sweep_parser.add_argument("--amount", type=float, default=100.0, help="Сумма покупки в USD (dca)")
+    sweep_parser.add_argument("--every", default="1d", help="Интервал покупок (dca) или проверок (rebalance)")
+    sweep_parser.add_argument("--weights", help="Целевые доли (rebalance), например BTC=0.5,ETH=0.3")
+    sweep_parser.add_argument("--threshold", type=float, default=0.05, help="Допустимое отклонение доли (rebalance)")
+    sweep_parser.add_argument("--lookback", default="1d", help="Окно скользящей средней (momentum)")
+    sweep_parser.add_argument("--fraction", type=float, default=1.0, help="Доля свободных USD на покупку (momentum)")
+    sweep_parser.add_argument("--workers", type=int, help="Число процессов (по умолчанию — число ядер)")
+    sweep_parser.add_argument("--sort", choices=["return", "drawdown", "trades"], default="return", help="Ключ рейтинга")
+    sweep_parser.add_argument("--top", type=int, default=20, help="Сколько лучших строк показать")
+    sweep_parser.add_argument("--output", help="CSV с полной таблицей результатов")
 
     # update-rates (сервис парсинга курсов)
     update_parser = subparsers.add_parser("update-rates", help="Обновить курсы валют из внешних API")
@@ -61,6 +149,10 @@ def parse_command_line(line: str) -> argparse.Namespace:
         choices=["coingecko", "exchangerate"],
         help="Обновить только из указанного источника"
     )
+    update_parser.add_argument(
+        "--record",
+        help="Записать ответы провайдеров в кассету JSON Lines (для воспроизведения)"
+    )
 
     # show-rates (сервис парсинга курсов)
     show_rates_parser = subparsers.add_parser("show-rates", help="Показать курсы из локального кеша")
@@ -78,6 +170,40 @@ def parse_command_line(line: str) -> argparse.Namespace:
         default="USD",
         help="Базовая валюта для отображения (по умолчанию USD)"
     )
+    show_rates_parser.add_argument(
+        "--sort",
+        choices=["rate", "volatility", "return"],
+        default="rate",
+        help="Сортировка: по курсу, волатильности или доходности за окно"
+    )
+
+    # leaderboard
+    leaderboard_parser = subparsers.add_parser("leaderboard", help="Рейтинг портфелей")
+    leaderboard_parser.add_argument("--top", type=int, default=100, help="Количество мест (по умолчанию 100)")
+    leaderboard_parser.add_argument("--base", default="USD", help="Базовая валюта (по умолчанию USD)")
+    leaderboard_parser.add_argument("--refresh", action="store_true", help="Перестроить рейтинг с нуля")
+
+    # exposure
+    exposure_parser = subparsers.add_parser("exposure", help="Остатки по валютам и AUM платформы")
+    exposure_parser.add_argument("--base", default="USD", help="Базовая валюта (по умолчанию USD)")
+    exposure_parser.add_argument("--verify", action="store_true", help="Сверить агрегаты с портфелями")
+    exposure_parser.add_argument("--repair", action="store_true", help="Пересчитать агрегаты при расхождении")
+
+    # cache-stats
+    subparsers.add_parser("cache-stats", help="Статистика кеша оценок портфелей")
+
+    # stats
+    stats_parser = subparsers.add_parser("stats", help="Задержки операций (перцентили)")
+    stats_parser.add_argument("--prefix", type=str, default="", help="Фильтр по имени метрики")
+    stats_parser.add_argument("--reset", action="store_true", help="Сбросить метрики после вывода")
+
+    # profile
+    profile_parser = subparsers.add_parser("profile", help="Профилирование всех команд (cProfile)")
+    profile_parser.add_argument("state", choices=["on", "off"], help="Включить или выключить")
+
+    # trace
+    trace_parser = subparsers.add_parser("trace", help="Трассировка команд (span'ы в JSONL)")
+    trace_parser.add_argument("state", choices=["on", "off"], help="Включить или выключить")
 
     # Разбиваем строку на аргументы
     args_list = line.strip().split()
@@ -92,15 +218,19 @@ def parse_command_line(line: str) -> argparse.Namespace:
 
 def run_cli() -> None:
     """Запускает CLI-интерфейс."""
-    global current_user_id, current_username
+    global current_user_id, current_username, current_token
 
     current_user_id = None
     current_username = None
+    current_token = None
 
     print("\nДобро пожаловать в ValutaTrade Hub!\n")
     print("\nВведите '-- help' или <команда> -- help, для справки.\n")
     print("\nВведите 'exit', чтобы выйти.\n")
 
+    # Профилирование всех команд (profile on/off)
+    profile_all = False
+
     # Основной цикл
     while True:
         try:
@@ -109,6 +239,14 @@ def run_cli() -> None:
             print("\nВыход.")
             break
 
+        # Флаг --profile допустим в любой команде
+        tokens = line.split()
+        profile_once = "--profile" in tokens
+        if profile_once:
+            line = " ".join(token for token in tokens if token != "--profile")
+        profiler = None
+        trace_span = None
+
         try:
             if line == "exit":
                 print("\nДо свидания!")
@@ -117,9 +255,11 @@ def run_cli() -> None:
                 if current_user_id is None:
                     print("\nВы не вошли в систему")
                 else:
+                    result = logout_user(current_token)
                     current_user_id = None
                     current_username = None
-                    print("\nВы вышли из системы")
+                    current_token = None
+                    print(result["message"])
                 continue
 
             try:
@@ -131,27 +271,64 @@ def run_cli() -> None:
                 print(e)
                 continue
 
+            if (profile_once or profile_all) and args.command != "profile":
+                profiler = CommandProfiler(args.command)
+                profiler.start()
+            trace_span = tracer.start_span(f"cli.{args.command}")
+
             # Выполняем команду
-            if args.command == "register":
+            if args.command == "profile":
+                profile_all = args.state == "on"
+                state = "включено" if profile_all else "выключено"
+                print(f"\nПрофилирование команд {state}")
+
+            elif args.command == "trace":
+                if args.state == "on":
+                    tracer.enable()
+                    print(f"\nТрассировка включена: {tracer.path}")
+                else:
+                    tracer.disable()
+                    print("\nТрассировка выключена")
+
+            elif args.command == "register":
                 result = register_user(
                     username=args.username,
                     password=args.password,
                 )
                 print(result["message"])
 
+            elif args.command == "import-users":
+                result = import_users(file_path=args.file, workers=args.workers)
+                print(result["message"])
+
             elif args.command == "login":
-                result = login_user(
-                    username=args.username,
-                    password=args.password,
-                )
+                if args.token:
+                    result = resume_session(token=args.token)
+                elif args.username and args.password:
+                    result = login_user(
+                        username=args.username,
+                        password=args.password,
+                    )
+                else:
+                    print("\nУкажите --username и --password или --token")
+                    continue
                 if result["success"]:
                     current_user_id = result["user_id"]
                     current_username = result["username"]
+                    current_token = result["token"]
                 print(result["message"])
 
             elif args.command == "show-portfolio":
                 if current_user_id is None:
                     print("\nСначала войдите в систему")
+                elif args.history:
+                    result = show_portfolio_history(
+                        user_id=current_user_id,
+                        base_currency=args.base,
+                        period=args.history,
+                        step=args.step,
+                    )
+                    print(result["message"])
                 else:
                     result = show_portfolio(
                         user_id=current_user_id,
@@ -167,6 +344,8 @@ def run_cli() -> None:
                         user_id=current_user_id,
                         currency_code=args.currency,
                         amount=args.amount,
+                        quote_id=args.quote,
+                        client_order_id=args.client_order_id,
                     )
                     print(result["message"])
 
@@ -178,14 +357,37 @@ def run_cli() -> None:
                         user_id=current_user_id,
                         currency_code=args.currency,
                         amount=args.amount,
+                        quote_id=args.quote,
+                        client_order_id=args.client_order_id,
                     )
                     print(result["message"])
 
+            elif args.command == "quote":
+                if current_user_id is None:
+                    print("\nСначала войдите в систему")
+                else:
+                    result = request_quote(currency_code=args.currency, user_id=current_user_id)
+                    print(result["message"])
+
+            elif args.command == "batch":
+                if current_user_id is None:
+                    print("\nСначала войдите в систему")
+                else:
+                    result = execute_batch(file_path=args.file, user_id=current_user_id, workers=args.workers)
+                    print(result["message"])
+
             elif args.command == "get-rate":
-                result = get_rate(
-                    from_currency=getattr(args, "from"),
-                    to_currency=args.to,
-                )
+                if args.at:
+                    result = get_rate_at(
+                        from_currency=getattr(args, "from"),
+                        to_currency=args.to,
+                        at=args.at,
+                    )
+                else:
+                    result = get_rate(
+                        from_currency=getattr(args, "from"),
+                        to_currency=args.to,
+                    )
                 if result["success"]:
                     print(result["message"])
                 else:
@@ -203,6 +405,124 @@ def run_cli() -> None:
                         print(error_msg)
 
 
+            elif args.command == "get-rate-bulk":
+                result = get_rates_at(file_path=args.file)
+                print(result["message"])
+
+            elif args.command == "show-history":
+                result = show_rate_history(
+                    pair=args.pair,
+                    interval=args.interval,
+                    period=args.period,
+                    limit=args.limit,
+                )
+                print(result["message"])
+
+            elif args.command == "backtest":
+                result = run_backtest(
+                    strategy=args.strategy,
+                    period=args.period,
+                    step=args.step,
+                    initial=args.initial,
+                    output=args.output,
+                    currency=args.currency,
+                    amount=args.amount,
+                    every=args.every,
+                    weights=args.weights,
+                    threshold=args.threshold,
+                    lookback=args.lookback,
+                    fraction=args.fraction,
+                )
+                print(result["message"])
+
+            elif args.command == "sweep":
+                result = run_sweep(
+                    strategy=args.strategy,
+                    params=args.param,
+                    period=args.period,
+                    step=args.step,
+                    initial=args.initial,
+                    workers=args.workers,
+                    sort=args.sort,
+                    top=args.top,
+                    output=args.output,
+                    currency=args.currency,
+                    amount=args.amount,
+                    every=args.every,
+                    weights=args.weights,
+                    threshold=args.threshold,
+                    lookback=args.lookback,
+                    fraction=args.fraction,
+                )
+                print(result["message"])
+                if result["success"]:
+                    table = PrettyTable()
+                    table.field_names = ["#", "Параметры", "Итог, USD", "Доходность", "Просадка", "Сделок", "Отклонено"]
+                    for place, row in enumerate(result["rows"], start=1):
+                        table.add_row([
+                            place, row["params"], f"{row['final']:,.2f}",
+                            f"{row['return'] * 100:+.2f}%", f"{row['max_drawdown'] * 100:.2f}%",
+                            row["trades"], row["rejected"],
+                        ])
+                    table.align["Параметры"] = "l"
+                    print(table)
+
+            elif args.command == "leaderboard":
+                result = show_leaderboard(
+                    top=args.top,
+                    base_currency=args.base,
+                    refresh=args.refresh,
+                )
+                print(result["message"])
+
+            elif args.command == "exposure":
+                result = show_exposure(
+                    base_currency=args.base,
+                    verify=args.verify,
+                    repair=args.repair,
+                )
+                print(result["message"])
+
+            elif args.command == "cache-stats":
+                stats = valuation_cache.stats()
+                print("\nКеш оценок портфелей:")
+                print(f"   Записей: {stats['size']} / {stats['max_size']}")
+                print(f"   Попадания: {stats['hits']}, промахи: {stats['misses']}")
+                print(f"   Доля попаданий: {stats['hit_ratio']:.1%}")
+                print(f"   Вытеснено: {stats['evictions']}")
+
+            # Обработка stats
+            elif args.command == "stats":
+                snapshot = metrics.registry.snapshot()
+                histograms = {
+                    name: h for name, h in snapshot["histograms"].items()
+                    if name.startswith(args.prefix) and h["count"]
+                }
+                if not histograms:
+                    print("\nНет данных о задержках")
+                else:
+                    table = PrettyTable()
+                    table.field_names = ["Операция", "Вызовов", "p50, мс", "p95, мс", "p99, мс", "max, мс"]
+                    for name, h in histograms.items():
+                        table.add_row([
+                            name, h["count"],
+                            f"{h['p50'] * 1000:.2f}", f"{h['p95'] * 1000:.2f}",
+                            f"{h['p99'] * 1000:.2f}", f"{h['max'] * 1000:.2f}",
+                        ])
+                    table.align["Операция"] = "l"
+                    print(table)
+                counters = {
+                    name: value for name, value in snapshot["counters"].items()
+                    if name.startswith(args.prefix)
+                }
+                if counters:
+                    print("\nСчётчики:")
+                    for name, value in counters.items():
+                        print(f"   {name}: {value:g}")
+                if args.reset:
+                    metrics.registry.reset()
+                    print("\nМетрики сброшены")
+
             # Обработка update-rates
             elif args.command == "update-rates":
                 try:
@@ -212,6 +532,8 @@ def run_cli() -> None:
                     config = ParserConfig()
                     storage = RatesStorage(config)
                     updater = RatesUpdater(config, storage)
+                    if args.record:
+                        updater.record(args.record)
                     
                     # Запускаем обновление (с опциональным источником)
                     source = getattr(args, "source", None)
@@ -266,12 +588,25 @@ def run_cli() -> None:
                             continue
                         filtered_pairs[pair] = info
                     
-                    # Сортируем по курсу
-                    sorted_pairs = sorted(
-                        filtered_pairs.items(),
-                        key=lambda x: x[1]["rate"],
-                        reverse=True
-                    )
+                    # Сортируем по курсу или по скользящей статистике
+                    sort_key = getattr(args, "sort", "rate")
+                    stats = {}
+                    if sort_key == "rate":
+                        sorted_pairs = sorted(
+                            filtered_pairs.items(),
+                            key=lambda x: x[1]["rate"],
+                            reverse=True
+                        )
+                    else:
+                        stats_result = get_rate_stats()
+                        stats = stats_result["stats"]
+                        print(stats_result["message"].strip())
+
+                        def stat_value(item):
+                            value = stats.get(item[0], {}).get(sort_key, math.nan)
+                            return -math.inf if math.isnan(value) else value
+
+                        sorted_pairs = sorted(filtered_pairs.items(), key=stat_value, reverse=True)
                     
                     # Применяем ограничение по количеству
                     if top_filter and top_filter > 0:
@@ -288,10 +623,23 @@ def run_cli() -> None:
                             rate = info["rate"]
                             source = info.get("source", "unknown")
                             updated_at = info.get("updated_at", "неизвестно")
-                            print(f"   - {pair}: {rate:.4f} ({source}, обновлено: {updated_at})")
+                            line = f"   - {pair}: {rate:.4f} ({source}, обновлено: {updated_at})"
+                            pair_stats = stats.get(pair)
+                            if pair_stats:
+                                line += (
+                                    f"\n       SMA {pair_stats['sma']:.4f}, EMA {pair_stats['ema']:.4f}, "
+                                    f"доходность {pair_stats['return']:+.2%}, "
+                                    f"волатильность {pair_stats['volatility']:.2%}"
+                                )
+                            print(line)
                             
                 except Exception as e:
                     print(f"Ошибка при чтении курсов: {e}")
 
         except Exception as e:
-                print(f"Ошибка выполнения команды: {e}")
\ No newline at end of file
+                print(f"Ошибка выполнения команды: {e}")
+        finally:
+            tracer.finish_span(trace_span)
+            if profiler is not None:
+                path = profiler.stop()
+                print(f"\nПрофиль сохранён: {path} (+ {path.with_suffix('.collapsed').name})")
@@ -13,12 +13,19 @@ DATA_DIR = Path(settings.get("data_dir"))
 USERS_FILE = Path(settings.get("users_file"))
 PORTFOLIOS_FILE = Path(settings.get("portfolios_file"))
 RATES_FILE = Path(settings.get("rates_file"))
+HISTORY_FILE = Path(settings.get("history_file", "./data/exchange_rates.json"))
+HISTORY_DIR = Path(settings.get("history_dir", "./data/history"))
+TRADES_FILE = Path(settings.get("trades_file", "./data/trades.jsonl"))
+CANDLES_FILE = Path(settings.get("candles_file", "./data/candles.json"))
+STATS_FILE = Path(settings.get("stats_file", "./data/rate_stats.json"))
+METRICS_FILE = Path(settings.get("metrics_file", "./data/metrics.json"))
+TRACE_FILE = Path(settings.get("trace_file", "./data/traces.jsonl"))
+PROFILES_DIR = Path(settings.get("profile_dir", "./data/profiles"))
 RATES_TTL_SECONDS = settings.get("rates_ttl_seconds")
 DEFAULT_BASE_CURRENCY = settings.get("default_base_currency")
 STARTING_BALANCE = settings.get("starting_balance")
 MIN_PASSWORD_LENGTH = settings.get("min_password_length")
 LOG_DIR = Path(settings.get("log_dir"))
-LOG_FORMAT = settings.get("log_format")
 
 # Проверяем обязательные поля
 required_fields = [
@@ -0,0 +1,133 @@
+"""
+Агрегаты по платформе: суммарные остатки по валютам и число портфелей.
+
+Счётчики хранятся в самом portfolios.json (ключ "aggregates") и
+обновляются в той же операции чтение→слияние→запись, что и портфель
+сделки (apply_to), по её изменениям балансов — O(число валют сделки),
+без сканирования всех портфелей. Портфели и агрегаты записываются одним
+атомарным replace, поэтому сбой между ними невозможен. Проверка
+пересчитывает агрегаты с нуля и показывает расхождения. Если агрегатов
+ещё нет (первый запуск после обновления), они строятся по портфелям.
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import valutatrade_hub.constants as const
+from valutatrade_hub.core.locks import data_file_lock
+
+# Допустимое расхождение при проверке (накопленная ошибка округления)
+DRIFT_TOLERANCE = 1e-6
+
+# Ключ агрегатов в portfolios.json
+KEY = "aggregates"
+
+
+class PlatformAggregates:
+    """Счётчики остатков по валютам и числа портфелей."""
+
+    def __init__(self, portfolios_path: const.Path = None):
+        self.portfolios_path = portfolios_path or const.PORTFOLIOS_FILE
+
+    def _read(self) -> Dict[str, Any]:
+        """Данные portfolios.json (пустой словарь, если файла нет)."""
+        if not self.portfolios_path.exists():
+            return {}
+        with self.portfolios_path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        """Атомарно перезаписывает portfolios.json (вызывается под блокировкой файла)."""
+        self.portfolios_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.portfolios_path.with_suffix(".tmp")
+        with temp_file.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        temp_file.replace(self.portfolios_path)
+
+    def load(self) -> Dict[str, Any]:
+        """Читает текущие агрегаты; при их отсутствии строит по портфелям и сохраняет."""
+        aggregates = self._read().get(KEY)
+        if aggregates is None:
+            with data_file_lock(self.portfolios_path):
+                data = self._read()
+                aggregates = data.get(KEY)
+                if aggregates is None:
+                    aggregates = data[KEY] = _stamp(self.compute(data.get("portfolios", [])))
+                    self._write(data)
+        return aggregates
+
+    @classmethod
+    def apply_to(cls, data: Dict[str, Any], deltas: Dict[str, float], new_portfolios: int = 0) -> None:
+        """
+        Применяет изменения балансов к агрегатам в данных portfolios.json.
+
+        Вызывается внутри операции записи портфелей, после изменения самих
+        портфелей. Если агрегатов ещё нет, они строятся по портфелям (уже с
+        этой сделкой), а deltas не добавляются повторно.
+        """
+        aggregates: Optional[Dict[str, Any]] = data.get(KEY)
+        if aggregates is None:
+            data[KEY] = _stamp(cls.compute(data.get("portfolios", [])))
+            return
+        totals = aggregates.setdefault("totals", {})
+        for code, delta in deltas.items():
+            totals[code] = totals.get(code, 0.0) + delta
+        if new_portfolios:
+            aggregates["portfolios"] = aggregates.get("portfolios", 0) + new_portfolios
+        _stamp(aggregates)
+
+    @staticmethod
+    def compute(portfolios) -> Dict[str, Any]:
+        """Считает агрегаты с нуля по списку портфелей."""
+        totals: Dict[str, float] = {}
+        count = 0
+        for portfolio in portfolios:
+            count += 1
+            for code, info in portfolio.get("wallets", {}).items():
+                totals[code] = totals.get(code, 0.0) + info["balance"]
+        return {"totals": totals, "portfolios": count}
+
+    def verify(self, repair: bool = False) -> Dict[str, Any]:
+        """
+        Сравнивает сохранённые агрегаты с пересчитанными по portfolios.json.
+
+        Args:
+            repair: Перезаписать агрегаты пересчитанными значениями.
+
+        Returns:
+            Словарь с расхождениями по валютам (drift) и флагом ok.
+        """
+        with data_file_lock(self.portfolios_path):
+            data = self._read()
+            actual = self.compute(data.get("portfolios", []))
+            stored = data.get(KEY)
+            if stored is None:
+                # Агрегатов ещё нет: строятся по портфелям, сверять не с чем
+                stored = data[KEY] = _stamp(dict(actual))
+                self._write(data)
+
+            drift = {}
+            for code in set(stored.get("totals", {})) | set(actual["totals"]):
+                diff = stored.get("totals", {}).get(code, 0.0) - actual["totals"].get(code, 0.0)
+                if abs(diff) > DRIFT_TOLERANCE:
+                    drift[code] = diff
+
+            portfolios_drift = stored.get("portfolios", 0) - actual["portfolios"]
+            if repair and (drift or portfolios_drift):
+                data[KEY] = _stamp(actual)
+                self._write(data)
+
+            return {
+                "ok": not drift and not portfolios_drift,
+                "drift": drift,
+                "portfolios_drift": portfolios_drift,
+                "repaired": repair and bool(drift or portfolios_drift),
+            }
+
+
+def _stamp(aggregates: Dict[str, Any]) -> Dict[str, Any]:
+    aggregates["updated_at"] = datetime.now(timezone.utc).isoformat()
+    return aggregates
+
+
+platform_aggregates = PlatformAggregates()
@@ -0,0 +1,400 @@
+"""
+Бэктест торговых стратегий по записанной истории курсов.
+
+История выравнивается на равномерную сетку времени (курсы X→USD в каждой
+точке), после чего стратегия проходит по сетке событийно: DCA посещает
+только точки покупок, моментум — только пересечения цены со скользящей
+средней, ребалансировка — только точки проверки. Сделки исполняются
+через Portfolio/Wallet по тем же правилам, что buy/sell: расчёты в USD,
+курс берётся на момент сделки, при нехватке средств заявка отклоняется.
+Кривая капитала строится после прогона операциями над массивами.
+"""
+
+import math
+import operator
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+from valutatrade_hub.core.exceptions import ApiRequestError, InsufficientFundsError
+from valutatrade_hub.core.models import Portfolio, Wallet
+from valutatrade_hub.core.rate_history import RateHistory
+
+
+@dataclass
+class BacktestTrade:
+    """Исполненная сделка бэктеста."""
+
+    ts: float
+    action: str  # BUY | SELL
+    currency_code: str
+    amount: float
+    rate: float
+    usd: float  # Стоимость (BUY) или выручка (SELL) в USD
+
+
+@dataclass
+class BacktestResult:
+    """Результат прогона: кривая капитала, сделки и сводные показатели."""
+
+    strategy: str
+    params: Dict[str, object]
+    timestamps: Sequence[float]
+    equity: array
+    trades: List[BacktestTrade] = field(default_factory=list)
+    rejected: int = 0
+
+    @property
+    def initial(self) -> float:
+        return self.equity[0] if self.equity else math.nan
+
+    @property
+    def final(self) -> float:
+        return self.equity[-1] if self.equity else math.nan
+
+    @property
+    def total_return(self) -> float:
+        """Доходность за период."""
+        return self.final / self.initial - 1 if self.initial else math.nan
+
+    @property
+    def max_drawdown(self) -> float:
+        """Максимальная просадка от пика (доля)."""
+        peak, worst = -math.inf, 0.0
+        for value in self.equity:
+            if value > peak:
+                peak = value
+            elif peak > 0:
+                worst = max(worst, 1 - value / peak)
+        return worst
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "final": self.final,
+            "return": self.total_return,
+            "max_drawdown": self.max_drawdown,
+            "trades": len(self.trades),
+            "rejected": self.rejected,
+        }
+
+
+class Simulator:
+    """
+    Портфель бэктеста поверх Portfolio/Wallet.
+
+    prices — курсы X→USD в точках сетки (NaN, если курс ещё неизвестен).
+    """
+
+    def __init__(self, timestamps: Sequence[float], prices: Dict[str, Sequence[float]], initial_usd: float):
+        self.timestamps = timestamps
+        self.prices = prices
+        self.portfolio = Portfolio(user_id=0, wallets={"USD": Wallet("USD", initial_usd)})
+        self.trades: List[BacktestTrade] = []
+        self.rejected = 0
+        self._trade_points: List[int] = []  # Индексы сетки исполненных сделок
+
+    # Правила сделок (как в buy_currency / sell_currency)
+
+    def rate(self, i: int, currency_code: str) -> float:
+        """
+        Курс currency→USD в точке i.
+
+        Raises:
+            ApiRequestError: если курс в этот момент неизвестен.
+        """
+        rate = self.prices[currency_code][i]
+        if not rate > 0:
+            raise ApiRequestError(f"не удалось получить курс для {currency_code}→USD")
+        return rate
+
+    def balance(self, currency_code: str) -> float:
+        wallets = self.portfolio.wallets
+        return wallets[currency_code].balance if currency_code in wallets else 0.0
+
+    def buy(self, i: int, currency_code: str, amount: float) -> bool:
+        """Покупка amount валюты за USD; False, если заявка отклонена."""
+        try:
+            if amount <= 0:
+                raise ValueError("'amount' должен быть положительным числом")
+            rate = self.rate(i, currency_code)
+            cost_usd = amount * rate
+            usd_wallet = self.portfolio.get_wallet("USD")
+            if usd_wallet.balance < cost_usd:
+                raise InsufficientFundsError(available=usd_wallet.balance, required=cost_usd, code="USD")
+            if currency_code not in self.portfolio.wallets:
+                self.portfolio.add_currency(currency_code)
+            usd_wallet.withdraw(cost_usd)
+            self.portfolio.get_wallet(currency_code).deposit(amount)
+        except (ValueError, ApiRequestError, InsufficientFundsError):
+            self.rejected += 1
+            return False
+        self.trades.append(BacktestTrade(self.timestamps[i], "BUY", currency_code, amount, rate, cost_usd))
+        self._trade_points.append(i)
+        return True
+
+    def sell(self, i: int, currency_code: str, amount: float) -> bool:
+        """Продажа amount валюты за USD; False, если заявка отклонена."""
+        try:
+            if amount <= 0:
+                raise ValueError("'amount' должен быть положительным числом")
+            wallet = self.portfolio.get_wallet(currency_code)
+            if wallet.balance < amount:
+                raise InsufficientFundsError(available=wallet.balance, required=amount, code=currency_code)
+            rate = self.rate(i, currency_code)
+            revenue_usd = amount * rate
+            wallet.withdraw(amount)
+            self.portfolio.get_wallet("USD").deposit(revenue_usd)
+        except (KeyError, ValueError, ApiRequestError, InsufficientFundsError):
+            self.rejected += 1
+            return False
+        self.trades.append(BacktestTrade(self.timestamps[i], "SELL", currency_code, amount, rate, revenue_usd))
+        self._trade_points.append(i)
+        return True
+
+    def buy_usd(self, i: int, currency_code: str, usd: float) -> bool:
+        """Покупка валюты на сумму usd."""
+        rate = self.prices[currency_code][i]
+        if not rate > 0:
+            self.rejected += 1
+            return False
+        amount = usd / rate
+        # Округление не должно поднимать стоимость выше usd (покупка на весь остаток)
+        while amount * rate > usd:
+            amount = math.nextafter(amount, 0.0)
+        return self.buy(i, currency_code, amount)
+
+    def value(self, i: int) -> float:
+        """Стоимость портфеля в USD в точке i."""
+        total = 0.0
+        for code, wallet in self.portfolio.wallets.items():
+            if code == "USD":
+                total += wallet.balance
+            elif wallet.balance:
+                rate = self.prices[code][i]
+                if rate > 0:
+                    total += wallet.balance * rate
+        return total
+
+    # Кривая капитала
+
+    def equity_curve(self, initial_usd: float) -> array:
+        """
+        Стоимость портфеля во всех точках сетки.
+
+        Балансы между сделками постоянны: массив балансов каждой валюты
+        заполняется срезами, затем складываются произведения баланс × курс.
+        """
+        n = len(self.timestamps)
+        balances: Dict[str, float] = {"USD": initial_usd}
+        for trade in self.trades:
+            balances.setdefault(trade.currency_code, 0.0)
+        holdings: Dict[str, array] = {code: array("d", [0.0]) * n for code in balances}
+        position = 0
+        for i, trade in zip(self._trade_points, self.trades):
+            if i > position:
+                for code, balance in balances.items():
+                    holdings[code][position:i] = array("d", [balance]) * (i - position)
+                position = i
+            sign = 1 if trade.action == "BUY" else -1
+            balances[trade.currency_code] += sign * trade.amount
+            balances["USD"] -= sign * trade.usd
+        for code, balance in balances.items():
+            holdings[code][position:n] = array("d", [balance]) * (n - position)
+
+        equity = holdings.pop("USD")
+        for code, amounts in holdings.items():
+            known = map(_zero_if_unknown, self.prices[code])
+            equity = array("d", map(operator.add, equity, map(operator.mul, amounts, known)))
+        return equity
+
+
+def _zero_if_unknown(rate: float) -> float:
+    return rate if rate > 0 else 0.0
+
+
+def _rolling_mean(values: Sequence[float], window: int) -> array:
+    """Скользящее среднее за window точек (NaN, пока окно не заполнено или курс неизвестен)."""
+    result = array("d", [math.nan]) * len(values)
+    total, filled = 0.0, 0
+    for i, value in enumerate(values):
+        if not value > 0:
+            total, filled = 0.0, 0
+            continue
+        total += value
+        filled += 1
+        if filled > window:
+            total -= values[i - window]
+            filled = window
+        if filled == window:
+            result[i] = total / window
+    return result
+
+
+# Стратегии
+
+
+class Strategy(ABC):
+    """Базовая стратегия: run() проходит по сетке и отдаёт заявки симулятору."""
+
+    name = "base"
+
+    @abstractmethod
+    def currencies(self) -> List[str]:
+        """Валюты, курсы которых нужны стратегии."""
+
+    def params(self) -> Dict[str, object]:
+        return dict(vars(self))
+
+    @abstractmethod
+    def run(self, sim: Simulator) -> None:
+        """Проходит по сетке и отдаёт заявки симулятору."""
+
+
+class DcaStrategy(Strategy):
+    """Усреднение: покупка на amount_usd каждые every_steps точек сетки."""
+
+    name = "dca"
+
+    def __init__(self, currency_code: str, amount_usd: float, every_steps: int):
+        self.currency_code = currency_code
+        self.amount_usd = amount_usd
+        self.every_steps = max(1, int(every_steps))
+
+    def currencies(self) -> List[str]:
+        return [self.currency_code]
+
+    def run(self, sim: Simulator) -> None:
+        prices = sim.prices[self.currency_code]
+        # Первая покупка — в первой точке с известным курсом
+        first = next((i for i, rate in enumerate(prices) if rate > 0), None)
+        if first is None:
+            return
+        for i in range(first, len(prices), self.every_steps):
+            sim.buy_usd(i, self.currency_code, self.amount_usd)
+
+
+class RebalanceStrategy(Strategy):
+    """
+    Ребалансировка к целевым долям (остаток — USD), когда доля любой
+    валюты отклонилась от цели больше чем на threshold. Проверка —
+    каждые check_steps точек.
+    """
+
+    name = "rebalance"
+
+    def __init__(self, weights: Dict[str, float], threshold: float, check_steps: int):
+        if sum(weights.values()) > 1 + 1e-9:
+            raise ValueError("\nСумма целевых долей не может превышать 1")
+        self.weights = dict(weights)
+        self.threshold = threshold
+        self.check_steps = max(1, int(check_steps))
+
+    def currencies(self) -> List[str]:
+        return list(self.weights)
+
+    def run(self, sim: Simulator) -> None:
+        codes = list(self.weights)
+        columns = [sim.prices[code] for code in codes]
+        targets = [self.weights[code] for code in codes]
+        amounts = [0.0] * len(codes)
+        usd = sim.balance("USD")
+        started = False
+
+        for i in range(0, len(sim.timestamps), self.check_steps):
+            rates = [column[i] for column in columns]
+            if not all(rate > 0 for rate in rates):
+                continue
+            values = [amount * rate for amount, rate in zip(amounts, rates)]
+            total = usd + sum(values)
+            if started and all(
+                abs(value / total - target) <= self.threshold for value, target in zip(values, targets)
+            ):
+                continue
+            started = True
+
+            # Сначала продажи (освобождают USD), затем покупки
+            orders = [(target * total - value) / rate for value, target, rate in zip(values, targets, rates)]
+            for code, delta in sorted(zip(codes, orders), key=lambda order: order[1]):
+                if delta < 0:
+                    sim.sell(i, code, min(-delta, sim.balance(code)))
+                elif delta > 0:
+                    rate = columns[codes.index(code)][i]
+                    sim.buy_usd(i, code, min(delta * rate, sim.balance("USD")))
+            amounts = [sim.balance(code) for code in codes]
+            usd = sim.balance("USD")
+
+
+class MomentumStrategy(Strategy):
+    """
+    Моментум: покупка на долю fraction свободных USD при пересечении ценой
+    скользящей средней снизу вверх, продажа всей позиции — сверху вниз.
+    """
+
+    name = "momentum"
+
+    def __init__(self, currency_code: str, lookback_steps: int, fraction: float = 1.0):
+        self.currency_code = currency_code
+        self.lookback_steps = max(2, int(lookback_steps))
+        self.fraction = fraction
+
+    def currencies(self) -> List[str]:
+        return [self.currency_code]
+
+    def run(self, sim: Simulator) -> None:
+        prices = sim.prices[self.currency_code]
+        average = _rolling_mean(prices, self.lookback_steps)
+        above = False
+        for i, (price, mean) in enumerate(zip(prices, average)):
+            if math.isnan(mean):
+                continue
+            now_above = price > mean
+            if now_above == above:
+                continue
+            above = now_above
+            if now_above:
+                sim.buy_usd(i, self.currency_code, sim.balance("USD") * self.fraction)
+            else:
+                sim.sell(i, self.currency_code, sim.balance(self.currency_code))
+
+
+STRATEGIES = {
+    DcaStrategy.name: DcaStrategy,
+    RebalanceStrategy.name: RebalanceStrategy,
+    MomentumStrategy.name: MomentumStrategy,
+}
+
+
+def align_prices(history: RateHistory, currencies: Sequence[str], grid: Sequence[float]) -> Dict[str, array]:
+    """Курсы X→USD на сетке (NaN до первого известного курса)."""
+    return {code: history.align_usd(code, grid) for code in currencies}
+
+
+def run_backtest(
+    strategy: Strategy,
+    timestamps: Sequence[float],
+    prices: Dict[str, Sequence[float]],
+    initial_usd: float,
+) -> BacktestResult:
+    """Прогоняет стратегию по подготовленным курсам."""
+    sim = Simulator(timestamps, prices, initial_usd)
+    strategy.run(sim)
+    return BacktestResult(
+        strategy=strategy.name,
+        params=strategy.params(),
+        timestamps=timestamps,
+        equity=sim.equity_curve(initial_usd),
+        trades=sim.trades,
+        rejected=sim.rejected,
+    )
+
+
+def history_bounds(history: RateHistory, currencies: Sequence[str]) -> Optional[tuple]:
+    """Общий интервал истории валют: (первый тик, последний тик) или None."""
+    starts, ends = [], []
+    for code in currencies:
+        times, _rates = history.usd_series(code)
+        if not times:
+            return None
+        starts.append(times[0])
+        ends.append(times[-1])
+    return max(starts), min(ends)
@@ -0,0 +1,68 @@
+"""
+Массовый импорт пользователей.
+
+CSV с колонками username,password проверяется целиком (пустые поля,
+длина пароля, уникальность внутри файла и среди существующих
+пользователей), после чего пароли хешируются параллельно в пуле процессов.
+"""
+
+import csv
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Set, Tuple
+from valutatrade_hub.core.models import hash_password
+
+
+def read_users_csv(path: str) -> List[Dict[str, str]]:
+    """Читает CSV с заголовком username,password."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or not {"username", "password"} <= set(reader.fieldnames):
+            raise ValueError("\nCSV должен содержать колонки username,password")
+        return [
+            {"username": (row.get("username") or "").strip(), "password": row.get("password") or ""}
+            for row in reader
+        ]
+
+
+def validate_rows(
+    rows: Iterable[Dict[str, str]],
+    existing_usernames: Set[str],
+    min_password_length: int = 4,
+) -> Tuple[List[Dict[str, str]], List[str]]:
+    """
+    Делит строки на корректные и ошибки.
+
+    Уникальность проверяется по множеству имён за O(1) на строку.
+    """
+    seen = set(existing_usernames)
+    valid, errors = [], []
+    for line_no, row in enumerate(rows, start=2):
+        username = row["username"]
+        if not username:
+            errors.append(f"строка {line_no}: пустое имя пользователя")
+        elif len(row["password"]) < min_password_length:
+            errors.append(f"строка {line_no}: пароль короче {min_password_length} символов")
+        elif username in seen:
+            errors.append(f"строка {line_no}: имя '{username}' уже занято")
+        else:
+            seen.add(username)
+            valid.append(row)
+    return valid, errors
+
+
+def _hash_one(item: Tuple[str, str]) -> str:
+    password, salt = item
+    return hash_password(password, salt)
+
+
+def hash_passwords(passwords: List[str], workers: int = None) -> List[Tuple[str, str]]:
+    """Хеширует пароли в пуле процессов; возвращает пары (salt, hash)."""
+    salts = [secrets.token_hex(16) for _ in passwords]
+    items = list(zip(passwords, salts))
+    if not items:
+        return []
+    chunksize = max(1, len(items) // ((workers or 4) * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(_hash_one, items, chunksize=chunksize))
+    return list(zip(salts, hashes))
@@ -0,0 +1,161 @@
+"""
+Кеш оценок портфелей.
+
+Ключ кеша — (user_id, base_currency, поколение курсов, версия портфеля).
+Сделки увеличивают версию портфеля, обновление курсов — поколение,
+поэтому устаревшие записи никогда не совпадают с новым ключом и со
+временем вытесняются по LRU.
+
+Версия портфеля — поле "version" пользователя в portfolios.json (его
+увеличивает каждая сделка, в том числе из других процессов). Версии всех
+пользователей перечитываются один раз после изменения файла, поэтому
+сделка одного пользователя не сбрасывает кеш остальных. Изменение файла
+определяется по (mtime, размер, inode): атомарная замена в пределах одного
+тика mtime меняет inode.
+
+Кеш отдаёт копии значений: изменение результата вызывающим кодом не
+портит запись для остальных.
+"""
+
+import copy
+import json
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, Optional
+import valutatrade_hub.constants as const
+from valutatrade_hub.core import events
+from valutatrade_hub.infra.settings import SettingsLoader
+
+
+def _file_signature(path: const.Path) -> Optional[tuple]:
+    """Отпечаток файла (mtime, размер, inode) или None, если файла нет."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class ValuationCache:
+    """LRU-кеш с ограниченным размером и счётчиками попаданий/промахов."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._rates_generation = 0
+        self._portfolio_versions: Dict[int, int] = defaultdict(int)
+        self._stored_versions: Dict[int, int] = {}
+        self._stored_versions_signature: Optional[tuple] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Версии
+
+    def rates_generation(self) -> tuple:
+        """
+        Текущее поколение курсов.
+
+        Счётчик увеличивается при обновлении курсов в этом процессе;
+        отпечаток rates.json учитывает обновления из других процессов.
+        """
+        return self._rates_generation, _file_signature(const.RATES_FILE)
+
+    def portfolio_version(self, user_id: int) -> tuple:
+        """
+        Текущая версия портфеля пользователя.
+
+        Счётчик событий этого процесса и поле version из portfolios.json.
+        """
+        return self._portfolio_versions[user_id], self._stored_versions_of().get(user_id, 0)
+
+    def _stored_versions_of(self) -> Dict[int, int]:
+        """Версии портфелей из файла; перечитываются только после изменения файла."""
+        signature = _file_signature(const.PORTFOLIOS_FILE)
+        if signature != self._stored_versions_signature:
+            versions: Dict[int, int] = {}
+            try:
+                with const.PORTFOLIOS_FILE.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                for portfolio in data.get("portfolios", []):
+                    versions[portfolio["user_id"]] = portfolio.get("version", 0)
+            except (OSError, json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                versions = {}
+            with self._lock:
+                self._stored_versions = versions
+                self._stored_versions_signature = signature
+        return self._stored_versions
+
+    def bump_rates_generation(self, **_payload) -> None:
+        """Обработчик события обновления курсов."""
+        with self._lock:
+            self._rates_generation += 1
+
+    def bump_portfolio_version(self, user_id: int, **_payload) -> None:
+        """Обработчик события изменения портфеля."""
+        with self._lock:
+            self._portfolio_versions[user_id] += 1
+
+    def bump_portfolio_versions(self, changes, **_payload) -> None:
+        """Обработчик пакетного изменения портфелей."""
+        with self._lock:
+            for user_id, _deltas, _action in changes:
+                self._portfolio_versions[user_id] += 1
+
+    def make_key(self, user_id: int, base_currency: str) -> tuple:
+        """Строит ключ кеша для пользователя и базовой валюты."""
+        return (
+            user_id,
+            base_currency.upper(),
+            self.rates_generation(),
+            self.portfolio_version(user_id),
+        )
+
+    # Операции с кешем
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Возвращает копию значения по ключу или None."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._data[key])
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Сохраняет копию значения, вытесняя самые старые записи."""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Очищает кеш (счётчики сохраняются)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики для мониторинга."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+# Общий кеш процесса
+valuation_cache = ValuationCache(
+    max_size=SettingsLoader().get("valuation_cache_size", 1024)
+)
+events.subscribe(events.PORTFOLIO_CHANGED, valuation_cache.bump_portfolio_version)
+events.subscribe(events.PORTFOLIOS_CHANGED, valuation_cache.bump_portfolio_versions)
+events.subscribe(events.RATES_UPDATED, valuation_cache.bump_rates_generation)
@@ -0,0 +1,136 @@
+"""
+Свечи OHLC по истории курсов.
+
+Сырые тики истории курсов сворачиваются в свечи 1m/1h/1d по
+каждой паре; сырые данные хранятся только за окно retention. Файл свечей:
+    {
+      "watermark": 1718000000.0,           # время последнего свёрнутого тика
+      "candles": {
+        "1h": {"BTC_USD": [[start, open, high, low, close, ticks], ...]},
+        ...
+      }
+    }
+Свечи пары отсортированы по началу интервала, поэтому выборка диапазона —
+двоичный поиск, а длинные запросы читают лишь малую долю данных.
+"""
+
+import bisect
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import valutatrade_hub.constants as const
+
+# Интервалы свечей (секунды), от мелкого к крупному
+INTERVALS: Dict[str, int] = {"1m": 60, "1h": 3600, "1d": 86400}
+
+# Индексы полей свечи
+START, OPEN, HIGH, LOW, CLOSE, TICKS = range(6)
+
+
+class CandleStore:
+    """Свечи OHLC по интервалам и парам."""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or const.CANDLES_FILE)
+        self.watermark = 0.0
+        self._candles: Dict[str, Dict[str, List[list]]] = {interval: {} for interval in INTERVALS}
+
+    @classmethod
+    def load(cls, path: Path = None) -> "CandleStore":
+        """Загружает свечи из файла (пустое хранилище, если файла нет)."""
+        store = cls(path)
+        if not store.path.exists():
+            return store
+        try:
+            with store.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            return store
+        store.watermark = float(data.get("watermark", 0.0))
+        for interval, pairs in data.get("candles", {}).items():
+            if interval in store._candles:
+                store._candles[interval] = pairs
+        return store
+
+    def save(self) -> None:
+        """Атомарно сохраняет свечи (без отступов — файл читается часто)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.path.with_suffix(".tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"watermark": self.watermark, "candles": self._candles}, f, separators=(",", ":"))
+        temp_file.replace(self.path)
+
+    @property
+    def pairs(self) -> List[str]:
+        """Пары, по которым есть свечи."""
+        return sorted({pair for pairs in self._candles.values() for pair in pairs})
+
+    def add_tick(self, pair: str, ts: float, rate: float) -> None:
+        """
+        Добавляет тик во все интервалы.
+
+        Тики должны поступать по возрастанию времени: обновляется только
+        последняя свеча пары, более ранние тики отбрасываются.
+        """
+        for interval, seconds in INTERVALS.items():
+            series = self._candles[interval].setdefault(pair, [])
+            start = ts - ts % seconds
+            if series and series[-1][START] == start:
+                candle = series[-1]
+                candle[HIGH] = max(candle[HIGH], rate)
+                candle[LOW] = min(candle[LOW], rate)
+                candle[CLOSE] = rate
+                candle[TICKS] += 1
+            elif not series or series[-1][START] < start:
+                series.append([start, rate, rate, rate, rate, 1])
+
+    def prune(self, now: float, retention_days: Dict[str, Optional[float]]) -> int:
+        """
+        Удаляет свечи, закончившиеся раньше окна хранения интервала.
+
+        retention_days: {"1m": 30, ...}; None или отсутствие ключа — хранить всё.
+        Возвращает число удалённых свечей.
+        """
+        removed = 0
+        for interval, seconds in INTERVALS.items():
+            days = retention_days.get(interval)
+            if days is None:
+                continue
+            # Свеча устарела, если её конец не позже cutoff
+            cutoff = now - days * 86400 - seconds
+            for pair, series in self._candles[interval].items():
+                index = bisect.bisect_right(series, cutoff, key=lambda candle: candle[START])
+                if index:
+                    del series[:index]
+                    removed += index
+        return removed
+
+    def candles(self, pair: str, interval: str, start: float = None, end: float = None) -> List[list]:
+        """Свечи пары, начинающиеся в [start, end)."""
+        if interval not in INTERVALS:
+            raise ValueError(f"Неизвестный интервал '{interval}'. Доступны: {', '.join(INTERVALS)}")
+        series = self._candles[interval].get(pair, [])
+        lo = 0 if start is None else bisect.bisect_left(series, start, key=lambda candle: candle[START])
+        hi = len(series) if end is None else bisect.bisect_left(series, end, key=lambda candle: candle[START])
+        return series[lo:hi]
+
+    def close_points(self, pair: str, before: float = math.inf) -> List[Tuple[float, float]]:
+        """
+        Точки (конец свечи, close), закончившиеся раньше before.
+
+        Каждый участок времени берётся из самого мелкого доступного
+        интервала: минутные свечи, раньше них — часовые, ещё раньше — дневные.
+        """
+        points: List[Tuple[float, float]] = []
+        limit = before
+        for interval, seconds in INTERVALS.items():
+            chunk = [
+                (candle[START] + seconds, candle[CLOSE])
+                for candle in self._candles[interval].get(pair, [])
+                if candle[START] + seconds < limit
+            ]
+            if chunk:
+                points = chunk + points
+                limit = chunk[0][0]
+        return points
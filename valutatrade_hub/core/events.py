@@ -0,0 +1,44 @@
+"""
+Простейшая шина событий внутри процесса.
+
+Use case'ы и сервис парсинга сообщают об изменениях (сделка, обновление
+курсов), а кеши и рейтинг подписываются на них, не завися друг от друга.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+# Типы событий
+PORTFOLIO_CHANGED = "portfolio_changed"  # payload: user_id, deltas, action
+PORTFOLIOS_CHANGED = "portfolios_changed"  # payload: changes — список (user_id, deltas, action)
+RATES_UPDATED = "rates_updated"  # payload: pairs
+
+_subscribers: Dict[str, List[Callable]] = defaultdict(list)
+
+
+def subscribe(event: str, handler: Callable) -> None:
+    """Подписывает обработчик на событие."""
+    if handler not in _subscribers[event]:
+        _subscribers[event].append(handler)
+
+
+def unsubscribe(event: str, handler: Callable) -> None:
+    """Отписывает обработчик от события."""
+    if handler in _subscribers[event]:
+        _subscribers[event].remove(handler)
+
+
+def emit(event: str, **payload) -> None:
+    """
+    Вызывает всех подписчиков события.
+
+    Ошибка в обработчике логируется и не прерывает основную операцию.
+    """
+    for handler in list(_subscribers[event]):
+        try:
+            handler(**payload)
+        except Exception as e:
+            logging.getLogger("valutatrade").error(
+                f"Ошибка в обработчике события {event}: {e}"
+            )
@@ -34,4 +34,21 @@ class ApiRequestError(ValutaTradeError):
     def __init__(self, reason: str):
         self.reason = reason
         message = f"\nОшибка при обращении к внешнему API: {reason}"
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+
+class QuoteNotFoundError(ValutaTradeError):
+    """Котировка не найдена или истекла"""
+
+    def __init__(self, quote_id: str):
+        self.quote_id = quote_id
+        message = f"\nКотировка '{quote_id}' не найдена или истекла"
+        super().__init__(message)
+
+
+class ConcurrentUpdateError(ValutaTradeError):
+    """Запись изменена другим процессом"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        message = f"\nПортфель пользователя {user_id} был изменён параллельно, повторите операцию"
+        super().__init__(message)
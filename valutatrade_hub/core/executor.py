@@ -0,0 +1,503 @@
+"""
+Исполнитель сделок, разбитый на шарды по user_id.
+
+Каждый шард — отдельный процесс с одним рабочим (ProcessPoolExecutor
+с max_workers=1), поэтому заявки одного пользователя всегда попадают в один
+процесс и исполняются в порядке поступления, а заявки разных пользователей —
+параллельно на разных ядрах, без общего GIL.
+
+Шард один раз загружает из portfolios.json портфели своих пользователей и
+держит их в памяти: сделка меняет только память процесса. Заявки приходят
+порциями; накопленные сделки шард сохраняет сам (одна запись portfolios.json
+с проверкой версий, журнал сделок, агрегаты и результаты client_order_id),
+когда их набралось executor_flush_orders или с первой несохранённой прошло
+executor_flush_seconds, и в конце пакета. Поэтому число перезаписей
+portfolios.json зависит от числа шардов и длительности пакета, а не от
+числа заявок. Фронтенд только раскладывает заявки по шардам и собирает
+результаты.
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import valutatrade_hub.constants as const
+from valutatrade_hub.core import events
+from valutatrade_hub.core.aggregates import platform_aggregates
+from valutatrade_hub.core.currencies import get_currency
+from valutatrade_hub.core.exceptions import (
+    ApiRequestError,
+    ConcurrentUpdateError,
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+)
+from valutatrade_hub.core.idempotency import order_index, params_fingerprint
+from valutatrade_hub.core.ledger import append_trades, make_trade_record
+from valutatrade_hub.core.models import Portfolio
+from valutatrade_hub.decorators import LazyLogMessage
+from valutatrade_hub.infra.metrics import registry, timer
+from valutatrade_hub.infra.settings import SettingsLoader
+
+# Поддерживаемые действия
+_ACTIONS = ("BUY", "SELL")
+
+# Состояние процесса-шарда: номер, число шардов и портфели в памяти
+_shard: Dict[str, Any] = {}
+
+logger = logging.getLogger("valutatrade")
+
+
+def shard_of(user_id: int, shards: int) -> int:
+    """Номер шарда пользователя."""
+    return hash(user_id) % shards
+
+
+def _fail(message: str) -> Dict[str, Any]:
+    return {"success": False, "message": message}
+
+
+def _unconfirmed(error: BaseException) -> Dict[str, Any]:
+    """Результат заявки, сохранение которой не подтверждено (шард упал или сохранение не удалось)."""
+    return {
+        "success": False,
+        "message": f"\nСохранение не подтверждено: {type(error).__name__}: {error}",
+        "unconfirmed": True,
+    }
+
+
+class ShardPortfolios:
+    """
+    Портфели пользователей одного шарда в памяти процесса.
+
+    versions — версии портфелей в памяти (каждая сделка увеличивает версию
+    на 1), stored — версии, которые шард последним видел в portfolios.json.
+    Если к сохранению версия в файле отличается от stored, портфель изменил
+    другой процесс: несохранённые сделки по этому пользователю отменяются,
+    а портфель перечитывается из файла. Сделки копятся в памяти, пока
+    не наступит due(), и сохраняются все сразу.
+    """
+
+    def __init__(self, index: int, shards: int):
+        self.index = index
+        self.shards = shards
+        settings = SettingsLoader()
+        self.flush_orders = settings.get("executor_flush_orders", 50_000)
+        self.flush_seconds = settings.get("executor_flush_seconds", 5)
+        self.portfolios: Dict[int, Portfolio] = {}
+        self.versions: Dict[int, int] = {}
+        self.stored: Dict[int, int] = {}
+        # Исполненные, но ещё не сохранённые сделки: (позиция, заявка, user_id, client_order_id, результат, запись журнала)
+        self._pending: List[Tuple[int, Dict[str, Any], int, Optional[str], Dict[str, Any], Dict[str, Any]]] = []
+        self._since = 0.0
+        self._queued = 0
+        self._reserved = set()
+        self._failed: Dict[int, Dict[str, Any]] = {}
+        for data in self._read():
+            if shard_of(data["user_id"], shards) == index:
+                self._set(data)
+
+    @staticmethod
+    def _read() -> List[Dict[str, Any]]:
+        if not const.PORTFOLIOS_FILE.exists():
+            return []
+        with timer("io.load_json"), const.PORTFOLIOS_FILE.open("r", encoding="utf-8") as f:
+            return json.load(f).get("portfolios", [])
+
+    def _set(self, data: Dict[str, Any]) -> None:
+        user_id = data["user_id"]
+        self.portfolios[user_id] = Portfolio.from_dict(data)
+        self.versions[user_id] = self.stored[user_id] = data.get("version", 0)
+
+    def _portfolio(self, user_id: int) -> Optional[Portfolio]:
+        """Портфель из памяти; пользователь, зарегистрированный после загрузки, дочитывается из файла."""
+        if user_id not in self.portfolios:
+            for data in self._read():
+                if data["user_id"] == user_id:
+                    self._set(data)
+                    break
+        return self.portfolios.get(user_id)
+
+    def execute(self, position: int, order: Dict[str, Any], pairs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Исполняет заявку в памяти шарда.
+
+        Результат успешной сделки окончательный только после persist():
+        при конфликте версий он заменяется ошибкой (см. take_failed).
+        """
+        queued = self._queued
+        result = self._execute(position, order, pairs)
+        if self._queued == queued:
+            # Сделки пишутся в журнал действий при сохранении (persist), остальные заявки — сразу
+            _log_order(order, result)
+        return result
+
+    def _execute(self, position: int, order: Dict[str, Any], pairs: Dict[str, Any]) -> Dict[str, Any]:
+        action = str(order.get("action", "")).upper()
+        if action not in _ACTIONS:
+            return _fail(f"\nНеизвестное действие '{order.get('action')}'")
+        try:
+            user_id = int(order["user_id"])
+            amount = float(order["amount"])
+        except (KeyError, TypeError, ValueError) as e:
+            return _fail(f"\nНеверная заявка: {e}")
+        currency_code = order.get("currency")
+
+        client_order_id = order.get("client_order_id")
+        if client_order_id:
+            if (user_id, client_order_id) in self._reserved:
+                # Повтор ключа в той же порции: сначала сохраняем исходную заявку
+                self.persist()
+            params = {"user_id": user_id, "currency_code": currency_code, "amount": amount, "quote_id": None}
+            previous = order_index.reserve(user_id, client_order_id, action, params_fingerprint(params))
+            if previous is not None:
+                if previous.get("success"):
+                    return {**previous, "replayed": True}
+                return previous
+
+        result, record = self._trade(action, user_id, currency_code, amount, pairs)
+        if record is None:
+            if client_order_id:
+                order_index.release(user_id, client_order_id)
+            return result
+
+        self.versions[user_id] += 1
+        if not self._pending:
+            self._since = time.monotonic()
+        self._pending.append((position, order, user_id, client_order_id, result, record))
+        self._queued += 1
+        if client_order_id:
+            self._reserved.add((user_id, client_order_id))
+        return result
+
+    def _trade(
+        self,
+        action: str,
+        user_id: int,
+        currency_code: Any,
+        amount: float,
+        pairs: Dict[str, Any],
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Сделка в памяти: (результат, запись журнала или None, если сделка отклонена)."""
+        if not isinstance(currency_code, str) or not currency_code.strip():
+            return _fail("Код валюты не может быть пустым"), None
+        currency_code = currency_code.strip().upper()
+        if not amount > 0:
+            return _fail("'amount' должен быть положительным числом"), None
+
+        try:
+            get_currency(currency_code)
+        except CurrencyNotFoundError as e:
+            return _fail(str(e)), None
+
+        portfolio = self._portfolio(user_id)
+        if portfolio is None:
+            return _fail("\nПортфель не найден"), None
+
+        rate_info = pairs.get(f"{currency_code}_USD")
+        if not isinstance(rate_info, dict) or "rate" not in rate_info:
+            return _fail(str(ApiRequestError(f"не удалось получить курс для {currency_code}→USD"))), None
+        rate = rate_info["rate"]
+        usd_amount = amount * rate
+
+        try:
+            usd_wallet = portfolio.get_wallet("USD")
+            if action == "BUY":
+                if usd_wallet.balance < usd_amount:
+                    raise InsufficientFundsError(available=usd_wallet.balance, required=usd_amount, code="USD")
+                if currency_code not in portfolio._wallets:
+                    portfolio.add_currency(currency_code)
+                usd_wallet.withdraw(usd_amount)
+                portfolio.get_wallet(currency_code).deposit(amount)
+                deltas = {currency_code: amount, "USD": -usd_amount}
+                message = f"\nПокупка выполнена: {amount:.4f} {currency_code} по курсу {rate:.2f} USD/{currency_code}"
+            else:
+                if currency_code not in portfolio._wallets:
+                    return _fail(f"\nВалюта {currency_code} не найдена в портфеле"), None
+                # Списание проверяет остаток до изменения кошелька
+                portfolio.get_wallet(currency_code).withdraw(amount)
+                usd_wallet.deposit(usd_amount)
+                deltas = {currency_code: -amount, "USD": usd_amount}
+                message = f"\nПродажа выполнена: {amount:.4f} {currency_code} по курсу {rate:.2f} USD/{currency_code}"
+        except (KeyError, ValueError, InsufficientFundsError) as e:
+            return _fail(str(e)), None
+
+        result = {
+            "success": True,
+            "message": message,
+            "currency_code": currency_code,
+            "amount": amount,
+            "rate": rate,
+            "base": "USD",
+        }
+        return result, make_trade_record(user_id, action, deltas, rate, currency_code)
+
+    def pending_positions(self) -> List[int]:
+        """Позиции исполненных, но ещё не сохранённых заявок."""
+        return [entry[0] for entry in self._pending]
+
+    def due(self) -> bool:
+        """Пора ли сохранять: набралось flush_orders сделок или первая ждёт flush_seconds."""
+        return bool(self._pending) and (
+            len(self._pending) >= self.flush_orders
+            or time.monotonic() - self._since >= self.flush_seconds
+        )
+
+    def persist(self) -> None:
+        """
+        Сохраняет сделки шарда: портфели, журнал, агрегаты, результаты client_order_id.
+
+        portfolios.json перезаписывается одной операцией под блокировкой файла,
+        меняются только портфели этого шарда и агрегаты платформы. Заявки
+        пишутся в журнал действий здесь, когда их итог окончателен.
+        """
+        if not self._pending:
+            return
+        from valutatrade_hub.core.usecases import safe_json_operation
+
+        touched = {user_id for _, _, user_id, _, _, _ in self._pending}
+        conflicts = set()
+        fresh: Dict[int, Dict[str, Any]] = {}
+
+        def merge(data):
+            found = set()
+            for p in data.get("portfolios", []):
+                user_id = p["user_id"]
+                if user_id not in touched:
+                    continue
+                found.add(user_id)
+                if p.get("version", 0) != self.stored[user_id]:
+                    conflicts.add(user_id)
+                    fresh[user_id] = p
+                    continue
+                p["wallets"] = self.portfolios[user_id].to_dict()["wallets"]
+                p["version"] = self.versions[user_id]
+            conflicts.update(touched - found)
+            # Агрегаты обновляются в той же записи, что и портфели
+            deltas: Dict[str, float] = {}
+            for _, _, user_id, _, _, record in self._pending:
+                if user_id not in conflicts:
+                    for code, delta in record["deltas"].items():
+                        deltas[code] = deltas.get(code, 0.0) + delta
+            platform_aggregates.apply_to(data, deltas)
+            return data
+
+        with timer("executor.persist"):
+            safe_json_operation(const.PORTFOLIOS_FILE, merge)
+
+        for user_id in touched:
+            if user_id in fresh:
+                self._set(fresh[user_id])
+            elif user_id in conflicts:
+                # Портфель удалён из файла
+                del self.portfolios[user_id], self.versions[user_id], self.stored[user_id]
+            else:
+                self.stored[user_id] = self.versions[user_id]
+
+        records = []
+        changes = []
+        for position, order, user_id, client_order_id, result, record in self._pending:
+            if user_id in conflicts:
+                result = self._failed[position] = _fail(str(ConcurrentUpdateError(user_id)))
+                if client_order_id:
+                    order_index.release(user_id, client_order_id)
+                _log_order(order, result)
+                continue
+            _log_order(order, result)
+            records.append(record)
+            changes.append((user_id, record["deltas"], record["action"]))
+            registry.inc(f"trades.{record['action'].lower()}")
+            if client_order_id:
+                order_index.complete(user_id, client_order_id, result)
+
+        append_trades(records)
+        if changes:
+            events.emit(events.PORTFOLIOS_CHANGED, changes=changes)
+        self._pending.clear()
+        self._reserved.clear()
+
+    def take_failed(self) -> Dict[int, Dict[str, Any]]:
+        """Ошибки, заменяющие результаты отменённых при сохранении сделок."""
+        failed, self._failed = self._failed, {}
+        return failed
+
+
+def _load_pairs() -> Dict[str, Any]:
+    """Курсы из rates.json (читаются один раз на порцию заявок)."""
+    if not const.RATES_FILE.exists():
+        return {}
+    try:
+        with const.RATES_FILE.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError:
+        return {}
+    return data.get("pairs", {}) if isinstance(data, dict) else {}
+
+
+def _log_order(order: Dict[str, Any], result: Dict[str, Any]) -> None:
+    """Запись в журнал действий в формате log_action."""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    success = bool(result.get("success"))
+    log_data = {
+        "timestamp": datetime.now().isoformat(),
+        "action": str(order.get("action", "")).upper(),
+        "result": "OK" if success else "ERROR",
+        "error_type": None,
+        "error_message": None if success else result.get("message", "Unknown error"),
+        "user_id": order.get("user_id"),
+        "currency_code": order.get("currency"),
+        "amount": order.get("amount"),
+    }
+    if success:
+        for key in ("rate", "base", "currency_code"):
+            if result.get(key) is not None:
+                log_data[key] = result[key]
+    logger.info(LazyLogMessage(log_data, True), extra={"fields": log_data})
+
+
+def _init_shard(index: int, shards: int) -> None:
+    _shard.update(index=index, shards=shards, book=None)
+
+
+def _run_chunk(
+    tasks: List[Tuple[int, Dict[str, Any]]],
+    flush: bool = False,
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[int]]:
+    """
+    Исполняет порцию заявок шарда; накопленные сделки сохраняет, если flush или пора (due).
+
+    Returns:
+        Результаты (позиция, результат), в том числе отменённых при сохранении
+        сделок прошлых порций, и позиции сделок, которые ещё не сохранены.
+    """
+    if _shard.get("book") is None:
+        # Портфели шарда загружаются один раз на процесс
+        _shard["book"] = ShardPortfolios(_shard["index"], _shard["shards"])
+    book: ShardPortfolios = _shard["book"]
+
+    try:
+        pairs = _load_pairs() if tasks else {}
+        results = {position: book.execute(position, order, pairs) for position, order in tasks}
+        if flush or book.due():
+            book.persist()
+        results.update(book.take_failed())
+    except Exception:
+        # Память шарда могла разойтись с файлом: следующая порция перечитает портфели
+        _shard["book"] = None
+        raise
+    return list(results.items()), book.pending_positions()
+
+
+def _run_one(order: Dict[str, Any]) -> Dict[str, Any]:
+    results, _ = _run_chunk([(0, order)], flush=True)
+    return dict(results)[0]
+
+
+def _reject(order: Any) -> Optional[Dict[str, Any]]:
+    """Результат-ошибка для заявки, которую нельзя исполнить в шарде, иначе None."""
+    if not isinstance(order, dict):
+        return _fail(f"\nНеверная заявка: ожидается объект JSON, получено {type(order).__name__}")
+    if order.get("quote_id"):
+        # Котировки живут в памяти процесса, выдавшего их; в шардах их нет
+        return _fail("\nКотировки (quote_id) не поддерживаются в пакетном исполнении")
+    try:
+        int(order["user_id"])
+    except (KeyError, TypeError, ValueError) as e:
+        return _fail(f"\nНеверная заявка: {e}")
+    return None
+
+
+def _done(result: Dict[str, Any]) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class ShardedTradeExecutor:
+    """Маршрутизирует заявки в процессы-шарды по user_id и собирает результаты."""
+
+    def __init__(self, workers: int = None, chunk_size: int = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size or SettingsLoader().get("executor_chunk_orders", 1000))
+        self._shards = [
+            ProcessPoolExecutor(max_workers=1, initializer=_init_shard, initargs=(index, self.workers))
+            for index in range(self.workers)
+        ]
+
+    def shard_for(self, user_id: int) -> int:
+        """Номер шарда пользователя."""
+        return shard_of(user_id, self.workers)
+
+    def submit(self, order: Dict[str, Any]) -> Future:
+        """Отправляет одну заявку в шард её пользователя (сохраняется сразу)."""
+        error = _reject(order)
+        if error is not None:
+            return _done(error)
+        return self._shards[self.shard_for(int(order["user_id"]))].submit(_run_one, order)
+
+    def execute_many(self, orders: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Исполняет заявки и возвращает результаты в порядке заявок.
+
+        После всех порций каждый шард сохраняет оставшиеся сделки. Если
+        порция не исполнилась или сохранение не удалось, её заявки и ещё не
+        сохранённые сделки шарда получают результат с флагом "unconfirmed".
+        """
+        orders = list(orders)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(orders)
+        routed: List[List[Tuple[int, Dict[str, Any]]]] = [[] for _ in self._shards]
+        for position, order in enumerate(orders):
+            error = _reject(order)
+            if error is None:
+                routed[self.shard_for(int(order["user_id"]))].append((position, order))
+            else:
+                # Отклонённая заявка не отправляется в шард
+                results[position] = error
+
+        # Порции одного шарда исполняются по очереди: порядок заявок пользователя сохраняется
+        chunks = [
+            (shard, tasks[start:start + self.chunk_size], False)
+            for shard, tasks in enumerate(routed)
+            for start in range(0, len(tasks), self.chunk_size)
+        ]
+        # Завершающее сохранение каждого шарда, получившего заявки
+        chunks += [(shard, [], True) for shard, tasks in enumerate(routed) if tasks]
+        futures = [self._submit_chunk(shard, chunk, flush) for shard, chunk, flush in chunks]
+
+        # Несохранённые сделки по шардам (по последнему ответу шарда)
+        pending: List[set] = [set() for _ in self._shards]
+        for future, (shard, chunk, _) in zip(futures, chunks):
+            try:
+                done, waiting = future.result()
+            except Exception as e:
+                # Процесс шарда упал (BrokenProcessPool) или сохранение не удалось
+                logger.error(f"Ошибка исполнения порции заявок в шарде: {type(e).__name__}: {e}")
+                lost = pending[shard] | {position for position, _ in chunk}
+                done, waiting = [(position, _unconfirmed(e)) for position in lost], []
+            for position, result in done:
+                results[position] = result
+            pending[shard] = set(waiting)
+        return results
+
+    def _submit_chunk(self, shard: int, chunk: List[Tuple[int, Dict[str, Any]]], flush: bool) -> Future:
+        try:
+            return self._shards[shard].submit(_run_chunk, chunk, flush)
+        except Exception as e:
+            # Пул шарда уже сломан (BrokenProcessPool): ошибка вернётся как результат порции
+            future = Future()
+            future.set_exception(e)
+            return future
+
+    def shutdown(self) -> None:
+        """Останавливает процессы-шарды."""
+        for shard in self._shards:
+            shard.shutdown()
+
+    def __enter__(self) -> "ShardedTradeExecutor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
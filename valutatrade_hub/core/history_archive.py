@@ -0,0 +1,293 @@
+"""
+Архив истории курсов: помесячные сегменты JSON Lines со сжатием.
+
+Каждый тик — одна компактная строка без повторяющихся полей записи
+exchange_rates.json (id, meta, отдельные коды валют):
+    [1718000000.0,"BTC_USD",59337.2,"CoinGecko"]
+
+Сегмент месяца (UTC) — файл rates-YYYY-MM.jsonl в каталоге history_dir.
+Текущий месяц пишется без сжатия (обновление курсов только дописывает
+строки), закрытые месяцы сжимаются gzip или lzma. Поздние тики дописываются
+в сжатый сегмент отдельным потоком — оба формата читают склеенные потоки.
+
+Чтение потоковое: сегменты вне запрошенного диапазона не открываются,
+остальные распаковываются построчно. Недописанная строка (сбой посреди
+записи) пропускается, а следующая запись начинается с новой строки.
+
+Перенос старого exchange_rates.json и пересжатие сегментов:
+    python -m valutatrade_hub.core.history_archive [--source data/exchange_rates.json] [--compression lzma]
+"""
+
+import argparse
+import gzip
+import json
+import lzma
+import os
+import re
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+import valutatrade_hub.constants as const
+
+# Тик архива: (время epoch, пара, курс, источник)
+Tick = Tuple[float, str, float, str]
+
+# Сжатие: суффикс файла -> модуль с open()
+CODECS = {"gzip": (".gz", gzip), "lzma": (".xz", lzma)}
+
+_SEGMENT_RE = re.compile(r"^rates-(\d{4})-(\d{2})\.jsonl(\.gz|\.xz)?$")
+
+
+def month_of(ts: float) -> str:
+    """Месяц (UTC) метки времени: 'YYYY-MM'."""
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m")
+
+
+def _month_bounds(month: str) -> Tuple[float, float]:
+    """Границы месяца [начало, начало следующего) в секундах epoch."""
+    year, mon = int(month[:4]), int(month[5:])
+    start = datetime(year, mon, 1, tzinfo=timezone.utc)
+    end = datetime(year + mon // 12, mon % 12 + 1, 1, tzinfo=timezone.utc)
+    return start.timestamp(), end.timestamp()
+
+
+def _parse_line(line: str) -> Optional[Tick]:
+    """Тик из строки сегмента; None для пустой или недописанной строки."""
+    try:
+        ts, pair, rate, source = json.loads(line)
+    except (ValueError, TypeError):
+        return None
+    return ts, pair, rate, source
+
+
+def _ends_with_newline(path: Path) -> bool:
+    """Заканчивается ли несжатый сегмент переводом строки (пустой файл — да)."""
+    try:
+        with open(path, "rb") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+    except FileNotFoundError:
+        return True
+
+
+def _open_segment(path: Path, mode: str):
+    """Открывает сегмент в текстовом режиме с учётом сжатия."""
+    for suffix, codec in CODECS.values():
+        if path.suffix == suffix:
+            return codec.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class HistoryArchive:
+    """Каталог помесячных сегментов истории курсов."""
+
+    def __init__(self, directory: Path = None, compression: str = None):
+        self.directory = Path(directory or const.HISTORY_DIR)
+        self.compression = compression or const.settings.get("history_compression", "gzip")
+        if self.compression not in CODECS:
+            raise ValueError(f"Неизвестное сжатие '{self.compression}'. Доступны: {', '.join(CODECS)}")
+
+    # Сегменты
+
+    def segments(self) -> List[Tuple[str, Path]]:
+        """Сегменты (месяц, путь), отсортированные по месяцу."""
+        if not self.directory.exists():
+            return []
+        found = []
+        for entry in os.scandir(self.directory):
+            match = _SEGMENT_RE.match(entry.name)
+            if match:
+                found.append((f"{match.group(1)}-{match.group(2)}", Path(entry.path)))
+        return sorted(found)
+
+    def version(self) -> tuple:
+        """Отпечаток состояния архива (имена, размеры и mtime сегментов) для кешей."""
+        result = []
+        for _month, path in self.segments():
+            stat = path.stat()
+            result.append((path.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(result)
+
+    def _segment_path(self, month: str) -> Path:
+        """Существующий сегмент месяца или путь для нового несжатого."""
+        for existing_month, path in self.segments():
+            if existing_month == month:
+                return path
+        return self.directory / f"rates-{month}.jsonl"
+
+    # Запись
+
+    def append(self, ticks: Iterable[Tick]) -> int:
+        """
+        Дописывает тики в сегменты их месяцев и сжимает закрытые месяцы.
+
+        Стоимость пропорциональна числу новых тиков, а не размеру истории.
+        """
+        by_month = defaultdict(list)
+        for ts, pair, rate, source in ticks:
+            by_month[month_of(ts)].append(
+                json.dumps([ts, pair, rate, source], ensure_ascii=False, separators=(",", ":"))
+            )
+        if not by_month:
+            return 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for month, lines in sorted(by_month.items()):
+            path = self._segment_path(month)
+            # После сбоя посреди записи сегмент может оборваться на середине строки:
+            # новые тики начинаем с новой строки (в сжатом сегменте — всегда, пустая строка пропускается)
+            prefix = "" if path.suffix == ".jsonl" and _ends_with_newline(path) else "\n"
+            with _open_segment(path, "at") as f:
+                f.write(prefix + "\n".join(lines) + "\n")
+        self.rotate()
+        return sum(len(lines) for lines in by_month.values())
+
+    def rotate(self) -> List[Path]:
+        """Сжимает несжатые сегменты всех месяцев, кроме последнего."""
+        segments = self.segments()
+        compressed = []
+        for month, path in segments[:-1]:
+            if path.suffix == ".jsonl":
+                compressed.append(self._compress(path))
+        return compressed
+
+    def _compress(self, path: Path, compression: str = None) -> Path:
+        """Сжимает сегмент (или пересжимает другим методом); возвращает новый путь."""
+        suffix, _codec = CODECS[compression or self.compression]
+        plain = path.with_name(path.name.split(".jsonl")[0] + ".jsonl")
+        target = plain.with_name(plain.name + suffix)
+        if target == path:
+            return path
+        temp_file = target.with_name("tmp-" + target.name)
+        with _open_segment(path, "rt") as src, _open_segment(temp_file, "wt") as dst:
+            for line in src:
+                dst.write(line)
+        temp_file.replace(target)
+        path.unlink()
+        return target
+
+    def drop_before(self, cutoff: float) -> int:
+        """
+        Удаляет тики старше cutoff; возвращает число удалённых тиков.
+
+        Сегменты, целиком лежащие раньше cutoff, удаляются файлом,
+        пограничный сегмент переписывается.
+        """
+        removed = 0
+        for month, path in self.segments():
+            start, end = _month_bounds(month)
+            if start >= cutoff:
+                break
+            if end <= cutoff:
+                with _open_segment(path, "rt") as f:
+                    removed += sum(1 for line in f if line.strip())
+                path.unlink()
+                continue
+
+            kept, dropped = [], 0
+            with _open_segment(path, "rt") as f:
+                for line in f:
+                    tick = _parse_line(line)
+                    if tick is None:
+                        # Пустая или недописанная строка при перезаписи отбрасывается
+                        continue
+                    if tick[0] >= cutoff:
+                        kept.append(line if line.endswith("\n") else line + "\n")
+                    else:
+                        dropped += 1
+            if dropped:
+                # Временный файл сохраняет суффикс сжатия и не считается сегментом
+                temp_file = path.with_name("tmp-" + path.name)
+                with _open_segment(temp_file, "wt") as f:
+                    f.writelines(kept)
+                temp_file.replace(path)
+                removed += dropped
+        return removed
+
+    # Чтение
+
+    def iter_ticks(self, start: float = None, end: float = None) -> Iterator[Tick]:
+        """
+        Потоково перебирает тики с временем в [start, end).
+
+        Сегменты месяцев вне диапазона не открываются.
+        """
+        for month, path in self.segments():
+            month_start, month_end = _month_bounds(month)
+            if start is not None and month_end <= start:
+                continue
+            if end is not None and month_start >= end:
+                break
+            with _open_segment(path, "rt") as f:
+                for line in f:
+                    tick = _parse_line(line)
+                    if tick is None:
+                        continue
+                    if (start is None or tick[0] >= start) and (end is None or tick[0] < end):
+                        yield tick
+
+    def size(self) -> int:
+        """Суммарный размер сегментов на диске, байт."""
+        return sum(path.stat().st_size for _month, path in self.segments())
+
+
+def ticks_from_records(records: Iterable[dict]) -> Iterator[Tick]:
+    """Тики из записей формата exchange_rates.json (некорректные пропускаются)."""
+    from valutatrade_hub.core.rate_history import parse_timestamp
+
+    for record in records:
+        try:
+            yield (
+                parse_timestamp(record["timestamp"]),
+                f"{record['from_currency']}_{record['to_currency']}",
+                float(record["rate"]),
+                record.get("source", "unknown"),
+            )
+        except (KeyError, ValueError, TypeError, AttributeError):
+            continue
+
+
+def migrate(source: Path, archive: HistoryArchive) -> Optional[int]:
+    """
+    Переносит exchange_rates.json в архив.
+
+    После переноса исходный файл переименовывается в <имя>.migrated, чтобы
+    читатели не учитывали тики дважды. Возвращает число перенесённых тиков.
+    """
+    if not source.exists():
+        return None
+    with source.open("r", encoding="utf-8") as f:
+        records = json.load(f)
+    count = archive.append(sorted(ticks_from_records(records if isinstance(records, list) else [])))
+    source.replace(source.with_name(source.name + ".migrated"))
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Перенос и сжатие архива истории курсов")
+    parser.add_argument("--source", default=str(const.HISTORY_FILE), help="Старый exchange_rates.json")
+    parser.add_argument("--dir", default=str(const.HISTORY_DIR), help="Каталог сегментов")
+    parser.add_argument("--compression", choices=list(CODECS), default=None,
+                        help="Сжатие (по умолчанию из config.json); существующие сегменты пересжимаются")
+    args = parser.parse_args()
+
+    archive = HistoryArchive(Path(args.dir), args.compression)
+    source = Path(args.source)
+    size_before = (source.stat().st_size if source.exists() else 0) + archive.size()
+
+    count = migrate(source, archive)
+    if count is not None:
+        print(f"Перенесено тиков: {count} из {source}")
+    # Закрытые месяцы пересжимаются выбранным методом
+    for _month, path in archive.segments()[:-1]:
+        archive._compress(path)
+
+    size_after = archive.size()
+    print(f"Сегментов: {len(archive.segments())}, размер: {size_before:,} → {size_after:,} байт")
+
+
+if __name__ == "__main__":
+    main()
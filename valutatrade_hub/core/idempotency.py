@@ -0,0 +1,227 @@
+"""
+Идемпотентность торговых запросов по client_order_id.
+
+Индекс хранится в SQLite (orders.db). Перед исполнением заявка
+резервируется по ключу (user_id, client_order_id); повтор того же ключа
+в пределах окна получает сохранённый результат и не трогает портфели.
+
+Вместе с ключом хранятся действие и отпечаток параметров заявки: тот же
+client_order_id с другим действием, валютой или суммой отклоняется, а не
+получает чужой результат. Резерв без результата (процесс упал между
+резервом и сохранением) считается брошенным через lease_seconds и
+переиспользуется.
+"""
+
+import hashlib
+import inspect
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+import valutatrade_hub.constants as const
+from valutatrade_hub.infra.settings import SettingsLoader
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    user_id INTEGER NOT NULL,
+    client_order_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    result TEXT,
+    params_hash TEXT,
+    PRIMARY KEY (user_id, client_order_id)
+)
+"""
+
+# Ответ на повтор заявки, которая ещё исполняется
+_IN_PROGRESS = {"success": False, "message": "\nЗаявка с таким client_order_id уже исполняется"}
+
+# Проверка размера индекса (COUNT(*) — полный проход таблицы) раз в столько сохранений
+_TRIM_EVERY = 1000
+
+# Ответ на повтор ключа с другими параметрами
+_MISMATCH = {"success": False, "message": "\nclient_order_id уже использован для другой заявки"}
+
+
+def params_fingerprint(params: Dict[str, Any]) -> str:
+    """Отпечаток параметров заявки (строки без учёта регистра и пробелов)."""
+    normalized = {
+        name: value.strip().upper() if isinstance(value, str) else value
+        for name, value in params.items()
+    }
+    payload = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class OrderDedupIndex:
+    """Ограниченный по времени и размеру индекс исполненных заявок."""
+
+    def __init__(
+        self,
+        path: Path,
+        window_seconds: float = 86400,
+        max_entries: int = 100_000,
+        lease_seconds: float = 60,
+    ):
+        self.path = Path(path)
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.lease_seconds = lease_seconds
+        self._completed = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(orders)")}
+            if "params_hash" not in columns:
+                # Индекс, созданный до появления отпечатка параметров
+                conn.execute("ALTER TABLE orders ADD COLUMN params_hash TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS orders_created ON orders (created_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Отдельное соединение на операцию: безопасно для потоков и процессов."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def reserve(
+        self,
+        user_id: int,
+        client_order_id: str,
+        action: str,
+        params_hash: str = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Резервирует ключ заявки.
+
+        Returns:
+            None, если ключ новый (или брошенный резерв переиспользован) и
+            заявку нужно исполнить; иначе — результат исходной заявки или
+            ошибка, если ключ занят заявкой с другими параметрами.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM orders WHERE created_at < ?", (now - self.window_seconds,))
+            try:
+                conn.execute(
+                    "INSERT INTO orders (user_id, client_order_id, action, created_at, params_hash) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (user_id, client_order_id, action, now, params_hash),
+                )
+                return None
+            except sqlite3.IntegrityError:
+                row = conn.execute(
+                    "SELECT action, params_hash, created_at, result FROM orders "
+                    "WHERE user_id = ? AND client_order_id = ?",
+                    (user_id, client_order_id),
+                ).fetchone()
+            if row is None:
+                return dict(_IN_PROGRESS)
+            stored_action, stored_hash, created_at, result = row
+            if result is None and created_at < now - self.lease_seconds:
+                # Брошенный резерв (заявка не исполнялась): забирает тот, чьё обновление прошло первым
+                claimed = conn.execute(
+                    "UPDATE orders SET action = ?, created_at = ?, params_hash = ? "
+                    "WHERE user_id = ? AND client_order_id = ? AND result IS NULL AND created_at = ?",
+                    (action, now, params_hash, user_id, client_order_id, created_at),
+                ).rowcount
+                if claimed:
+                    return None
+                return dict(_IN_PROGRESS)
+            if stored_action != action or (stored_hash and params_hash and stored_hash != params_hash):
+                return dict(_MISMATCH)
+        if result is None:
+            return dict(_IN_PROGRESS)
+        return json.loads(result)
+
+    def complete(self, user_id: int, client_order_id: str, result: Dict[str, Any]) -> None:
+        """Сохраняет результат исполненной заявки."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE orders SET result = ? WHERE user_id = ? AND client_order_id = ?",
+                (json.dumps(result, ensure_ascii=False), user_id, client_order_id),
+            )
+            # Устаревшие по окну записи удаляет reserve() по индексу created_at;
+            # ограничение по числу записей проверяется только изредка
+            self._completed += 1
+            if self._completed % _TRIM_EVERY == 0:
+                self._trim(conn)
+
+    def release(self, user_id: int, client_order_id: str) -> None:
+        """Снимает резерв (заявка не исполнена, её можно повторить)."""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM orders WHERE user_id = ? AND client_order_id = ?",
+                (user_id, client_order_id),
+            )
+
+    def _trim(self, conn: sqlite3.Connection) -> None:
+        """Удаляет самые старые записи сверх max_entries (между проверками индекс может превысить его на _TRIM_EVERY)."""
+        (count,) = conn.execute("SELECT COUNT(*) FROM orders").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM orders WHERE rowid IN "
+                "(SELECT rowid FROM orders ORDER BY created_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+
+_settings = SettingsLoader()
+order_index = OrderDedupIndex(
+    path=Path(_settings.get("idempotency_db", const.DATA_DIR / "orders.db")),
+    window_seconds=_settings.get("idempotency_window_seconds", 86400),
+    max_entries=_settings.get("idempotency_max_entries", 100_000),
+    lease_seconds=_settings.get("idempotency_lease_seconds", 60),
+)
+
+
+def idempotent(action: str):
+    """
+    Декоратор для торговых use case'ов с необязательным client_order_id.
+
+    Успешный результат сохраняется в индексе; при ошибке резерв снимается,
+    чтобы клиент мог повторить заявку. Аргументы (в том числе позиционные)
+    сопоставляются с сигнатурой функции.
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            try:
+                bound = signature.bind(*args, **kwargs)
+            except TypeError:
+                return func(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            client_order_id = params.pop("client_order_id", None)
+            if not client_order_id:
+                return func(*args, **kwargs)
+
+            user_id = params.get("user_id")
+            previous = order_index.reserve(user_id, client_order_id, action, params_fingerprint(params))
+            if previous is not None:
+                if previous.get("success"):
+                    return {**previous, "replayed": True}
+                return previous
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                order_index.release(user_id, client_order_id)
+                raise
+
+            if isinstance(result, dict) and result.get("success"):
+                order_index.complete(user_id, client_order_id, result)
+            else:
+                order_index.release(user_id, client_order_id)
+            return result
+
+        return wrapper
+    return decorator
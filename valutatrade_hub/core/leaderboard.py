@@ -0,0 +1,218 @@
+"""
+Рейтинг портфелей по стоимости.
+
+Все портфели читаются за один проход и раскладываются в матрицу
+пользователи × валюты (по колонке array('d') на валюту). Стоимость всех
+портфелей — произведение матрицы на вектор курсов к USD, топ-K выбирается
+кучей. Сделки и обновления курсов применяются инкрементально.
+
+События доходят только внутри процесса, поэтому рейтинг помнит время
+изменения portfolios.json и rates.json, с которым он согласован. Если файл
+изменил другой процесс (batch, планировщик, другой CLI), рейтинг
+перестраивается (портфели) или пересчитывается по новым курсам.
+"""
+
+import heapq
+import json
+import math
+import operator
+import threading
+from array import array
+from itertools import repeat
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import valutatrade_hub.constants as const
+from valutatrade_hub.core import events
+from valutatrade_hub.core.valuation import usd_rate
+
+
+def _mtime_ns(path: const.Path) -> int:
+    """Время изменения файла (0, если файла нет)."""
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _load(path: const.Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, dict) else {}
+
+
+def iter_portfolios(path: const.Path = None) -> Iterator[Dict[str, Any]]:
+    """Читает portfolios.json один раз и отдаёт портфели по одному."""
+    yield from _load(path or const.PORTFOLIOS_FILE).get("portfolios", [])
+
+
+def load_usernames(path: const.Path = None) -> Dict[int, str]:
+    """Соответствие user_id → username из users.json."""
+    return {u["user_id"]: u["username"] for u in _load(path or const.USERS_FILE).get("users", [])}
+
+
+class Leaderboard:
+    """Матрица балансов и стоимость портфелей в USD."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.user_ids: List[int] = []
+        self._rows: Dict[int, int] = {}
+        self._columns: Dict[str, array] = {}
+        self._rates: Dict[str, float] = {}
+        self._pairs: Dict[str, Any] = {}
+        self.values_usd = array("d")
+
+    @classmethod
+    def build(cls, portfolios: Iterable[Dict[str, Any]], pairs: Dict[str, Any]) -> "Leaderboard":
+        """Строит рейтинг по потоку портфелей и текущим курсам."""
+        board = cls()
+        board._pairs = pairs
+        for portfolio in portfolios:
+            row = board._add_row(portfolio["user_id"])
+            for code, info in portfolio.get("wallets", {}).items():
+                board._column(code)[row] = float(info["balance"])
+        board._rates = {code: board._known(usd_rate(pairs, code)) for code in board._columns}
+        board._recompute()
+        return board
+
+    # Внутренние операции
+
+    @staticmethod
+    def _known(rate: float) -> float:
+        """Неизвестный курс считается нулевым (валюта не учитывается)."""
+        return 0.0 if math.isnan(rate) else rate
+
+    def _add_row(self, user_id: int) -> int:
+        row = len(self.user_ids)
+        self.user_ids.append(user_id)
+        self._rows[user_id] = row
+        self.values_usd.append(0.0)
+        for column in self._columns.values():
+            column.append(0.0)
+        return row
+
+    def _column(self, code: str) -> array:
+        if code not in self._columns:
+            self._columns[code] = array("d", [0.0]) * len(self.user_ids)
+            self._rates[code] = self._known(usd_rate(self._pairs, code))
+        return self._columns[code]
+
+    def _recompute(self) -> None:
+        """Стоимость всех портфелей: матрица балансов × вектор курсов."""
+        values = array("d", [0.0]) * len(self.user_ids)
+        for code, column in self._columns.items():
+            rate = self._rates.get(code, 0.0)
+            if rate:
+                values = array("d", map(operator.add, values, map(operator.mul, column, repeat(rate))))
+        self.values_usd = values
+
+    # Инкрементальные обновления
+
+    def apply_trade(self, user_id: int, deltas: Dict[str, float], **_payload) -> None:
+        """Применяет изменения балансов одного пользователя за O(число валют сделки)."""
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                row = self._add_row(user_id)
+            for code, delta in deltas.items():
+                self._column(code)[row] += delta
+                self.values_usd[row] += delta * self._rates.get(code, 0.0)
+
+    def apply_trades(self, changes, **_payload) -> None:
+        """Применяет пакет изменений [(user_id, deltas, action), ...]."""
+        for user_id, deltas, _action in changes:
+            self.apply_trade(user_id, deltas)
+
+    def apply_rates(self, pairs: Dict[str, Any], **_payload) -> None:
+        """
+        Применяет новые курсы: для каждой изменившейся валюты стоимость
+        сдвигается на колонку балансов × изменение курса.
+        """
+        with self._lock:
+            self._pairs = pairs
+            for code, column in self._columns.items():
+                new_rate = self._known(usd_rate(pairs, code))
+                change = new_rate - self._rates.get(code, 0.0)
+                if change:
+                    self.values_usd = array(
+                        "d", map(operator.add, self.values_usd, map(operator.mul, column, repeat(change)))
+                    )
+                self._rates[code] = new_rate
+
+    # Запросы
+
+    def top(self, k: int) -> List[Tuple[int, float]]:
+        """Топ-K пользователей по стоимости портфеля в USD."""
+        with self._lock:
+            values = self.values_usd
+            best = heapq.nlargest(k, range(len(values)), key=values.__getitem__)
+            return [(self.user_ids[i], values[i]) for i in best]
+
+    def usd_rate(self, code: str) -> float:
+        """Курс валюты к USD, использованный в рейтинге (NaN, если неизвестен)."""
+        return usd_rate(self._pairs, code)
+
+
+_leaderboard: Optional[Leaderboard] = None
+# Время изменения portfolios.json и rates.json, с которым согласован рейтинг
+_portfolios_mtime = 0
+_rates_mtime = 0
+
+
+def _on_portfolio_changed(user_id: int, deltas: Dict[str, float], **_payload) -> None:
+    global _portfolios_mtime
+    _leaderboard.apply_trade(user_id, deltas)
+    # Событие приходит после записи файла этим процессом
+    _portfolios_mtime = _mtime_ns(const.PORTFOLIOS_FILE)
+
+
+def _on_portfolios_changed(changes, **_payload) -> None:
+    global _portfolios_mtime
+    _leaderboard.apply_trades(changes)
+    _portfolios_mtime = _mtime_ns(const.PORTFOLIOS_FILE)
+
+
+def _on_rates_updated(pairs: Dict[str, Any], **_payload) -> None:
+    global _rates_mtime
+    _leaderboard.apply_rates(pairs)
+    _rates_mtime = _mtime_ns(const.RATES_FILE)
+
+
+def get_leaderboard() -> Leaderboard:
+    """
+    Возвращает общий рейтинг процесса, строя его при первом обращении.
+
+    Изменения этого процесса применяются через события сделок и обновления
+    курсов; изменения файлов другими процессами — по времени изменения:
+    новые портфели перестраивают рейтинг, новые курсы пересчитывают стоимость.
+    """
+    global _leaderboard, _portfolios_mtime, _rates_mtime
+    portfolios_mtime = _mtime_ns(const.PORTFOLIOS_FILE)
+    if _leaderboard is not None and portfolios_mtime != _portfolios_mtime:
+        reset_leaderboard()
+    if _leaderboard is None:
+        rates_mtime = _mtime_ns(const.RATES_FILE)
+        pairs = _load(const.RATES_FILE).get("pairs", {})
+        _leaderboard = Leaderboard.build(iter_portfolios(), pairs)
+        _portfolios_mtime, _rates_mtime = portfolios_mtime, rates_mtime
+        events.subscribe(events.PORTFOLIO_CHANGED, _on_portfolio_changed)
+        events.subscribe(events.PORTFOLIOS_CHANGED, _on_portfolios_changed)
+        events.subscribe(events.RATES_UPDATED, _on_rates_updated)
+        return _leaderboard
+
+    rates_mtime = _mtime_ns(const.RATES_FILE)
+    if rates_mtime != _rates_mtime:
+        _leaderboard.apply_rates(_load(const.RATES_FILE).get("pairs", {}))
+        _rates_mtime = rates_mtime
+    return _leaderboard
+
+
+def reset_leaderboard() -> None:
+    """Сбрасывает рейтинг; при следующем обращении он будет построен заново."""
+    global _leaderboard
+    if _leaderboard is not None:
+        events.unsubscribe(events.PORTFOLIO_CHANGED, _on_portfolio_changed)
+        events.unsubscribe(events.PORTFOLIOS_CHANGED, _on_portfolios_changed)
+        events.unsubscribe(events.RATES_UPDATED, _on_rates_updated)
+        _leaderboard = None
@@ -0,0 +1,93 @@
+"""
+Журнал сделок (trade ledger).
+
+Каждое изменение кошельков (регистрация, покупка, продажа) дописывается
+одной строкой JSON в trades.jsonl. Запись только добавляется в конец файла,
+поэтому не требует перечитывания и перезаписи всего журнала.
+"""
+
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+import valutatrade_hub.constants as const
+
+
+def make_trade_record(
+    user_id: int,
+    action: str,
+    deltas: Dict[str, float],
+    rate: Optional[float] = None,
+    currency_code: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Формирует запись о сделке.
+
+    Args:
+        user_id: ID пользователя.
+        action: Тип операции (REGISTER, BUY, SELL).
+        deltas: Изменения балансов по валютам, например {"BTC": 0.5, "USD": -30000.0}.
+        rate: Курс, по которому выполнена сделка (если есть).
+        currency_code: Торгуемая валюта (если есть).
+    """
+    now = time.time()
+    return {
+        "ts": now,
+        "timestamp": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+        "user_id": user_id,
+        "action": action,
+        "currency": currency_code,
+        "rate": rate,
+        "deltas": deltas,
+    }
+
+
+def append_trades(records: List[Dict[str, Any]]) -> None:
+    """Дописывает несколько записей в журнал одной операцией записи."""
+    if not records:
+        return
+    const.TRADES_FILE.parent.mkdir(exist_ok=True, parents=True)
+    payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    with const.TRADES_FILE.open("a", encoding="utf-8") as f:
+        f.write(payload)
+
+
+def append_trade(
+    user_id: int,
+    action: str,
+    deltas: Dict[str, float],
+    rate: Optional[float] = None,
+    currency_code: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Добавляет запись о сделке в журнал и возвращает её."""
+    record = make_trade_record(user_id, action, deltas, rate, currency_code)
+    append_trades([record])
+    return record
+
+
+def load_trades(user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Читает журнал сделок (опционально только для одного пользователя).
+
+    Записи возвращаются в порядке времени.
+    """
+    if not const.TRADES_FILE.exists():
+        return []
+
+    trades = []
+    with const.TRADES_FILE.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Недописанная строка (например, при сбое) — пропускаем
+                continue
+            if user_id is not None and record.get("user_id") != user_id:
+                continue
+            trades.append(record)
+
+    trades.sort(key=lambda r: r["ts"])
+    return trades
@@ -0,0 +1,79 @@
+"""
+Блокировки для безопасных параллельных сделок.
+
+- Внутри процесса: полосатые (striped) блокировки — пул RLock,
+  пользователь выбирает блокировку по user_id % N.
+- Между процессами: fcntl.flock на файле блокировки пользователя.
+- Запись общего JSON-файла: короткая блокировка файла на время
+  чтения→слияния→записи.
+
+Сделки разных пользователей выполняются параллельно и пересекаются только
+на короткой записи portfolios.json; сделки одного пользователя
+выполняются строго по очереди.
+"""
+
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Iterator
+import valutatrade_hub.constants as const
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессные блокировки недоступны
+    fcntl = None
+
+
+LOCKS_DIR = const.DATA_DIR / "locks"
+
+
+class StripedLocks:
+    """Фиксированный пул блокировок, распределённых по ключу."""
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def lock_for(self, key: Any) -> threading.RLock:
+        """Блокировка, отвечающая за ключ."""
+        return self._locks[hash(key) % len(self._locks)]
+
+
+_user_locks = StripedLocks()
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Эксклюзивная межпроцессная блокировка на файле path."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def user_lock(user_id: int) -> Iterator[None]:
+    """Блокировка пользователя: сначала внутри процесса, затем между процессами."""
+    with _user_locks.lock_for(user_id):
+        with file_lock(LOCKS_DIR / f"user-{user_id}.lock"):
+            yield
+
+
+def data_file_lock(data_file: Path):
+    """Блокировка общего файла данных (portfolios.json, users.json)."""
+    return file_lock(LOCKS_DIR / f"{data_file.name}.lock")
+
+
+def locked_by_user(func: Callable) -> Callable:
+    """Декоратор: выполняет use case под блокировкой пользователя user_id."""
+    @wraps(func)
+    def wrapper(*args, **kwargs) -> Any:
+        user_id = args[0] if args else kwargs.get("user_id")
+        with user_lock(user_id):
+            return func(*args, **kwargs)
+    return wrapper
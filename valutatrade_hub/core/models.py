@@ -8,6 +8,58 @@ from datetime import datetime # для обработки даты и време
 from typing import Dict, Any # для аннотаций
 import valutatrade_hub.constants as const # Импорт констант с путями к файлам JSON
 from valutatrade_hub.core.exceptions import InsufficientFundsError # Импортируем исключение
+from valutatrade_hub.infra.settings import SettingsLoader # Настройки KDF
+from valutatrade_hub.infra.metrics import timed # Метрики задержек
+
+
+# Хеширование паролей
+@timed("auth.hash_password")
+def hash_password(password: str, salt: str, kdf: str = None) -> str:
+    """
+    Хеширует пароль с солью выбранной функцией (KDF).
+
+    Поддерживаются:
+    - sha256 — исходный формат, хранится как hex без префикса;
+    - pbkdf2_sha256 — "pbkdf2_sha256$<итерации>$<hex>";
+    - scrypt — "scrypt$<n>$<r>$<p>$<hex>".
+    Параметры берутся из config.json (password_kdf, password_kdf_iterations,
+    password_scrypt_n).
+    """
+    settings = SettingsLoader()
+    kdf = kdf or settings.get("password_kdf", "sha256")
+    if kdf == "pbkdf2_sha256":
+        iterations = int(settings.get("password_kdf_iterations", 100_000))
+        return _pbkdf2(password, salt, iterations)
+    if kdf == "scrypt":
+        n = int(settings.get("password_scrypt_n", 2 ** 14))
+        return _scrypt(password, salt, n, 8, 1)
+    salted = f"{salt}{password}".encode("utf-8")
+    return hashlib.sha256(salted).hexdigest()
+
+
+@timed("auth.verify_password")
+def verify_password_hash(password: str, salt: str, stored: str) -> bool:
+    """Проверяет пароль по сохранённому хешу с учётом его формата."""
+    parts = stored.split("$")
+    if parts[0] == "pbkdf2_sha256" and len(parts) == 3:
+        candidate = _pbkdf2(password, salt, int(parts[1]))
+    elif parts[0] == "scrypt" and len(parts) == 5:
+        candidate = _scrypt(password, salt, int(parts[1]), int(parts[2]), int(parts[3]))
+    else:
+        candidate = hash_password(password, salt, kdf="sha256")
+    return secrets.compare_digest(candidate, stored)
+
+
+def _pbkdf2(password: str, salt: str, iterations: int) -> str:
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations)
+    return f"pbkdf2_sha256${iterations}${digest.hex()}"
+
+
+def _scrypt(password: str, salt: str, n: int, r: int, p: int) -> str:
+    digest = hashlib.scrypt(
+        password.encode("utf-8"), salt=salt.encode("utf-8"), n=n, r=r, p=p, maxmem=256 * 1024 * 1024
+    )
+    return f"scrypt${n}${r}${p}${digest.hex()}"
 
 
 class User:
@@ -69,9 +121,8 @@ class User:
         """Устанавливает пароль: проверяет длину и хеширует."""
         if len(value) < 4:
             raise ValueError("\nПароль должен быть не короче 4 символов")
-        # Хешируем пароль с солью
-        salted = f"{self._salt}{value}".encode("utf-8")
-        self._hashed_password = hashlib.sha256(salted).hexdigest()
+        # Хешируем пароль с солью (KDF из настроек)
+        self._hashed_password = hash_password(value, self._salt)
 
     @property # Геттер для даты регистрации
     def registration_date(self) -> str:
@@ -83,10 +134,8 @@ class User:
     def verify_password(self, password: str) -> bool: # Метод проверки пароля пользователя
         """Проверяет, совпадает ли введённый пароль с сохранённым хешем"""
         try:
-             # Собираем salt + password и считаем хеш
-            salted = f"{self._salt}{password}".encode("utf-8")
-            test_hash = hashlib.sha256(salted).hexdigest()
-            return test_hash == self._hashed_password
+            # Формат хеша (sha256/pbkdf2/scrypt) определяется по префиксу
+            return verify_password_hash(password, self._salt, self._hashed_password)
         except ValueError:
             return False
 
@@ -218,21 +267,25 @@ class Portfolio:
         return self._wallets[currency_code]
 
     
-    def get_total_value(self, base_currency: str = "USD") -> float:
+    def get_total_value(self, base_currency: str = "USD", pairs: Dict[str, Any] = None) -> float:
         """
         Возвращает общую стоимость портфеля в указанной базовой валюте.
         1. Считаем всё в USD
         2. Конвертируем USD → base_currency
+
+        Если курсы (pairs из rates.json) уже загружены, их можно передать,
+        чтобы не перечитывать файл.
         """
         try:
-            # Загружаем курсы
-            with open(const.RATES_FILE, 'r', encoding='utf-8') as f:
-                rates_data = json.load(f)
-            
-            if not isinstance(rates_data, dict) or "pairs" not in rates_data:
-                return 0.0
-            
-            pairs = rates_data.get("pairs", {})
+            if pairs is None:
+                # Загружаем курсы
+                with open(const.RATES_FILE, 'r', encoding='utf-8') as f:
+                    rates_data = json.load(f)
+
+                if not isinstance(rates_data, dict) or "pairs" not in rates_data:
+                    return 0.0
+
+                pairs = rates_data.get("pairs", {})
             
             # 1. Считаем всё в USD
             total_usd = 0.0
@@ -0,0 +1,105 @@
+"""
+Зафиксированные котировки (RFQ).
+
+Команда quote фиксирует курс валюты к USD на время TTL и выдаёт ID.
+Сделки с --quote исполняются по этому курсу, не перечитывая rates.json.
+Котировка принадлежит запросившему её пользователю и одноразовая: успешная
+сделка по ней удаляет её из таблицы. Котировки хранятся
+только в памяти процесса, поэтому пакетное исполнение (batch) их не
+принимает.
+"""
+
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from valutatrade_hub.core.exceptions import QuoteNotFoundError
+from valutatrade_hub.infra.settings import SettingsLoader
+
+
+@dataclass(frozen=True)
+class Quote:
+    """Курс валюты к USD, зафиксированный до expires_at."""
+
+    quote_id: str
+    currency_code: str
+    rate: float
+    created_at: float
+    expires_at: float
+    user_id: Optional[int] = None  # Владелец котировки
+
+    @property
+    def seconds_left(self) -> float:
+        """Сколько секунд котировка ещё действует."""
+        return max(0.0, self.expires_at - time.time())
+
+
+class QuoteBook:
+    """Таблица котировок с TTL."""
+
+    def __init__(self, ttl_seconds: float = 30):
+        self.ttl_seconds = ttl_seconds
+        self._quotes: Dict[str, Quote] = {}
+        self._lock = threading.Lock()
+
+    def create(self, currency_code: str, rate: float, user_id: int = None) -> Quote:
+        """Фиксирует курс для пользователя user_id и возвращает новую котировку."""
+        now = time.time()
+        quote = Quote(
+            quote_id=secrets.token_hex(8),
+            currency_code=currency_code,
+            rate=rate,
+            created_at=now,
+            expires_at=now + self.ttl_seconds,
+            user_id=user_id,
+        )
+        with self._lock:
+            self._purge(now)
+            self._quotes[quote.quote_id] = quote
+        return quote
+
+    def get(self, quote_id: str, user_id: int = None) -> Quote:
+        """
+        Возвращает действующую котировку пользователя user_id.
+
+        Raises:
+            QuoteNotFoundError: если котировки нет, она истекла или выдана
+                другому пользователю (чужие ID не раскрываются).
+        """
+        with self._lock:
+            quote = self._quotes.get(quote_id)
+            if quote is None or quote.expires_at <= time.time():
+                self._quotes.pop(quote_id, None)
+                raise QuoteNotFoundError(quote_id)
+            if quote.user_id != user_id:
+                raise QuoteNotFoundError(quote_id)
+            return quote
+
+    def consume(self, quote_id: str, user_id: int = None) -> bool:
+        """
+        Удаляет котировку пользователя после сделки по ней.
+
+        Сделки одного пользователя выполняются под его блокировкой
+        (locked_by_user), поэтому между get() и consume() котировку
+        никто другой использовать не может. Возвращает False, если
+        котировки уже нет.
+        """
+        with self._lock:
+            quote = self._quotes.get(quote_id)
+            if quote is None or quote.user_id != user_id:
+                return False
+            del self._quotes[quote_id]
+            return True
+
+    def _purge(self, now: float) -> None:
+        """Удаляет истёкшие котировки."""
+        expired = [qid for qid, q in self._quotes.items() if q.expires_at <= now]
+        for qid in expired:
+            del self._quotes[qid]
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+
+quote_book = QuoteBook(ttl_seconds=SettingsLoader().get("quote_ttl_seconds", 30))
@@ -0,0 +1,288 @@
+"""
+Колоночное представление истории курсов.
+
+История хранится в архиве сегментов (history_archive) и в старом
+exchange_rates.json; для расчётов по времени она
+преобразуется в отсортированные массивы (array('d')) по каждой паре:
+времена в секундах epoch и соответствующие курсы.
+"""
+
+import bisect
+import json
+import math
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import valutatrade_hub.constants as const
+from valutatrade_hub.core.candles import CandleStore
+from valutatrade_hub.core.history_archive import HistoryArchive, ticks_from_records
+from valutatrade_hub.infra.profiling import history_memory
+
+# Последняя загруженная история: (отпечаток файлов истории и свечей, RateHistory)
+_cached: Optional[Tuple[tuple, "RateHistory"]] = None
+_cache_lock = threading.Lock()
+
+
+def _mtime_ns(path: const.Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def parse_timestamp(value: str) -> float:
+    """Переводит ISO-строку времени в секунды epoch."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _iter_all_ticks(path: const.Path = None, archive_dir: const.Path = None) -> Iterator[tuple]:
+    """Тики архива и старого exchange_rates.json (если файлы есть)."""
+    if archive_dir is not None:
+        yield from HistoryArchive(archive_dir).iter_ticks()
+    if path is not None and path.exists():
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            return
+        yield from ticks_from_records(data if isinstance(data, list) else [])
+
+
+class RateHistory:
+    """История курсов: для каждой пары — отсортированные массивы (время, курс)."""
+
+    def __init__(self, series: Dict[str, Tuple[array, array]]):
+        self._series = series
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "RateHistory":
+        """Строит историю из записей формата exchange_rates.json."""
+        return cls.from_ticks(ticks_from_records(records))
+
+    @classmethod
+    def from_ticks(cls, ticks: Iterable[tuple]) -> "RateHistory":
+        """Строит историю из тиков архива (время, пара, курс, ...)."""
+        raw: Dict[str, List[Tuple[float, float]]] = {}
+        for tick in ticks:
+            raw.setdefault(tick[1], []).append((tick[0], tick[2]))
+
+        series = {}
+        for pair, points in raw.items():
+            points.sort()
+            series[pair] = (
+                array("d", (t for t, _ in points)),
+                array("d", (r for _, r in points)),
+            )
+        return cls(series)
+
+    @classmethod
+    def load(
+        cls,
+        path: const.Path = None,
+        candles_path: const.Path = None,
+        archive_dir: const.Path = None,
+    ) -> "RateHistory":
+        """
+        Загружает историю: архив сегментов и старый exchange_rates.json.
+
+        Без аргументов читаются history_dir, history_file и candles_file.
+        Период до первого сырого тика пары дополняется закрытиями свечей
+        OHLC: сырые тики хранятся только за окно retention.
+        """
+        if path is None:
+            path = const.HISTORY_FILE
+            candles_path = candles_path or const.CANDLES_FILE
+            archive_dir = archive_dir or const.HISTORY_DIR
+        with history_memory.track():
+            history = cls.from_ticks(_iter_all_ticks(path, archive_dir))
+        if candles_path is not None and candles_path.exists():
+            history._prepend_candles(CandleStore.load(candles_path))
+        return history
+
+    @classmethod
+    def cached(cls, path: const.Path = None) -> "RateHistory":
+        """
+        Как load(), но повторно использует уже построенный индекс,
+        пока файлы истории и свечей не изменились.
+        """
+        global _cached
+        key = (
+            path,
+            _mtime_ns(path or const.HISTORY_FILE),
+            _mtime_ns(const.CANDLES_FILE),
+            HistoryArchive(const.HISTORY_DIR).version() if path is None else (),
+        )
+        with _cache_lock:
+            if _cached is not None and _cached[0] == key:
+                return _cached[1]
+        history = cls.load(path)
+        with _cache_lock:
+            _cached = (key, history)
+        return history
+
+    def _prepend_candles(self, store: CandleStore) -> None:
+        """Добавляет закрытия свечей перед первым сырым тиком каждой пары."""
+        for pair in store.pairs:
+            times, rates = self.series(pair)
+            points = store.close_points(pair, before=times[0] if times else math.inf)
+            if points:
+                self._series[pair] = (
+                    array("d", (t for t, _ in points)) + times,
+                    array("d", (r for _, r in points)) + rates,
+                )
+
+    @property
+    def pairs(self) -> List[str]:
+        """Список пар, для которых есть история."""
+        return list(self._series)
+
+    def series(self, pair: str) -> Tuple[array, array]:
+        """Возвращает массивы (времена, курсы) для пары или пустые массивы."""
+        return self._series.get(pair, (array("d"), array("d")))
+
+    def usd_series(self, currency_code: str) -> Tuple[array, array]:
+        """
+        Возвращает ряд курсов currency→USD.
+
+        Используется прямая пара X_USD, при её отсутствии — обратная USD_X.
+        """
+        if currency_code == "USD":
+            return array("d"), array("d")
+        times, rates = self.series(f"{currency_code}_USD")
+        if times:
+            return times, rates
+        times, rates = self.series(f"USD_{currency_code}")
+        return times, array("d", (1.0 / r if r > 0 else math.nan for r in rates))
+
+    def align_usd(self, currency_code: str, grid: array) -> array:
+        """
+        Выравнивает курс currency→USD по сетке времени (последнее известное значение).
+
+        До первого известного тика значение — NaN.
+        """
+        if currency_code == "USD":
+            return array("d", [1.0]) * len(grid)
+        times, rates = self.usd_series(currency_code)
+        return forward_fill(times, rates, grid)
+
+    # Курс на момент времени
+
+    def _tick_at(self, pair: str, at: float) -> Optional[Tuple[float, float]]:
+        """Последний тик пары не позже at: (время, курс) или None. O(log n)."""
+        times, rates = self.series(pair)
+        index = bisect.bisect_right(times, at) - 1
+        if index < 0:
+            return None
+        return times[index], rates[index]
+
+    def rate_at(self, from_currency: str, to_currency: str, at: float) -> Optional[Dict[str, Any]]:
+        """
+        Курс from→to на момент at (последний известный тик).
+
+        Порядок поиска: прямая пара, обратная пара, кросс-курс через USD.
+        Возвращает {"rate", "tick_time", "method"}; tick_time — время
+        самого старого из использованных тиков. None, если данных нет.
+        """
+        if from_currency == to_currency:
+            return {"rate": 1.0, "tick_time": at, "method": "identity"}
+
+        tick = self._tick_at(f"{from_currency}_{to_currency}", at)
+        if tick:
+            return {"rate": tick[1], "tick_time": tick[0], "method": "direct"}
+
+        tick = self._tick_at(f"{to_currency}_{from_currency}", at)
+        if tick and tick[1] > 0:
+            return {"rate": 1.0 / tick[1], "tick_time": tick[0], "method": "inverse"}
+
+        legs = []
+        for code in (from_currency, to_currency):
+            if code == "USD":
+                legs.append((at, 1.0))
+                continue
+            leg = self._tick_at(f"{code}_USD", at)
+            if leg is None:
+                inverse = self._tick_at(f"USD_{code}", at)
+                if inverse and inverse[1] > 0:
+                    leg = (inverse[0], 1.0 / inverse[1])
+            if leg is None:
+                return None
+            legs.append(leg)
+        (from_time, from_usd), (to_time, to_usd) = legs
+        if to_usd <= 0:
+            return None
+        return {"rate": from_usd / to_usd, "tick_time": min(from_time, to_time), "method": "cross_usd"}
+
+    def _usd_leg(self, currency_code: str, grid: array) -> array:
+        """Курс currency→USD на сетке, как нога кросс-курса в rate_at: X_USD, иначе USD_X."""
+        if currency_code == "USD":
+            return array("d", [1.0]) * len(grid)
+        values = forward_fill(*self.series(f"{currency_code}_USD"), grid)
+        if _has_nan(values):
+            inverse = forward_fill(*self.series(f"USD_{currency_code}"), grid)
+            _fill_nan(values, (1.0 / r if r > 0 else math.nan for r in inverse))
+        return values
+
+    def rates_at(self, requests: Iterable[Tuple[str, str, float]]) -> List[float]:
+        """
+        Курсы для списка запросов (from, to, at) в исходном порядке.
+
+        Запросы группируются по паре валют и сортируются по времени, после
+        чего каждая группа выравнивается одним проходом (forward_fill) —
+        без отдельного поиска на каждый запрос. Порядок поиска тот же, что
+        в rate_at, и выбирается для каждого запроса: запросы раньше первого
+        тика прямой пары заполняются по обратной паре или кросс-курсу через
+        USD. Неизвестный курс — NaN.
+        """
+        requests = list(requests)
+        result = array("d", [math.nan]) * len(requests)
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for index, (from_currency, to_currency, _at) in enumerate(requests):
+            groups.setdefault((from_currency, to_currency), []).append(index)
+
+        for (from_currency, to_currency), indexes in groups.items():
+            indexes.sort(key=lambda i: requests[i][2])
+            grid = array("d", (requests[i][2] for i in indexes))
+            if from_currency == to_currency:
+                values = array("d", [1.0]) * len(grid)
+            else:
+                values = forward_fill(*self.series(f"{from_currency}_{to_currency}"), grid)
+                if _has_nan(values):
+                    inverse = forward_fill(*self.series(f"{to_currency}_{from_currency}"), grid)
+                    _fill_nan(values, (1.0 / r if r > 0 else math.nan for r in inverse))
+                if _has_nan(values):
+                    from_usd = self._usd_leg(from_currency, grid)
+                    to_usd = self._usd_leg(to_currency, grid)
+                    _fill_nan(values, (f / t if t > 0 else math.nan for f, t in zip(from_usd, to_usd)))
+            for i, value in zip(indexes, values):
+                result[i] = value
+        return list(result)
+
+
+def _has_nan(values: array) -> bool:
+    return any(math.isnan(value) for value in values)
+
+
+def _fill_nan(values: array, fallback: Iterable[float]) -> None:
+    """Заменяет NaN в values значениями fallback на тех же позициях."""
+    for i, value in enumerate(fallback):
+        if math.isnan(values[i]):
+            values[i] = value
+
+
+def forward_fill(times: array, values: array, grid: array, default: float = math.nan) -> array:
+    """
+    Значения ступенчатой функции (times, values) в точках сетки grid.
+
+    Сетка и ряд отсортированы, поэтому выравнивание выполняется одним
+    проходом двумя указателями за O(len(grid) + len(times)).
+    """
+    result = array("d", [default]) * len(grid)
+    j = -1
+    n = len(times)
+    for i, t in enumerate(grid):
+        while j + 1 < n and times[j + 1] <= t:
+            j += 1
+        if j >= 0:
+            result[i] = values[j]
+    return result
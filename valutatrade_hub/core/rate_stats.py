@@ -0,0 +1,262 @@
+"""
+Скользящая статистика курсов: доходность, SMA/EMA и реализованная волатильность.
+
+Для каждой пары хранится окно последних window курсов и лог-доходностей
+в кольцевых буферах (array('d')) и текущие суммы по ним, поэтому новый
+тик обрабатывается за O(1). Первичный расчёт по истории выполняется
+операциями над массивами целиком. Состояние сохраняется в stats_file
+(компактный JSON), чтобы show-rates читал готовые значения.
+
+Волатильность — реализованная за окно: sqrt(Σ r²), где r — лог-доходности
+между соседними тиками.
+"""
+
+import json
+import math
+import operator
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import valutatrade_hub.constants as const
+
+
+class PairStats:
+    """Скользящая статистика одной пары."""
+
+    def __init__(self, window: int, ema_span: int):
+        self.window = window
+        self.alpha = 2.0 / (ema_span + 1)
+        self.prices = array("d", [0.0]) * window
+        self.returns = array("d", [0.0]) * window
+        self.count = 0  # Число принятых тиков
+        self.last_time = -math.inf
+        self.last_rate = math.nan
+        self.ema = math.nan
+        self.alerting = False  # Волатильность выше порога на момент последней проверки
+        self._price_sum = 0.0
+        self._return_sum = 0.0
+        self._return_sq_sum = 0.0
+
+    # Обновление
+
+    def update(self, ts: float, rate: float) -> bool:
+        """Добавляет тик за O(1); тики не новее последнего и курсы ≤ 0 пропускаются."""
+        if ts <= self.last_time or not rate > 0:
+            return False
+        slot = self.count % self.window
+
+        if self.count >= self.window:
+            self._price_sum -= self.prices[slot]
+        self.prices[slot] = rate
+        self._price_sum += rate
+
+        if self.count:
+            if self.count > self.window:
+                old = self.returns[slot]
+                self._return_sum -= old
+                self._return_sq_sum -= old * old
+            log_return = math.log(rate / self.last_rate)
+            self.returns[slot] = log_return
+            self._return_sum += log_return
+            self._return_sq_sum += log_return * log_return
+            self.ema += self.alpha * (rate - self.ema)
+        else:
+            self.ema = rate
+
+        self.count += 1
+        self.last_time = ts
+        self.last_rate = rate
+        if self.count % self.window == 0:
+            # Раз за оборот буфера пересчитываем суммы, чтобы не копилась ошибка округления
+            self._resum()
+        return True
+
+    def _resum(self) -> None:
+        # Незаполненные слоты буферов равны 0.0 и не влияют на суммы
+        self._price_sum = math.fsum(self.prices)
+        self._return_sum = math.fsum(self.returns)
+        self._return_sq_sum = math.fsum(map(operator.mul, self.returns, self.returns))
+
+    @classmethod
+    def from_series(cls, times: array, rates: array, window: int, ema_span: int) -> "PairStats":
+        """
+        Строит состояние по всей истории пары операциями над массивами.
+
+        Результат совпадает с последовательными вызовами update().
+        """
+        stats = cls(window, ema_span)
+        points: List[Tuple[float, float]] = []
+        for t, r in zip(times, rates):
+            if r > 0 and (not points or t > points[-1][0]):
+                points.append((t, r))
+        if not points:
+            return stats
+        times = array("d", (t for t, _ in points))
+        rates = array("d", (r for _, r in points))
+        n = len(rates)
+
+        # Лог-доходности всей истории одним проходом map
+        log_returns = array("d", map(math.log, map(operator.truediv, rates[1:], rates[:-1])))
+
+        # Раскладываем последние window значений по слотам, как это сделал бы update()
+        for index in range(max(0, n - window), n):
+            stats.prices[index % window] = rates[index]
+            if index:
+                stats.returns[index % window] = log_returns[index - 1]
+
+        ema = rates[0]
+        alpha = stats.alpha
+        for rate in rates[1:]:
+            ema += alpha * (rate - ema)
+
+        stats.count = n
+        stats.last_time = times[-1]
+        stats.last_rate = rates[-1]
+        stats.ema = ema
+        stats._resum()
+        return stats
+
+    # Значения
+
+    @property
+    def sma(self) -> float:
+        """Простая скользящая средняя за окно."""
+        filled = min(self.count, self.window)
+        return self._price_sum / filled if filled else math.nan
+
+    @property
+    def window_return(self) -> float:
+        """Доходность за окно: exp(Σ r) - 1."""
+        if self.count < 2:
+            return math.nan
+        return math.exp(self._return_sum) - 1
+
+    @property
+    def last_return(self) -> float:
+        """Доходность последнего тика."""
+        if self.count < 2:
+            return math.nan
+        return math.exp(self.returns[(self.count - 1) % self.window]) - 1
+
+    @property
+    def volatility(self) -> float:
+        """Реализованная волатильность за окно: sqrt(Σ r²)."""
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(max(self._return_sq_sum, 0.0))
+
+    def summary(self) -> Dict[str, float]:
+        """Текущие значения статистики."""
+        return {
+            "rate": self.last_rate,
+            "sma": self.sma,
+            "ema": self.ema,
+            "return": self.window_return,
+            "last_return": self.last_return,
+            "volatility": self.volatility,
+            "ticks": self.count,
+        }
+
+    # Сериализация
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "last_time": self.last_time,
+            "last_rate": self.last_rate,
+            "ema": self.ema,
+            "prices": list(self.prices),
+            "returns": list(self.returns),
+            "alerting": self.alerting,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, window: int, ema_span: int) -> "PairStats":
+        stats = cls(window, ema_span)
+        if len(data.get("prices", [])) != window:
+            raise ValueError("размер окна изменился")
+        stats.count = int(data["count"])
+        stats.last_time = float(data["last_time"])
+        stats.last_rate = float(data["last_rate"])
+        stats.ema = float(data["ema"])
+        stats.prices = array("d", data["prices"])
+        stats.returns = array("d", data["returns"])
+        stats.alerting = bool(data.get("alerting", False))
+        stats._resum()
+        return stats
+
+
+class RateStats:
+    """Скользящая статистика по всем парам."""
+
+    def __init__(self, window: int = 24, ema_span: int = 12):
+        self.window = window
+        self.ema_span = ema_span
+        self.pairs: Dict[str, PairStats] = {}
+
+    @classmethod
+    def from_history(cls, history, window: int = 24, ema_span: int = 12) -> "RateStats":
+        """Строит статистику по RateHistory."""
+        stats = cls(window, ema_span)
+        for pair in history.pairs:
+            times, rates = history.series(pair)
+            stats.pairs[pair] = PairStats.from_series(times, rates, window, ema_span)
+        return stats
+
+    def update(self, rates: Dict[str, float], ts: float) -> None:
+        """Добавляет курсы одного обновления: O(1) на пару."""
+        for pair, rate in rates.items():
+            stats = self.pairs.get(pair)
+            if stats is None:
+                stats = self.pairs[pair] = PairStats(self.window, self.ema_span)
+            stats.update(ts, float(rate))
+
+    def get(self, pair: str) -> Optional[Dict[str, float]]:
+        """Значения статистики пары или None."""
+        stats = self.pairs.get(pair)
+        return stats.summary() if stats is not None and stats.count else None
+
+    def ranked(self, key: str = "volatility", pairs: Iterable[str] = None) -> List[Tuple[str, Dict[str, float]]]:
+        """Пары по убыванию key; пары без значения — в конце."""
+        rows = [(pair, self.get(pair)) for pair in (pairs if pairs is not None else self.pairs)]
+        rows = [(pair, summary) for pair, summary in rows if summary is not None]
+        return sorted(rows, key=lambda row: math.inf if math.isnan(row[1][key]) else -row[1][key])
+
+    # Файл состояния
+
+    @classmethod
+    def load(cls, path: Path = None, window: int = 24, ema_span: int = 12) -> Optional["RateStats"]:
+        """
+        Загружает состояние из файла.
+
+        Возвращает None, если файла нет или он построен с другими параметрами
+        окна — тогда статистику нужно пересчитать по истории.
+        """
+        path = Path(path or const.STATS_FILE)
+        if not path.exists():
+            return None
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("window") != window or data.get("ema_span") != ema_span:
+                return None
+            stats = cls(window, ema_span)
+            for pair, state in data.get("pairs", {}).items():
+                stats.pairs[pair] = PairStats.from_dict(state, window, ema_span)
+            return stats
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            return None
+
+    def save(self, path: Path = None) -> None:
+        """Атомарно сохраняет состояние."""
+        path = Path(path or const.STATS_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "window": self.window,
+            "ema_span": self.ema_span,
+            "pairs": {pair: stats.to_dict() for pair, stats in self.pairs.items()},
+        }
+        temp_file = path.with_suffix(".tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        temp_file.replace(path)
@@ -0,0 +1,100 @@
+"""
+Хранилище сессионных токенов.
+
+После входа пользователь получает токен; последующие команды проверяют
+его поиском в словаре за O(1) вместо повторного чтения users.json и
+хеширования пароля. Токены хранятся в sessions.json в виде SHA-256
+(сам токен на диск не попадает); файл перечитывается, только если его
+изменил другой процесс.
+"""
+
+import hashlib
+import json
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+import valutatrade_hub.constants as const
+from valutatrade_hub.core.locks import data_file_lock
+from valutatrade_hub.infra.settings import SettingsLoader
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class SessionStore:
+    """Токены сессий с истечением срока действия."""
+
+    def __init__(self, path: Path, ttl_seconds: float = 86400):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._mtime_ns = None
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self) -> None:
+        """Перечитывает файл, если он изменился с последней загрузки."""
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except OSError:
+            self._sessions, self._mtime_ns = {}, None
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                self._sessions = json.load(f).get("sessions", {})
+        except (json.JSONDecodeError, AttributeError):
+            self._sessions = {}
+        self._mtime_ns = mtime_ns
+
+    def _modify(self, change) -> None:
+        """Изменяет сессии под блокировкой файла и сохраняет их (без истёкших)."""
+        with self._lock, data_file_lock(self.path):
+            self._mtime_ns = None
+            self._reload_if_changed()
+            change(self._sessions)
+            now = time.time()
+            self._sessions = {k: v for k, v in self._sessions.items() if v["expires_at"] > now}
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.path.with_suffix(".tmp")
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump({"sessions": self._sessions}, f, ensure_ascii=False)
+            temp_file.replace(self.path)
+            self._mtime_ns = self.path.stat().st_mtime_ns
+
+    def issue(self, user_id: int, username: str) -> str:
+        """Выдаёт новый токен пользователю."""
+        token = secrets.token_urlsafe(32)
+        session = {
+            "user_id": user_id,
+            "username": username,
+            "expires_at": time.time() + self.ttl_seconds,
+        }
+        self._modify(lambda sessions: sessions.__setitem__(_token_key(token), session))
+        return token
+
+    def validate(self, token: str) -> Optional[Dict[str, Any]]:
+        """Возвращает сессию по токену или None, если токен неизвестен или истёк."""
+        if not token:
+            return None
+        with self._lock:
+            self._reload_if_changed()
+            session = self._sessions.get(_token_key(token))
+        if session is None or session["expires_at"] <= time.time():
+            return None
+        return session
+
+    def revoke(self, token: str) -> None:
+        """Отзывает токен."""
+        self._modify(lambda sessions: sessions.pop(_token_key(token), None))
+
+
+_settings = SettingsLoader()
+session_store = SessionStore(
+    path=Path(_settings.get("sessions_file", const.DATA_DIR / "sessions.json")),
+    ttl_seconds=_settings.get("session_ttl_seconds", 86400),
+)
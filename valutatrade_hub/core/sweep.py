@@ -0,0 +1,140 @@
+"""
+Перебор параметров стратегий бэктеста в пуле процессов.
+
+Сетка времени и курсы записываются один раз в блок shared memory
+(multiprocessing.shared_memory); рабочие процессы подключаются к нему
+при старте и читают массивы без копирования. Задача пула — только
+небольшой объект стратегии, история курсов не сериализуется на каждый
+прогон. Рабочий возвращает сводку прогона, а не кривую капитала.
+При выходе рабочий сам освобождает представления и закрывает своё
+отображение блока; удаляет блок (unlink) только родительский процесс.
+"""
+
+import itertools
+import math
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+from typing import Any, Dict, List, Sequence, Tuple
+from valutatrade_hub.core import backtest
+
+# Ключи ранжирования: показатель сводки -> чем больше, тем лучше
+RANK_KEYS: Dict[str, Tuple[str, bool]] = {
+    "return": ("return", True),
+    "drawdown": ("max_drawdown", False),
+    "trades": ("trades", True),
+}
+
+# Состояние рабочего процесса: подключённый блок и представления массивов
+_worker: Dict[str, Any] = {}
+
+
+class SharedPrices:
+    """
+    Сетка и курсы X→USD в одном блоке shared memory.
+
+    Раскладка: [сетка | курс 1 | курс 2 | ...], по count чисел double.
+    """
+
+    def __init__(self, grid: Sequence[float], prices: Dict[str, Sequence[float]]):
+        self.codes = list(prices)
+        self.count = len(grid)
+        size = max(1, (len(self.codes) + 1) * self.count * 8)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        view = self._shm.buf.cast("d")
+        for k, column in enumerate([grid] + [prices[code] for code in self.codes]):
+            view[k * self.count:(k + 1) * self.count] = array("d", column)
+        view.release()
+
+    @property
+    def spec(self) -> Tuple[str, int, List[str]]:
+        """Описание блока для подключения из другого процесса."""
+        return self._shm.name, self.count, self.codes
+
+    def close(self) -> None:
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedPrices":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def attach(spec: Tuple[str, int, List[str]]):
+    """Подключается к блоку: (shm, сетка, {код: курсы}) — представления без копирования."""
+    name, count, codes = spec
+    shm = shared_memory.SharedMemory(name=name)
+    view = shm.buf.cast("d")
+    grid = view[:count]
+    prices = {code: view[(k + 1) * count:(k + 2) * count] for k, code in enumerate(codes)}
+    return shm, grid, prices
+
+
+def _init_worker(spec: Tuple[str, int, List[str]]) -> None:
+    _worker["shm"], _worker["grid"], _worker["prices"] = attach(spec)
+    # atexit в процессах пула не вызывается: финализаторы multiprocessing — вызываются
+    util.Finalize(None, _detach, exitpriority=10)
+
+
+def _detach() -> None:
+    """Освобождает представления массивов и закрывает блок в рабочем процессе."""
+    shm = _worker.pop("shm", None)
+    if shm is None:
+        return
+    _worker.pop("grid").release()
+    for view in _worker.pop("prices").values():
+        view.release()
+    shm.close()
+
+
+def _run_one(task: Tuple[int, backtest.Strategy, float]) -> Tuple[int, Dict[str, float]]:
+    index, strategy, initial_usd = task
+    result = backtest.run_backtest(strategy, _worker["grid"], _worker["prices"], initial_usd)
+    return index, result.summary()
+
+
+def expand_grid(param_values: Dict[str, List[str]]) -> List[Dict[str, str]]:
+    """Все сочетания значений параметров (декартово произведение)."""
+    names = list(param_values)
+    return [dict(zip(names, values)) for values in itertools.product(*param_values.values())]
+
+
+def run_sweep(
+    strategies: Sequence[backtest.Strategy],
+    grid: Sequence[float],
+    prices: Dict[str, Sequence[float]],
+    initial_usd: float,
+    workers: int = None,
+) -> List[Dict[str, float]]:
+    """
+    Прогоняет стратегии по общим курсам; сводки — в порядке strategies.
+
+    workers=1 — прогон в текущем процессе без пула и shared memory.
+    """
+    if workers == 1 or len(strategies) < 2:
+        return [backtest.run_backtest(strategy, grid, prices, initial_usd).summary() for strategy in strategies]
+
+    tasks = [(index, strategy, initial_usd) for index, strategy in enumerate(strategies)]
+    summaries: List[Dict[str, float]] = [{}] * len(tasks)
+    # Мелкие порции выравнивают нагрузку: прогоны разной длительности
+    chunksize = max(1, len(tasks) // ((workers or 4) * 8))
+    with SharedPrices(grid, prices) as shared:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.spec,)) as pool:
+            for index, summary in pool.map(_run_one, tasks, chunksize=chunksize):
+                summaries[index] = summary
+    return summaries
+
+
+def rank(rows: List[Dict[str, Any]], key: str = "return") -> List[Dict[str, Any]]:
+    """Сортирует строки результатов по ключу RANK_KEYS; NaN — в конце."""
+    field, descending = RANK_KEYS[key]
+
+    def sort_key(row: Dict[str, Any]) -> float:
+        value = row[field]
+        if value is None or math.isnan(value):
+            return math.inf
+        return -value if descending else value
+
+    return sorted(rows, key=sort_key)
@@ -1,7 +1,8 @@
 """Бизнес-логика"""
 
 import json # Для работы с JSON
-from typing import Dict, Any # для аннотаций
+import csv # Выгрузка результатов бэктеста
+from typing import Dict, Any, List # для аннотаций
 from valutatrade_hub.infra.settings import SettingsLoader # Синглтон
 import valutatrade_hub.constants as const # Импорт констант
 from valutatrade_hub.core.models import User, Portfolio, Wallet # Импорт основных классов программы
@@ -9,10 +10,51 @@ from valutatrade_hub.core.currencies import get_currency
 from valutatrade_hub.core.exceptions import ( # Импортируем исключения
     InsufficientFundsError,
     CurrencyNotFoundError,
-    ApiRequestError)
+    ApiRequestError,
+    QuoteNotFoundError,
+    ConcurrentUpdateError)
+from valutatrade_hub.core.ledger import ( # Журнал сделок
+    append_trade,
+    append_trades,
+    make_trade_record,
+    load_trades)
+from valutatrade_hub.core.bulk_import import ( # Массовый импорт пользователей
+    read_users_csv,
+    validate_rows,
+    hash_passwords)
+from valutatrade_hub.core import events # Шина событий
+from valutatrade_hub.core.cache import valuation_cache # Кеш оценок портфелей
+from valutatrade_hub.core.leaderboard import ( # Рейтинг портфелей
+    get_leaderboard,
+    reset_leaderboard,
+    load_usernames)
+from valutatrade_hub.core.rate_history import RateHistory, parse_timestamp # История курсов
+from valutatrade_hub.core.rate_stats import RateStats # Скользящая статистика курсов
+from valutatrade_hub.core.candles import ( # Свечи OHLC
+    CandleStore,
+    INTERVALS,
+    START, OPEN, HIGH, LOW, CLOSE, TICKS,
+)
+from valutatrade_hub.core import backtest # Бэктест стратегий
+from valutatrade_hub.core import sweep # Перебор параметров бэктеста
+from valutatrade_hub.core.quotes import quote_book # Зафиксированные котировки
+from valutatrade_hub.core.idempotency import idempotent # Идемпотентность заявок
+from valutatrade_hub.core.locks import data_file_lock, locked_by_user # Блокировки
+from valutatrade_hub.core.sessions import session_store # Токены сессий
+from valutatrade_hub.core.executor import ShardedTradeExecutor # Параллельное исполнение заявок
+from valutatrade_hub.core.aggregates import platform_aggregates # Агрегаты по платформе
+from valutatrade_hub.core.valuation import ( # Оценка портфеля во времени
+    parse_duration,
+    build_grid,
+    balance_steps,
+    value_series,
+    usd_rate)
 from valutatrade_hub.decorators import log_action # Импортируем декоратор для логирования
+from valutatrade_hub.infra.metrics import registry, timed, timer # Метрики задержек
 import logging # Библиотека для логирования
 import time # Время
+import math # Для проверки NaN
+from datetime import datetime # Для форматирования времени
 
 
 # Вспомогательные функции для работы с JSON
@@ -20,7 +62,7 @@ def load_json(path: const.Path) -> Dict[str, Any]:
     """Загружает JSON из файла, возвращает пустой словарь, если файла нет."""
     if not path.exists():
         return {}
-    with path.open("r", encoding="utf-8") as f:
+    with timer("io.load_json"), path.open("r", encoding="utf-8") as f:
         return json.load(f)
 
 
@@ -31,25 +73,38 @@ def save_json(path: const.Path, data: Dict[str, Any]) -> None:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
 # Функция для безопасной записи
+@timed("io.safe_json_operation")
 def safe_json_operation(file_path: const.Path, operation_func) -> Any:
-    """Безопасная операция чтение→модификация→запись."""
+    """
+    Безопасная операция чтение→модификация→запись.
+
+    Выполняется под межпроцессной блокировкой файла, запись атомарная
+    (через временный файл), поэтому читатели без блокировки никогда не
+    видят недописанный файл. Если operation_func вернула None,
+    файл не перезаписывается.
+    """
     try:
-        # Чтение
-        if not file_path.exists():
-            data = {}
-        else:
-            with file_path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-        
-        # Модификация
-        new_data = operation_func(data)
-        
-        # Запись
-        file_path.parent.mkdir(exist_ok=True, parents=True)
-        with file_path.open("w", encoding="utf-8") as f:
-            json.dump(new_data, f, ensure_ascii=False, indent=2)
-        
-        return new_data
+        with data_file_lock(file_path):
+            # Чтение
+            if not file_path.exists():
+                data = {}
+            else:
+                with file_path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+
+            # Модификация
+            new_data = operation_func(data)
+            if new_data is None:
+                return data
+
+            # Запись
+            file_path.parent.mkdir(exist_ok=True, parents=True)
+            temp_file = file_path.with_suffix(".tmp")
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump(new_data, f, ensure_ascii=False, indent=2)
+            temp_file.replace(file_path)
+
+            return new_data
         
     except Exception as e:
         logger = logging.getLogger("valutatrade")
@@ -57,52 +112,134 @@ def safe_json_operation(file_path: const.Path, operation_func) -> Any:
         raise
 
 
+# Фиксация изменения кошельков
+def record_wallet_change(
+    user_id: int,
+    action: str,
+    deltas: Dict[str, float],
+    rate: float = None,
+    currency_code: str = None,
+) -> None:
+    """Пишет сделку в журнал и оповещает подписчиков (кеши, рейтинг)."""
+    append_trade(user_id, action, deltas, rate, currency_code)
+    registry.inc(f"trades.{action.lower()}")
+    events.emit(events.PORTFOLIO_CHANGED, user_id=user_id, deltas=deltas, action=action)
+
+
+# Курс для сделки
+@timed("rates.lookup")
+def _load_usd_rate(currency_code: str) -> float:
+    """
+    Читает курс currency_code→USD из rates.json.
+
+    Raises:
+        ApiRequestError: если файл повреждён или курса нет.
+    """
+    rates_data = load_json(const.RATES_FILE)
+    if not isinstance(rates_data, dict):
+        raise ApiRequestError("файл rates.json повреждён или пустой")
+
+    # Ищем пару currency_code → USD
+    pair = f"{currency_code}_USD"
+    rate_info = rates_data.get("pairs", {}).get(pair)
+
+    if rate_info is None:
+        raise ApiRequestError(f"не удалось получить курс для {currency_code}→USD")
+
+    if not isinstance(rate_info, dict) or "rate" not in rate_info:
+        raise ApiRequestError(f"неверный формат курса для {currency_code}→USD")
+
+    return rate_info["rate"]
+
+
+def _trade_rate(currency_code: str, quote_id: str = None, user_id: int = None) -> float:
+    """
+    Курс для сделки: зафиксированный в котировке или текущий из rates.json.
+
+    Raises:
+        QuoteNotFoundError: если котировка не найдена, истекла или выдана другому пользователю.
+        ApiRequestError: если котировка выдана на другую валюту или курса нет.
+    """
+    if not quote_id:
+        return _load_usd_rate(currency_code)
+
+    quote = quote_book.get(quote_id, user_id)
+    if quote.currency_code != currency_code:
+        raise ApiRequestError(f"котировка {quote_id} выдана для {quote.currency_code}, а не {currency_code}")
+    return quote.rate
+
+
+def _quote_currency(currency_code: str, quote_id: str = None, user_id: int = None) -> str:
+    """Если валюта не указана, берёт её из котировки."""
+    if currency_code or not quote_id:
+        return currency_code
+    try:
+        return quote_book.get(quote_id, user_id).currency_code
+    except QuoteNotFoundError:
+        return currency_code
+
 
 # 1. Команда регистрации
+@timed("usecase.register_user")
 @log_action(action="REGISTER", verbose=True) 
 def register_user(username: str, password: str) -> Dict[str, Any]:
     """Регистрирует нового пользователя."""
     try:
-        users_data = load_json(const.USERS_FILE)
-        users = users_data.get("users", [])
-
-        # Проверка: username не пустой и уникален
+        # Проверка: username не пустой
         username = username.strip()
 
-        for user in users:
-            if user["username"] == username:
-                return {"success": False, "message": f"\nИмя пользователя '{username}' уже занято"}
-
-        # Генерируем user_id
-        user_id = 1
-        if users:
-            user_id = max(u["user_id"] for u in users) + 1
-
-        # Создаём User 
+        # Создаём User заранее, чтобы хеширование пароля не держало блокировку
         user = User(
-            user_id=user_id,
+            user_id=0,
             username=username,
             password=password,
         )
+        registered = {}
+
+        def add_user(data):
+            users = data.get("users", [])
+
+            # Проверка: username уникален
+            for u in users:
+                if u["username"] == username:
+                    return None
+
+            # Генерируем user_id
+            user_id = 1
+            if users:
+                user_id = max(u["user_id"] for u in users) + 1
+
+            record = user.to_dict()
+            record["user_id"] = user_id
+            users.append(record)
+            data["users"] = users
+            registered["user_id"] = user_id
+            return data
 
         # Сохраняем пользователя
-        users.append(user.to_dict())
-        save_json(const.USERS_FILE, {"users": users})
+        safe_json_operation(const.USERS_FILE, add_user)
+        if "user_id" not in registered:
+            return {"success": False, "message": f"\nИмя пользователя '{username}' уже занято"}
+        user_id = registered["user_id"]
 
         # Создаём портфель
         portfolio = Portfolio(user_id = user_id, wallets={})
 
-        # Добавляем USD-кошелёк и пополняем на 100 000
+        # Добавляем USD-кошелёк и пополняем на 100 000
         portfolio.add_currency("USD")
         wallet_usd = portfolio.get_wallet("USD")
         wallet_usd.deposit(100000.0)
 
         # Сохраняем портфель в JSON
-        portfolios_data = load_json(const.PORTFOLIOS_FILE)
-        portfolios = portfolios_data.get("portfolios", [])
-        portfolios.append(portfolio.to_dict())
-        save_json(const.PORTFOLIOS_FILE, {"portfolios": portfolios})
+        def add_portfolio(data):
+            portfolios = data.get("portfolios", [])
+            portfolios.append({**portfolio.to_dict(), "version": 1})
+            data["portfolios"] = portfolios
+            platform_aggregates.apply_to(data, {"USD": wallet_usd.balance}, new_portfolios=1)
+            return data
 
+        safe_json_operation(const.PORTFOLIOS_FILE, add_portfolio)
+        record_wallet_change(user_id, "REGISTER", {"USD": wallet_usd.balance})
 
         return {
             "success": True,
@@ -118,7 +255,93 @@ def register_user(username: str, password: str) -> Dict[str, Any]:
         logger.error(f"Неожиданная ошибка при регистрации: {e}")
         return {"success": False, "message": "\nОшибка при регистрации"}
 
+# 1.1. Массовый импорт пользователей
+@timed("usecase.import_users")
+@log_action(action="IMPORT_USERS")
+def import_users(file_path: str, workers: int = None) -> Dict[str, Any]:
+    """
+    Импортирует пользователей из CSV (username,password).
+
+    Пароли хешируются в пуле процессов, ID выделяются одним диапазоном,
+    пользователи и портфели со стартовым USD-балансом записываются
+    одной операцией на каждый файл.
+    """
+    started = time.perf_counter()
+    try:
+        rows = read_users_csv(file_path)
+    except (OSError, ValueError) as e:
+        return {"success": False, "message": str(e)}
+
+    existing = {u["username"] for u in load_json(const.USERS_FILE).get("users", [])}
+    valid, errors = validate_rows(rows, existing, const.MIN_PASSWORD_LENGTH or 4)
+    hashed = hash_passwords([row["password"] for row in valid], workers)
+
+    registration_date = datetime.now().isoformat()
+    imported = []
+
+    def add_users(data):
+        users = data.get("users", [])
+        # Повторная проверка под блокировкой: файл мог измениться
+        taken = {u["username"] for u in users}
+        next_id = max((u["user_id"] for u in users), default=0) + 1
+        for row, (salt, hashed_password) in zip(valid, hashed):
+            if row["username"] in taken:
+                errors.append(f"имя '{row['username']}' уже занято")
+                continue
+            users.append({
+                "user_id": next_id,
+                "username": row["username"],
+                "hashed_password": hashed_password,
+                "salt": salt,
+                "registration_date": registration_date,
+            })
+            taken.add(row["username"])
+            imported.append(next_id)
+            next_id += 1
+        data["users"] = users
+        return data
+
+    safe_json_operation(const.USERS_FILE, add_users)
+
+    balance = float(const.STARTING_BALANCE)
+
+    def add_portfolios(data):
+        portfolios = data.get("portfolios", [])
+        for user_id in imported:
+            portfolios.append({"user_id": user_id, "wallets": {"USD": {"balance": balance}}, "version": 1})
+        data["portfolios"] = portfolios
+        platform_aggregates.apply_to(data, {"USD": balance * len(imported)}, new_portfolios=len(imported))
+        return data
+
+    if imported:
+        safe_json_operation(const.PORTFOLIOS_FILE, add_portfolios)
+        append_trades([make_trade_record(user_id, "REGISTER", {"USD": balance}) for user_id in imported])
+        events.emit(
+            events.PORTFOLIOS_CHANGED,
+            changes=[(user_id, {"USD": balance}, "REGISTER") for user_id in imported],
+        )
+
+    elapsed = time.perf_counter() - started
+    speed = len(imported) / elapsed if elapsed else 0.0
+    lines = [
+        f"\nИмпортировано пользователей: {len(imported)} из {len(rows)}",
+        f"Время: {elapsed:.2f} с ({speed:.0f} пользователей/с)",
+    ]
+    if errors:
+        lines.append(f"Пропущено: {len(errors)}")
+        lines.extend(f"   - {error}" for error in errors[:20])
+
+    return {
+        "success": True,
+        "message": "\n".join(lines),
+        "imported": len(imported),
+        "errors": errors,
+        "users_per_second": speed,
+    }
+
+
 # 2. Команда входа в систему
+@timed("usecase.login_user")
 @log_action(action="LOGIN", verbose=True) 
 def login_user(username: str, password: str) -> Dict[str, Any]:
     """Входит в систему под пользователем"""
@@ -142,17 +365,52 @@ def login_user(username: str, password: str) -> Dict[str, Any]:
     if not user.verify_password(password):
         return {"success": False, "message": "\nНеверный пароль"}
 
+    # Выдаём токен, чтобы следующие вызовы обходились без пароля
+    token = session_store.issue(user.user_id, user.username)
+
     return {
         "success": True,
         "user_id": user.user_id,
         "username": user.username,
-        "message": f"\nВы вошли как: {username}"
+        "token": token,
+        "message": f"\nВы вошли как: {username}\nТокен сессии: {token}"
+    }
+
+
+# 2.1. Вход по токену сессии
+@timed("usecase.resume_session")
+def resume_session(token: str) -> Dict[str, Any]:
+    """Проверяет токен сессии (O(1), без чтения users.json и хеширования)."""
+    session = session_store.validate(token)
+    if session is None:
+        return {"success": False, "message": "\nТокен недействителен или истёк"}
+    return {
+        "success": True,
+        "user_id": session["user_id"],
+        "username": session["username"],
+        "token": token,
+        "message": f"\nВы вошли как: {session['username']}"
     }
 
 
+# 2.2. Выход (отзыв токена)
+def logout_user(token: str) -> Dict[str, Any]:
+    """Отзывает токен сессии."""
+    if token:
+        session_store.revoke(token)
+    return {"success": True, "message": "\nВы вышли из системы"}
+
+
 # 3. Команда показа портфеля
+@timed("usecase.show_portfolio")
 def show_portfolio(user_id: int, base_currency: str = "USD") -> Dict[str, Any]:
     """Показывает портфель пользователя"""
+    # Повторные просмотры отдаются из кеша, пока портфель и курсы не изменились
+    cache_key = valuation_cache.make_key(user_id, base_currency)
+    cached = valuation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     portfolios_data = load_json(const.PORTFOLIOS_FILE)
     portfolios = portfolios_data.get("portfolios", [])
 
@@ -173,6 +431,7 @@ def show_portfolio(user_id: int, base_currency: str = "USD") -> Dict[str, Any]:
     lines = []
     lines.append(f"\nПортфель пользователя (база: {base_currency}):")
 
+    total_value = None
     if not portfolio_data["wallets"]:
         lines.append("\nУ вас пока нет кошельков.")
     else:
@@ -182,20 +441,159 @@ def show_portfolio(user_id: int, base_currency: str = "USD") -> Dict[str, Any]:
             lines.append(f"- {currency}: {balance:.4f}")
 
         # Итоговая стоимость — считает get_total_value
-        total_value = portfolio.get_total_value(base_currency=base_currency)
+        rates_data = load_json(const.RATES_FILE)
+        pairs = rates_data.get("pairs", {}) if isinstance(rates_data, dict) else {}
+        total_value = portfolio.get_total_value(base_currency=base_currency, pairs=pairs)
         lines.append("---------------------------------")
         lines.append(f"\nИтого: {total_value:,.2f} {base_currency}")
 
-    return {
+    result = {
         "success": True,
-        "message": "\n".join(lines)
+        "message": "\n".join(lines),
+        "total_value": total_value,
     }
+    valuation_cache.put(cache_key, result)
+    return result
     
 
+# 3.1. История стоимости портфеля
+@timed("usecase.show_portfolio_history")
+def show_portfolio_history(
+    user_id: int,
+    base_currency: str = "USD",
+    period: str = "30d",
+    step: str = "1h",
+) -> Dict[str, Any]:
+    """Показывает стоимость портфеля во времени (по журналу сделок и истории курсов)."""
+    base_currency = base_currency.strip().upper()
+    try:
+        get_currency(base_currency)
+        grid = build_grid(parse_duration(period), parse_duration(step))
+    except (CurrencyNotFoundError, ValueError) as e:
+        return {"success": False, "message": str(e)}
+
+    portfolios_data = load_json(const.PORTFOLIOS_FILE)
+    portfolio_data = None
+    for p in portfolios_data.get("portfolios", []):
+        if p["user_id"] == user_id:
+            portfolio_data = p
+            break
+
+    if portfolio_data is None:
+        return {"success": False, "message": "Портфель не найден"}
+
+    current = {code: info["balance"] for code, info in portfolio_data["wallets"].items()}
+    balances = balance_steps(current, load_trades(user_id), grid)
+    values = value_series(balances, RateHistory.load(), grid, base_currency)
+
+    lines = [f"\nИстория стоимости портфеля (база: {base_currency}, {period}, шаг {step}):"]
+    for ts, value in zip(grid, values):
+        moment = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+        shown = "нет данных" if math.isnan(value) else f"{value:,.2f}"
+        lines.append(f"- {moment}: {shown}")
+
+    return {
+        "success": True,
+        "message": "\n".join(lines),
+        "timestamps": grid,
+        "values": values,
+    }
+
+
+# 3.2. Рейтинг портфелей
+@timed("usecase.show_leaderboard")
+def show_leaderboard(top: int = 100, base_currency: str = "USD", refresh: bool = False) -> Dict[str, Any]:
+    """Показывает топ-K портфелей по стоимости в базовой валюте."""
+    base_currency = base_currency.strip().upper()
+    try:
+        get_currency(base_currency)
+    except CurrencyNotFoundError as e:
+        return {"success": False, "message": str(e)}
+
+    if top <= 0:
+        return {"success": False, "message": "\n'top' должен быть положительным числом"}
+
+    if refresh:
+        reset_leaderboard()
+    board = get_leaderboard()
+
+    base_rate = board.usd_rate(base_currency)
+    if math.isnan(base_rate) or base_rate <= 0:
+        return {"success": False, "message": str(ApiRequestError(f"не удалось получить курс для {base_currency}→USD"))}
+
+    entries = [(user_id, value / base_rate) for user_id, value in board.top(top)]
+    usernames = load_usernames()
+
+    lines = [f"\nТоп-{top} портфелей (база: {base_currency}):"]
+    if not entries:
+        lines.append("\nПортфелей пока нет.")
+    for place, (user_id, value) in enumerate(entries, start=1):
+        name = usernames.get(user_id, f"id={user_id}")
+        lines.append(f"{place:>4}. {name}: {value:,.2f} {base_currency}")
+
+    return {"success": True, "message": "\n".join(lines), "entries": entries}
+
+
+# 3.3. Агрегаты по платформе
+@timed("usecase.show_exposure")
+def show_exposure(base_currency: str = "USD", verify: bool = False, repair: bool = False) -> Dict[str, Any]:
+    """Показывает суммарные остатки по валютам и активы под управлением (AUM)."""
+    base_currency = base_currency.strip().upper()
+    try:
+        get_currency(base_currency)
+    except CurrencyNotFoundError as e:
+        return {"success": False, "message": str(e)}
+
+    lines = []
+    if verify or repair:
+        check = platform_aggregates.verify(repair=repair)
+        if check["ok"]:
+            lines.append("\nПроверка агрегатов: расхождений нет")
+        else:
+            lines.append("\nПроверка агрегатов: обнаружены расхождения")
+            for code, diff in sorted(check["drift"].items()):
+                lines.append(f"   - {code}: {diff:+.8f}")
+            if check["portfolios_drift"]:
+                lines.append(f"   - портфелей: {check['portfolios_drift']:+d}")
+            if check["repaired"]:
+                lines.append("   Агрегаты пересчитаны и сохранены")
+
+    data = platform_aggregates.load()
+    rates_data = load_json(const.RATES_FILE)
+    pairs = rates_data.get("pairs", {}) if isinstance(rates_data, dict) else {}
+    base_rate = usd_rate(pairs, base_currency)
+    if math.isnan(base_rate) or base_rate <= 0:
+        return {"success": False, "message": str(ApiRequestError(f"не удалось получить курс для {base_currency}→USD"))}
+
+    lines.append(f"\nЭкспозиция платформы (портфелей: {data.get('portfolios', 0)}, база: {base_currency}):")
+    aum = 0.0
+    for code, amount in sorted(data.get("totals", {}).items()):
+        value = amount * usd_rate(pairs, code) / base_rate
+        if math.isnan(value):
+            lines.append(f"- {code}: {amount:.4f} (курс неизвестен)")
+        else:
+            aum += value
+            lines.append(f"- {code}: {amount:.4f} ≈ {value:,.2f} {base_currency}")
+    lines.append("---------------------------------")
+    lines.append(f"\nAUM: {aum:,.2f} {base_currency}")
+
+    return {"success": True, "message": "\n".join(lines), "totals": data.get("totals", {}), "aum": aum}
+
+
 # 4. Команда купить валюту
 @log_action(action="BUY", verbose=True) # Декоратор для логирования
-def buy_currency(user_id: int, currency_code: str, amount: float) -> Dict[str, Any]:
-    """Покупает валюту"""
+@timed("usecase.buy_currency")
+@idempotent(action="BUY") # Повтор заявки с тем же client_order_id
+@locked_by_user # Сделки одного пользователя выполняются по очереди
+def buy_currency(
+    user_id: int,
+    currency_code: str,
+    amount: float,
+    quote_id: str = None,
+    client_order_id: str = None,
+) -> Dict[str, Any]:
+    """Покупает валюту (по курсу из rates.json или по котировке quote_id)"""
+    currency_code = _quote_currency(currency_code, quote_id, user_id)
     if not currency_code or not currency_code.strip():
         return {"success": False, "message": "Код валюты не может быть пустым"}
     currency_code = currency_code.strip().upper()
@@ -225,23 +623,14 @@ def buy_currency(user_id: int, currency_code: str, amount: float) -> Dict[str, A
 
     # Создаём объект Portfolio
     portfolio = Portfolio.from_dict(portfolio_data)
+    expected_version = portfolio_data.get("version", 0)
 
-    # Получаем курс из rates.json
-    rates_data = load_json(const.RATES_FILE)
-    if not isinstance(rates_data, dict):
-        return {"success": False, "message": str(ApiRequestError("файл rates.json повреждён или пустой"))}
-
-    # Ищем пару currency_code → USD
-    pair = f"{currency_code}_USD"
-    rate_info = rates_data.get("pairs", {}).get(pair) 
-
-    if rate_info is None:
-        return {"success": False, "message": str(ApiRequestError(f"не удалось получить курс для {currency_code}→USD"))}
+    # Курс: из зафиксированной котировки или из rates.json
+    try:
+        rate = _trade_rate(currency_code, quote_id, user_id)
+    except (ApiRequestError, QuoteNotFoundError) as e:
+        return {"success": False, "message": str(e)}
 
-    if not isinstance(rate_info, dict) or "rate" not in rate_info:
-        return {"success": False, "message": str(ApiRequestError(f"неверный формат курса для {currency_code}→USD"))}
-    
-    rate = rate_info["rate"]
     cost_usd = amount * rate
 
     # Работаем с кошельками через методы Portfolio
@@ -276,14 +665,23 @@ def buy_currency(user_id: int, currency_code: str, amount: float) -> Dict[str, A
             portfolios = data.get("portfolios", [])
             for i, p in enumerate(portfolios):
                 if p["user_id"] == user_id:
+                    # Оптимистичная проверка версии записи
+                    if p.get("version", 0) != expected_version:
+                        raise ConcurrentUpdateError(user_id)
                     # Обновляем только нужный портфель
                     p["wallets"] = {k: {"balance": v.balance} for k, v in portfolio._wallets.items()}
+                    p["version"] = expected_version + 1
                     portfolios[i] = p
+                    platform_aggregates.apply_to(data, {currency_code: amount, "USD": -cost_usd})
                     break
             data["portfolios"] = portfolios
             return data
         
         safe_json_operation(const.PORTFOLIOS_FILE, update_portfolio)
+        if quote_id:
+            # Котировка одноразовая: повтор по тому же ID будет отклонён
+            quote_book.consume(quote_id, user_id)
+        record_wallet_change(user_id, "BUY", {currency_code: amount, "USD": -cost_usd}, rate, currency_code)
 
         # Формируем сообщение
         lines = []
@@ -292,16 +690,61 @@ def buy_currency(user_id: int, currency_code: str, amount: float) -> Dict[str, A
         lines.append(f"\n- {currency_code}: было {old_balance:.4f} → стало {target_wallet.balance:.4f}")
         lines.append(f"\nОценочная стоимость покупки: {cost_usd:.2f} USD")
 
-        return {"success": True, "message": "\n".join(lines)}
+        return {
+            "success": True,
+            "message": "\n".join(lines),
+            "currency_code": currency_code,
+            "amount": amount,
+            "rate": rate,
+            "base": "USD",
+        }
 
-    except (KeyError, ValueError) as e:
+    except (KeyError, ValueError, ConcurrentUpdateError) as e:
         return {"success": False, "message": str(e)}
 
 
+# 4.1. Команда зафиксировать котировку
+@timed("usecase.request_quote")
+def request_quote(currency_code: str, user_id: int = None) -> Dict[str, Any]:
+    """Фиксирует текущий курс валюты к USD для пользователя и возвращает ID котировки."""
+    if not currency_code or not currency_code.strip():
+        return {"success": False, "message": "Код валюты не может быть пустым"}
+    currency_code = currency_code.strip().upper()
+
+    try:
+        get_currency(currency_code)
+        rate = _load_usd_rate(currency_code)
+    except (CurrencyNotFoundError, ApiRequestError) as e:
+        return {"success": False, "message": str(e)}
+
+    quote = quote_book.create(currency_code, rate, user_id)
+    return {
+        "success": True,
+        "quote_id": quote.quote_id,
+        "rate": quote.rate,
+        "expires_at": quote.expires_at,
+        "message": (
+            f"\nКотировка {quote.quote_id}: {rate:.8f} USD/{currency_code}, "
+            f"действует {quote_book.ttl_seconds:.0f} с"
+            f"\nИспользуйте: buy --quote {quote.quote_id} --amount <N>"
+        ),
+    }
+
+
 # 5. Команда на продажу валюты
 @log_action(action="SELL", verbose=True) # Декоратор для логирования
-def sell_currency(user_id: int, currency_code: str, amount: float) -> Dict[str, Any]:
-    """Продаёт валюту"""
+@timed("usecase.sell_currency")
+@idempotent(action="SELL") # Повтор заявки с тем же client_order_id
+@locked_by_user # Сделки одного пользователя выполняются по очереди
+def sell_currency(
+    user_id: int,
+    currency_code: str,
+    amount: float,
+    quote_id: str = None,
+    client_order_id: str = None,
+) -> Dict[str, Any]:
+    """Продаёт валюту (по курсу из rates.json или по котировке quote_id)"""
+    currency_code = _quote_currency(currency_code, quote_id, user_id)
     if not currency_code or not currency_code.strip():
         return {"success": False, "message": "Код валюты не может быть пустым"}
     currency_code = currency_code.strip().upper()
@@ -330,6 +773,7 @@ def sell_currency(user_id: int, currency_code: str, amount: float) -> Dict[str,
 
     # Создаём объект Portfolio
     portfolio = Portfolio.from_dict(portfolio_data)
+    expected_version = portfolio_data.get("version", 0)
 
     # Проверяем, есть ли такая валюта
     if currency_code not in portfolio._wallets:
@@ -347,22 +791,12 @@ def sell_currency(user_id: int, currency_code: str, amount: float) -> Dict[str,
             ))
         }
 
-    # Получаем курс из rates.json    
-    rates_data = load_json(const.RATES_FILE)
-    if not isinstance(rates_data, dict):
-        return {"success": False, "message": str(ApiRequestError("файл rates.json повреждён или пустой"))}
-
-    # Ищем пару currency_code → USD
-    pair = f"{currency_code}_USD"
-    rate_info = rates_data.get("pairs", {}).get(pair)
-
-    if rate_info is None:
-        return {"success": False, "message": str(ApiRequestError(f"не удалось получить курс для {currency_code}→USD"))}
-
-    if not isinstance(rate_info, dict) or "rate" not in rate_info:
-        return {"success": False, "message": str(ApiRequestError(f"неверный формат курса для {currency_code}→USD"))}
+    # Курс: из зафиксированной котировки или из rates.json
+    try:
+        rate = _trade_rate(currency_code, quote_id, user_id)
+    except (ApiRequestError, QuoteNotFoundError) as e:
+        return {"success": False, "message": str(e)}
 
-    rate = rate_info["rate"]
     revenue_usd = amount * rate
 
     # Сохраняем старый баланс
@@ -379,23 +813,32 @@ def sell_currency(user_id: int, currency_code: str, amount: float) -> Dict[str,
         portfolios = data.get("portfolios", [])
         for i, p in enumerate(portfolios):
             if p["user_id"] == user_id:
+                # Оптимистичная проверка версии записи
+                if p.get("version", 0) != expected_version:
+                    raise ConcurrentUpdateError(user_id)
                 # Обновляем только нужный портфель
                 p["wallets"] = {k: {"balance": v.balance} for k, v in portfolio._wallets.items()}
+                p["version"] = expected_version + 1
                 portfolios[i] = p
+                platform_aggregates.apply_to(data, {currency_code: -amount, "USD": revenue_usd})
                 break
         data["portfolios"] = portfolios
         return data
     
     try:
         # Используем безопасную операцию
-        data = load_json(const.PORTFOLIOS_FILE)
-        new_data = update_portfolio(data)
-        save_json(const.PORTFOLIOS_FILE, new_data)
+        safe_json_operation(const.PORTFOLIOS_FILE, update_portfolio)
+    except ConcurrentUpdateError as e:
+        return {"success": False, "message": str(e)}
     except Exception as e:
         logger = logging.getLogger("valutatrade")
         logger.error(f"Ошибка сохранения портфеля: {e}")
         return {"success": False, "message": "Ошибка при сохранении данных"}
 
+    if quote_id:
+        # Котировка одноразовая: повтор по тому же ID будет отклонён
+        quote_book.consume(quote_id, user_id)
+    record_wallet_change(user_id, "SELL", {currency_code: -amount, "USD": revenue_usd}, rate, currency_code)
 
     # Формируем сообщение
     lines = []
@@ -404,10 +847,112 @@ def sell_currency(user_id: int, currency_code: str, amount: float) -> Dict[str,
     lines.append(f"\n- {currency_code}: было {old_balance:.4f} → стало {wallet.balance:.4f}")
     lines.append(f"\nПолучено: {revenue_usd:.2f} USD")
 
-    return {"success": True, "message": "\n".join(lines)}
+    return {
+        "success": True,
+        "message": "\n".join(lines),
+        "currency_code": currency_code,
+        "amount": amount,
+        "rate": rate,
+        "base": "USD",
+    }
+
+
+# 5.1. Пакетное исполнение заявок
+def execute_batch(file_path: str, user_id: int, workers: int = None) -> Dict[str, Any]:
+    """
+    Исполняет заявки из файла JSON Lines в процессах-шардах по user_id.
+
+    Каждый шард исполняет сделки над портфелями своих пользователей в памяти
+    и сам сохраняет их; use case только читает файл и собирает результаты.
+    Заявки чужих портфелей исполняются только для операторов из настройки
+    "batch_operator_ids", у остальных пользователей они отклоняются.
+
+    Формат строки: {"action": "buy", "user_id": 1, "currency": "BTC",
+    "amount": 0.1, "client_order_id": "..."}.
+    """
+    path = const.Path(file_path)
+    if not path.exists():
+        return {"success": False, "message": f"\nФайл {file_path} не найден"}
+
+    operator = user_id in SettingsLoader().get("batch_operator_ids", [])
+
+    orders = []
+    line_nos = []
+    with path.open("r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                orders.append(json.loads(line))
+                line_nos.append(line_no)
+            except json.JSONDecodeError:
+                return {"success": False, "message": f"\nОшибка JSON в строке {line_no}"}
+
+    def is_foreign(order) -> bool:
+        # Неверные заявки (не объект, нет user_id) отклонит сам исполнитель
+        try:
+            return int(order["user_id"]) != user_id
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    # Заявки по чужим портфелям отклоняются до отправки в шарды
+    foreign = {}
+    if not operator:
+        for position, order in enumerate(orders):
+            if is_foreign(order):
+                foreign[position] = {
+                    "success": False,
+                    "message": f"\nЗаявка не принадлежит пользователю {user_id}: пакет по чужим портфелям доступен только операторам",
+                }
+
+    started = time.perf_counter()
+    try:
+        with ShardedTradeExecutor(workers) as executor:
+            executed = iter(executor.execute_many(o for i, o in enumerate(orders) if i not in foreign))
+            results = [foreign[i] if i in foreign else next(executed) for i in range(len(orders))]
+            shards = executor.workers
+    except Exception as e:
+        logger = logging.getLogger("valutatrade")
+        logger.error(f"Ошибка пакетного исполнения: {e}")
+        return {
+            "success": False,
+            "message": f"\nОшибка пакетного исполнения: {e}. Итог заявок неизвестен, сверьте журнал сделок",
+        }
+    elapsed = time.perf_counter() - started
+
+    ok = sum(1 for r in results if r.get("success"))
+    lines = [
+        f"\nИсполнено заявок: {ok} из {len(orders)} (процессов: {shards})",
+        f"Время: {elapsed:.2f} с, {len(orders) / elapsed if elapsed else 0:.0f} заявок/с",
+    ]
+    for line_no, order, result in zip(line_nos, orders, results):
+        if not result.get("success"):
+            lines.append(f"   - строка {line_no} {order}: {result.get('message', '').strip()}")
+
+    unconfirmed = [line_no for line_no, r in zip(line_nos, results) if r.get("unconfirmed")]
+    if unconfirmed:
+        saved = [line_no for line_no, r in zip(line_nos, results) if r.get("success")]
+        lines.append("\nПакет исполнен не полностью:")
+        lines.append(f"   Сохранены (подтверждено): {_format_lines(saved) or 'нет'}")
+        lines.append(f"   Сохранение не подтверждено: {_format_lines(unconfirmed)}")
+        return {"success": False, "message": "\n".join(lines), "results": results}
+
+    return {"success": True, "message": "\n".join(lines), "results": results}
+
+
+def _format_lines(line_nos: List[int]) -> str:
+    """Номера строк диапазонами: [1, 2, 3, 7] → "1-3, 7"."""
+    ranges = []
+    for line_no in line_nos:
+        if ranges and ranges[-1][1] == line_no - 1:
+            ranges[-1][1] = line_no
+        else:
+            ranges.append([line_no, line_no])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
 
 
 # 6. Команда на получение курса валют
+@timed("usecase.get_rate")
 def get_rate(from_currency: str, to_currency: str) -> Dict[str, Any]:
     """Получает курс одной валюты к другой."""
 
@@ -530,3 +1075,383 @@ def get_rate(from_currency: str, to_currency: str) -> Dict[str, Any]:
         "updated_at": updated_at,
         "source": source
     }
+
+
+def _format_rate(rate_value: float) -> str:
+    """Форматирует курс с точностью, зависящей от его величины."""
+    if rate_value < 0.0001:
+        return f"{rate_value:.10f}"
+    if rate_value < 1:
+        return f"{rate_value:.6f}"
+    if rate_value < 1000:
+        return f"{rate_value:.4f}"
+    return f"{rate_value:.2f}"
+
+
+# 6.1. Курс на момент времени (по истории курсов)
+@timed("usecase.get_rate_at")
+def get_rate_at(from_currency: str, to_currency: str, at: str) -> Dict[str, Any]:
+    """Получает курс одной валюты к другой на заданный момент времени."""
+    from_curr = (from_currency or "").strip().upper()
+    to_curr = (to_currency or "").strip().upper()
+    if not from_curr or not to_curr:
+        return {"success": False, "message": "\nКоды валют не могут быть пустыми"}
+
+    try:
+        get_currency(from_curr)
+        get_currency(to_curr)
+    except CurrencyNotFoundError as e:
+        return {"success": False, "message": str(e)}
+
+    try:
+        # Время без часового пояса считается локальным
+        moment = parse_timestamp(at)
+    except (TypeError, ValueError):
+        return {"success": False, "message": f"\nНеверный формат времени: {at} (ожидается ISO 8601)"}
+
+    found = RateHistory.cached().rate_at(from_curr, to_curr, moment)
+    if found is None:
+        return {
+            "success": False,
+            "message": str(ApiRequestError(f"курс {from_curr}→{to_curr} на {at} недоступен в истории")),
+        }
+
+    rate_value = found["rate"]
+    tick_time = datetime.fromtimestamp(found["tick_time"]).isoformat(timespec="seconds")
+    methods = {
+        "identity": "одинаковые валюты",
+        "direct": "прямая пара",
+        "inverse": "обратная пара",
+        "cross_usd": "кросс-курс через USD",
+    }
+    lines = [
+        f"\nКурс {from_curr} → {to_curr} на {at}: {_format_rate(rate_value)}",
+        f"Последний тик: {tick_time} ({methods[found['method']]})",
+    ]
+    return {
+        "success": True,
+        "message": "\n".join(lines),
+        "rate": rate_value,
+        "at": moment,
+        "tick_time": found["tick_time"],
+        "method": found["method"],
+    }
+
+
+# 6.2. Курсы для списка (пара, момент времени) за один проход
+@timed("usecase.get_rates_at")
+def get_rates_at(file_path: str) -> Dict[str, Any]:
+    """
+    Оценивает курсы по файлу со строками «FROM_TO,timestamp».
+
+    Пустые строки и строки, начинающиеся с #, пропускаются.
+    """
+    requests, labels = [], []
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    pair, at = (part.strip() for part in line.split(",", 1))
+                    from_curr, to_curr = pair.upper().split("_")
+                    requests.append((from_curr, to_curr, parse_timestamp(at)))
+                except ValueError:
+                    return {"success": False, "message": f"\nСтрока {line_no}: ожидается FROM_TO,timestamp"}
+                labels.append((f"{from_curr}_{to_curr}", at))
+    except OSError as e:
+        return {"success": False, "message": f"\nНе удалось прочитать файл: {e}"}
+
+    rates = RateHistory.cached().rates_at(requests)
+
+    lines = [f"\nКурсы на момент времени ({len(requests)} запросов):"]
+    for (pair, at), rate_value in zip(labels, rates):
+        shown = "нет данных" if math.isnan(rate_value) else _format_rate(rate_value)
+        lines.append(f"- {pair} @ {at}: {shown}")
+
+    return {"success": True, "message": "\n".join(lines), "rates": rates}
+
+
+# 6.3. Свечи OHLC по паре
+@timed("usecase.show_rate_history")
+def show_rate_history(pair: str, interval: str = "1h", period: str = None, limit: int = 48) -> Dict[str, Any]:
+    """
+    Показывает свечи OHLC пары из candles_file.
+
+    Свечи строятся фоновым сжатием истории в планировщике, поэтому
+    последние тики появляются после очередного сжатия.
+    """
+    pair = (pair or "").strip().upper()
+    if pair.count("_") != 1:
+        return {"success": False, "message": "\nПара указывается в формате FROM_TO (например, BTC_USD)"}
+    if interval not in INTERVALS:
+        return {"success": False, "message": f"\nНеизвестный интервал '{interval}'. Доступны: {', '.join(INTERVALS)}"}
+    try:
+        start = time.time() - parse_duration(period) if period else None
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+
+    candles = CandleStore.load().candles(pair, interval, start=start)
+    if not period and limit:
+        candles = candles[-limit:]
+    if not candles:
+        return {"success": False, "message": f"\nНет свечей {interval} для пары {pair}"}
+
+    lines = [f"\nСвечи {pair} ({interval}, {len(candles)} шт.):"]
+    for candle in candles:
+        moment = datetime.fromtimestamp(candle[START]).strftime("%Y-%m-%d %H:%M")
+        lines.append(
+            f"- {moment}: O {_format_rate(candle[OPEN])}  H {_format_rate(candle[HIGH])}  "
+            f"L {_format_rate(candle[LOW])}  C {_format_rate(candle[CLOSE])}  (тиков: {candle[TICKS]})"
+        )
+
+    return {"success": True, "message": "\n".join(lines), "candles": candles}
+
+
+# 6.4. Скользящая статистика курсов
+@timed("usecase.get_rate_stats")
+def get_rate_stats() -> Dict[str, Any]:
+    """
+    Возвращает скользящую статистику по парам (SMA/EMA, доходность, волатильность).
+
+    Состояние читается из stats_file; если его нет — статистика строится по истории.
+    """
+    settings = SettingsLoader()
+    window = settings.get("rate_stats_window", 24)
+    ema_span = settings.get("rate_stats_ema_span", 12)
+    stats = RateStats.load(const.STATS_FILE, window, ema_span)
+    if stats is None:
+        stats = RateStats.from_history(RateHistory.cached(), window, ema_span)
+    summaries = {pair: stats.get(pair) for pair in stats.pairs}
+    return {
+        "success": True,
+        "message": f"\nСтатистика за окно {window} тиков (EMA: {ema_span})",
+        "window": window,
+        "stats": {pair: summary for pair, summary in summaries.items() if summary is not None},
+    }
+
+
+# 6.5. Бэктест стратегий
+def _parse_weights(value: str) -> Dict[str, float]:
+    """Разбирает строку вида 'BTC=0.5,ETH=0.3' в целевые доли."""
+    weights = {}
+    for part in (value or "").split(","):
+        if not part.strip():
+            continue
+        code, _, weight = part.partition("=")
+        code = code.strip().upper()
+        get_currency(code)
+        weights[code] = float(weight)
+    if not weights:
+        raise ValueError("\nУкажите целевые доли, например: BTC=0.5,ETH=0.3")
+    return weights
+
+
+def _make_strategy(name: str, step: float, options: Dict[str, Any]):
+    """Создаёт стратегию бэктеста по имени и параметрам CLI."""
+    if name == "dca":
+        code = (options.get("currency") or "BTC").upper()
+        get_currency(code)
+        every = parse_duration(options.get("every") or "1d")
+        return backtest.DcaStrategy(code, float(options.get("amount") or 100), round(every / step))
+    if name == "rebalance":
+        check = parse_duration(options.get("every") or "1d")
+        return backtest.RebalanceStrategy(
+            _parse_weights(options.get("weights")), float(options.get("threshold") or 0.05), round(check / step)
+        )
+    if name == "momentum":
+        code = (options.get("currency") or "BTC").upper()
+        get_currency(code)
+        lookback = parse_duration(options.get("lookback") or "1d")
+        return backtest.MomentumStrategy(code, round(lookback / step), float(options.get("fraction") or 1.0))
+    raise ValueError(f"\nНеизвестная стратегия '{name}'. Доступны: {', '.join(backtest.STRATEGIES)}")
+
+
+def _write_backtest_output(result, output_dir: str) -> None:
+    """Сохраняет кривую капитала и сделки в CSV."""
+    directory = const.Path(output_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "equity.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "equity_usd"])
+        for ts, value in zip(result.timestamps, result.equity):
+            writer.writerow([datetime.fromtimestamp(ts).isoformat(), f"{value:.2f}"])
+    with open(directory / "trades.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "action", "currency", "amount", "rate", "usd"])
+        for trade in result.trades:
+            writer.writerow([
+                datetime.fromtimestamp(trade.ts).isoformat(),
+                trade.action,
+                trade.currency_code,
+                f"{trade.amount:.8f}",
+                _format_rate(trade.rate),
+                f"{trade.usd:.2f}",
+            ])
+
+
+def _backtest_prices(currencies, period: str, step_seconds: float):
+    """
+    Сетка бэктеста и курсы валют на ней.
+
+    Сетка заканчивается последним общим тиком истории валют; period
+    ограничивает её начало.
+    """
+    history = RateHistory.load()
+    bounds = backtest.history_bounds(history, currencies)
+    if bounds is None:
+        raise ValueError("\nНет истории курсов для выбранных валют")
+    first, last = bounds
+    span = last - first
+    if period:
+        span = min(span, parse_duration(period))
+    max_points = SettingsLoader().get("backtest_max_points", 1_000_000)
+    grid = build_grid(span, step_seconds, end=last, max_points=max_points)
+    with timer("backtest.align"):
+        prices = backtest.align_prices(history, currencies, grid)
+    return grid, prices
+
+
+@timed("usecase.run_backtest")
+def run_backtest(
+    strategy: str,
+    period: str = None,
+    step: str = "1h",
+    initial: float = 10_000.0,
+    output: str = None,
+    **options: Any,
+) -> Dict[str, Any]:
+    """
+    Прогоняет стратегию (dca, rebalance, momentum) по истории курсов.
+
+    Сделки исполняются по правилам buy/sell; портфели пользователей не
+    затрагиваются.
+    """
+    try:
+        step_seconds = parse_duration(step)
+        if initial <= 0:
+            raise ValueError("\nНачальный капитал должен быть положительным")
+        runner = _make_strategy(strategy, step_seconds, options)
+        grid, prices = _backtest_prices(runner.currencies(), period, step_seconds)
+    except (ValueError, KeyError, CurrencyNotFoundError) as e:
+        return {"success": False, "message": str(e)}
+
+    with timer("backtest.run"):
+        result = backtest.run_backtest(runner, grid, prices, float(initial))
+    if output:
+        _write_backtest_output(result, output)
+
+    summary = result.summary()
+    start_text = datetime.fromtimestamp(grid[0]).strftime("%Y-%m-%d %H:%M")
+    end_text = datetime.fromtimestamp(grid[-1]).strftime("%Y-%m-%d %H:%M")
+    lines = [
+        f"\nБэктест {strategy}: {start_text} — {end_text}, точек: {len(grid)}",
+        f"Капитал: {result.initial:,.2f} → {summary['final']:,.2f} USD ({summary['return'] * 100:+.2f}%)",
+        f"Макс. просадка: {summary['max_drawdown'] * 100:.2f}%",
+        f"Сделок: {summary['trades']}, отклонено: {summary['rejected']}",
+    ]
+    if output:
+        lines.append(f"Кривая капитала и сделки сохранены в {output}")
+    return {"success": True, "message": "\n".join(lines), "result": result, "summary": summary}
+
+
+# 6.6. Перебор параметров стратегий
+# Параметры стратегий, которые можно перебирать
+_STRATEGY_PARAMS = {
+    "dca": ("currency", "amount", "every"),
+    "rebalance": ("weights", "threshold", "every"),
+    "momentum": ("currency", "lookback", "fraction"),
+}
+
+
+@timed("usecase.run_sweep")
+def run_sweep(
+    strategy: str,
+    params: List[str],
+    period: str = None,
+    step: str = "1h",
+    initial: float = 10_000.0,
+    workers: int = None,
+    sort: str = "return",
+    top: int = 20,
+    output: str = None,
+    **options: Any,
+) -> Dict[str, Any]:
+    """
+    Прогоняет бэктест для всех сочетаний параметров в пуле процессов.
+
+    params: строки вида 'every=1h,6h,1d'; остальные параметры стратегии
+    берутся из options. Возвращает строки, отсортированные по sort.
+    """
+    try:
+        if sort not in sweep.RANK_KEYS:
+            raise ValueError(f"\nНеизвестный ключ сортировки '{sort}'. Доступны: {', '.join(sweep.RANK_KEYS)}")
+        if strategy not in _STRATEGY_PARAMS:
+            raise ValueError(f"\nНеизвестная стратегия '{strategy}'. Доступны: {', '.join(_STRATEGY_PARAMS)}")
+        param_values = {}
+        for item in params or []:
+            name, _, values = item.partition("=")
+            name = name.strip()
+            if name not in _STRATEGY_PARAMS[strategy]:
+                raise ValueError(
+                    f"\nПараметр '{name}' не поддерживается стратегией {strategy}. "
+                    f"Доступны: {', '.join(_STRATEGY_PARAMS[strategy])}"
+                )
+            # Доли ребалансировки сами записываются через запятую, их варианты разделяются '|'
+            separator = "|" if name == "weights" else ","
+            param_values[name] = [value.strip() for value in values.split(separator) if value.strip()]
+            if not param_values[name]:
+                raise ValueError(f"\nНе заданы значения параметра '{name}'")
+        if not param_values:
+            raise ValueError("\nУкажите хотя бы один --param, например: --param every=1h,6h,1d")
+
+        step_seconds = parse_duration(step)
+        if initial <= 0:
+            raise ValueError("\nНачальный капитал должен быть положительным")
+        combinations = sweep.expand_grid(param_values)
+        runners = [_make_strategy(strategy, step_seconds, {**options, **combo}) for combo in combinations]
+        currencies = sorted({code for runner in runners for code in runner.currencies()})
+        grid, prices = _backtest_prices(currencies, period, step_seconds)
+    except (ValueError, KeyError, CurrencyNotFoundError) as e:
+        return {"success": False, "message": str(e)}
+
+    started = time.perf_counter()
+    with timer("backtest.sweep"):
+        summaries = sweep.run_sweep(runners, grid, prices, float(initial), workers=workers)
+    elapsed = time.perf_counter() - started
+
+    rows = [
+        {"params": ", ".join(f"{name}={value}" for name, value in combo.items()), **combo, **summary}
+        for combo, summary in zip(combinations, summaries)
+    ]
+    rows = sweep.rank(rows, sort)
+    if output:
+        directory = const.Path(output).parent
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["rank", *param_values, "final", "return", "max_drawdown", "trades", "rejected"])
+            for place, row in enumerate(rows, start=1):
+                writer.writerow([
+                    place,
+                    *(row[name] for name in param_values),
+                    f"{row['final']:.2f}",
+                    f"{row['return']:.6f}",
+                    f"{row['max_drawdown']:.6f}",
+                    row["trades"],
+                    row["rejected"],
+                ])
+
+    lines = [
+        f"\nПеребор {strategy}: прогонов {len(rows)}, точек сетки {len(grid)}, {elapsed:.2f} с",
+        f"Сортировка: {sort}",
+    ]
+    if output:
+        lines.append(f"Полная таблица сохранена в {output}")
+    return {
+        "success": True,
+        "message": "\n".join(lines),
+        "rows": rows[:top] if top else rows,
+        "total": len(rows),
+    }
@@ -0,0 +1,138 @@
+"""
+Оценка стоимости портфеля во времени.
+
+Балансы восстанавливаются из журнала сделок как ступенчатые функции,
+курсы — из истории курсов (RateHistory). Оба ряда выравниваются по общей
+сетке времени, после чего стоимость считается поэлементными операциями
+над массивами, без поиска курса в словаре для каждой точки.
+"""
+
+import math
+import operator
+import re
+import time
+from array import array
+from typing import Dict, Any, List
+from valutatrade_hub.core.rate_history import RateHistory, forward_fill
+
+# Ограничение на число точек, чтобы случайный "--step 1s" не повесил CLI
+MAX_POINTS = 100_000
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(value: str) -> float:
+    """
+    Переводит строку вида '30d', '1h', '15m' в секунды.
+
+    Raises:
+        ValueError: при неверном формате.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*", value or "")
+    if not match:
+        raise ValueError(f"\nНеверный формат интервала '{value}'. Пример: 30d, 12h, 15m")
+    seconds = float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+    if seconds <= 0:
+        raise ValueError("\nИнтервал должен быть положительным")
+    return seconds
+
+
+def build_grid(period: float, step: float, end: float = None, max_points: int = MAX_POINTS) -> array:
+    """Строит равномерную сетку времени [end - period, end] с шагом step."""
+    end = time.time() if end is None else end
+    count = int(period // step) + 1
+    if count > max_points:
+        raise ValueError(f"\nСлишком много точек ({count}), максимум {max_points}. Увеличьте --step")
+    start = end - (count - 1) * step
+    return array("d", (start + i * step for i in range(count)))
+
+
+def balance_steps(
+    current_balances: Dict[str, float],
+    trades: List[Dict[str, Any]],
+    grid: array,
+) -> Dict[str, array]:
+    """
+    Балансы по валютам в точках сетки.
+
+    Начальный баланс каждой валюты вычисляется как текущий минус сумма всех
+    изменений из журнала, затем балансы накапливаются по сделкам
+    и выравниваются по сетке.
+    """
+    currencies = set(current_balances)
+    for trade in trades:
+        currencies.update(trade.get("deltas", {}))
+
+    result = {}
+    for currency in currencies:
+        changes = [
+            (trade["ts"], trade["deltas"][currency])
+            for trade in trades
+            if currency in trade.get("deltas", {})
+        ]
+        initial = current_balances.get(currency, 0.0) - sum(delta for _, delta in changes)
+
+        balance = initial
+        times = array("d")
+        values = array("d")
+        for ts, delta in changes:
+            balance += delta
+            times.append(ts)
+            values.append(balance)
+
+        result[currency] = forward_fill(times, values, grid, default=initial)
+    return result
+
+
+def value_series(
+    balances: Dict[str, array],
+    history: RateHistory,
+    grid: array,
+    base_currency: str = "USD",
+) -> array:
+    """
+    Стоимость портфеля в базовой валюте в каждой точке сетки.
+
+    Валюты без известного курса в данный момент не учитываются
+    (как и в Portfolio.get_total_value).
+    """
+    total = array("d", [0.0]) * len(grid)
+    for currency, amounts in balances.items():
+        if not any(amounts):
+            continue
+        rates = history.align_usd(currency, grid)
+        contribution = map(operator.mul, amounts, rates)
+        total = array("d", map(_add_known, total, contribution))
+
+    if base_currency != "USD":
+        base_rates = history.align_usd(base_currency, grid)
+        total = array("d", map(operator.truediv, total, map(_positive_or_nan, base_rates)))
+    return total
+
+
+def _add_known(acc: float, value: float) -> float:
+    """Сложение, пропускающее неизвестные (NaN) слагаемые."""
+    return acc if math.isnan(value) else acc + value
+
+
+def _positive_or_nan(rate: float) -> float:
+    """Защищает деление от нулевого курса."""
+    return rate if rate > 0 else math.nan
+
+
+def usd_rate(pairs: Dict[str, Any], currency_code: str) -> float:
+    """
+    Курс currency→USD из словаря pairs (rates.json).
+
+    Используется прямая пара X_USD, при её отсутствии — обратная USD_X.
+    Если курс неизвестен, возвращает NaN.
+    """
+    if currency_code == "USD":
+        return 1.0
+    info = pairs.get(f"{currency_code}_USD")
+    if info and "rate" in info:
+        return float(info["rate"])
+    info = pairs.get(f"USD_{currency_code}")
+    if info and info.get("rate", 0) > 0:
+        return 1.0 / info["rate"]
+    return math.nan
@@ -6,6 +6,26 @@ import logging
 from datetime import datetime
 from functools import wraps
 from typing import Callable, Any, Dict
+from valutatrade_hub.infra.tracing import tracer
+
+
+class LazyLogMessage:
+    """
+    Сообщение лога, которое форматируется только при выводе.
+
+    Строка собирается в потоке записи логов (QueueListener), а не в потоке
+    сделки.
+    """
+
+    __slots__ = ("log_data", "verbose")
+
+    def __init__(self, log_data: Dict[str, Any], verbose: bool):
+        self.log_data = log_data
+        self.verbose = verbose
+
+    def __str__(self) -> str:
+        return format_log_message(self.log_data, self.verbose)
+
 
 def log_action(action: str, verbose: bool = False):
     """
@@ -16,11 +36,15 @@ def log_action(action: str, verbose: bool = False):
         verbose: Подробное логирование с контекстом
     """
     def decorator(func: Callable) -> Callable:
+        # Получаем логгер
+        logger = logging.getLogger("valutatrade")
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            # Получаем логгер
-            logger = logging.getLogger("valutatrade")
-            
+            # Если уровень INFO выключен, не собираем данные лога вовсе
+            if not logger.isEnabledFor(logging.INFO):
+                return func(*args, **kwargs)
+
             # Базовые данные для лога
             log_data = {
                 "timestamp": datetime.now().isoformat(),
@@ -29,6 +53,11 @@ def log_action(action: str, verbose: bool = False):
                 "error_type": None,
                 "error_message": None
             }
+
+            # Идентификатор корреляции (если включена трассировка)
+            trace_id = tracer.current_trace_id() if tracer.enabled else None
+            if trace_id:
+                log_data["trace_id"] = trace_id
             
             # Извлекаем параметры из аргументов функции
             try:
@@ -65,23 +94,16 @@ def log_action(action: str, verbose: bool = False):
                 if isinstance(result, dict):
                     if result.get("success"):
                         log_data["result"] = "OK"
-                        # Для buy/sell можно извлечь rate из сообщения
-                        if action in ["BUY", "SELL"] and "message" in result:
-                            msg = result["message"]
-                            if "по курсу" in msg:
-                                # Парсим курс из сообщения
-                                import re
-                                rate_match = re.search(r'по курсу (\d+\.?\d*)', msg)
-                                if rate_match:
-                                    log_data["rate"] = rate_match.group(1)
-                                    log_data["base"] = "USD" 
+                        # Use case'ы сделок возвращают курс и валюты структурно
+                        for key in ("rate", "base", "currency_code"):
+                            if result.get(key) is not None:
+                                log_data[key] = result[key]
                     else:
                         log_data["result"] = "ERROR"
                         log_data["error_message"] = result.get("message", "Unknown error")
                 
                 # Логируем успех
-                log_message = format_log_message(log_data, verbose)
-                logger.info(log_message)
+                logger.info(LazyLogMessage(log_data, verbose), extra={"fields": log_data})
                 
                 return result
                 
@@ -93,8 +115,7 @@ def log_action(action: str, verbose: bool = False):
                     "error_message": str(e)
                 })
                 
-                log_message = format_log_message(log_data, verbose)
-                logger.error(log_message)
+                logger.error(LazyLogMessage(log_data, verbose), extra={"fields": log_data})
                 
                 # Пробрасываем исключение дальше
                 raise
@@ -0,0 +1,49 @@
+"""
+Часы для планировщика и воспроизведения курсов.
+
+SystemClock — реальное время. VirtualClock — время, которое сдвигается
+только явно: ожидание интервала мгновенно переводит часы вперёд, поэтому
+месяц обновлений по расписанию проигрывается за секунды.
+"""
+
+import threading
+import time
+
+
+class SystemClock:
+    """Реальное время."""
+
+    def time(self) -> float:
+        """Текущее время (Unix, секунды)."""
+        return time.time()
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        """Ждёт seconds или установки event; возвращает event.is_set()."""
+        return event.wait(seconds)
+
+
+class VirtualClock:
+    """Виртуальное время, сдвигаемое вручную или ожиданием."""
+
+    def __init__(self, start: float = None):
+        self._now = time.time() if start is None else float(start)
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        """Текущее виртуальное время."""
+        return self._now
+
+    def advance(self, seconds: float) -> None:
+        """Сдвигает часы вперёд."""
+        with self._lock:
+            self._now += seconds
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        """Не ждёт: сразу сдвигает часы на seconds (если event не установлен)."""
+        if event.is_set():
+            return True
+        self.advance(seconds)
+        return event.is_set()
+
+
+system_clock = SystemClock()
@@ -0,0 +1,215 @@
+"""
+Лёгкие метрики: гистограммы задержек и счётчики.
+
+Время измеряется монотонным таймером (time.perf_counter) и раскладывается
+по фиксированным корзинам, поэтому запись значения — это bisect и
+инкремент без выделения памяти. Перцентили оцениваются по корзинам.
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from valutatrade_hub.infra.tracing import tracer
+
+# Границы корзин в секундах: от 50 мкс до 10 с
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя — "больше максимума"
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Добавляет одно значение (в секундах)."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def reset(self) -> None:
+        """Обнуляет значения, сохраняя объект (на него ссылаются декораторы timed)."""
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+
+    def percentile(self, q: float) -> float:
+        """Оценка перцентиля q (0..1) — верхняя граница корзины."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Сводка для вывода и экспорта."""
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets": list(self.buckets),
+            "bucket_counts": list(self.counts),
+        }
+
+
+class MetricsRegistry:
+    """Именованные гистограммы и счётчики процесса."""
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> Histogram:
+        """Возвращает (создавая при необходимости) гистограмму."""
+        hist = self._histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(name, Histogram())
+        return hist
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Добавляет значение в гистограмму name."""
+        self.histogram(name).observe(seconds)
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Увеличивает счётчик."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Все метрики одним словарём."""
+        return {
+            "histograms": {name: h.snapshot() for name, h in sorted(self._histograms.items())},
+            "counters": dict(sorted(self._counters.items())),
+        }
+
+    def reset(self) -> None:
+        """
+        Обнуляет все метрики.
+
+        Гистограммы обнуляются на месте, а не удаляются: timed() получает
+        объект гистограммы один раз при декорировании.
+        """
+        with self._lock:
+            for hist in self._histograms.values():
+                hist.reset()
+            self._counters.clear()
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """
+    Измеряет длительность блока и пишет её в гистограмму name.
+
+    При включённой трассировке блок также записывается как span.
+    """
+    if tracer.enabled:
+        with tracer.span(name):
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                registry.observe(name, time.perf_counter() - started)
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """
+    Декоратор: измеряет длительность каждого вызова функции.
+
+    При включённой трассировке каждый вызов также записывается как span.
+    """
+    def decorator(func: Callable) -> Callable:
+        hist = registry.histogram(name)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            if tracer.enabled:
+                with tracer.span(name):
+                    started = time.perf_counter()
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        hist.observe(time.perf_counter() - started)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - started)
+
+        return wrapper
+    return decorator
+
+
+class MetricsExporter:
+    """Периодически сохраняет снимок метрик в JSON-файл."""
+
+    def __init__(self, path: Path, interval_seconds: float = 60):
+        self.path = Path(path)
+        self.interval = interval_seconds
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запускает фоновый поток экспорта."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает поток и сохраняет последний снимок."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.export()
+
+    def export(self) -> None:
+        """Записывает текущий снимок метрик (атомарно)."""
+        snapshot = registry.snapshot()
+        snapshot["exported_at"] = time.time()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.path.with_suffix(".tmp")
+        with temp_file.open("w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+        temp_file.replace(self.path)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.export()
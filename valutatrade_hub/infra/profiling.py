@@ -0,0 +1,208 @@
+"""
+Профилирование по запросу.
+
+- CommandProfiler — cProfile вокруг одной команды CLI; результат
+  сохраняется как .pstats (для pstats/snakeviz) и .collapsed
+  (свёрнутые стеки для flamegraph.pl/speedscope).
+- SamplingProfiler — лёгкий сэмплирующий профайлер для фонового потока:
+  отдельный поток раз в interval секунд читает стек целевого потока
+  через sys._current_frames(), сам целевой поток не замедляется.
+- MemoryTracker — снимки tracemalloc до и после вызова, в лог пишется
+  прирост памяти по строкам кода.
+"""
+
+import cProfile
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+import valutatrade_hub.constants as const
+from valutatrade_hub.infra.settings import SettingsLoader
+
+logger = logging.getLogger("valutatrade")
+
+MAX_STACK_DEPTH = 64  # Ограничение глубины при восстановлении стеков из pstats
+MIN_WEIGHT_US = 1  # Ветви короче 1 мкс отбрасываются
+
+
+def _label(filename: str, lineno: int, name: str) -> str:
+    """Имя кадра для свёрнутого стека (без пробелов и ';')."""
+    location = Path(filename).name if filename != "~" else "builtin"
+    return f"{name}:{location}:{lineno}".replace(" ", "_").replace(";", ",")
+
+
+def _timestamp() -> str:
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def write_collapsed(stacks: Dict[str, float], path: Path) -> None:
+    """Сохраняет свёрнутые стеки: одна строка "кадр;кадр;... вес"."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for stack, weight in sorted(stacks.items()):
+            if weight >= 1:
+                f.write(f"{stack} {int(weight)}\n")
+
+
+def collapse_pstats(stats: pstats.Stats) -> Dict[str, float]:
+    """
+    Восстанавливает свёрнутые стеки из данных cProfile.
+
+    cProfile хранит только рёбра "вызывающий -> вызываемый", поэтому
+    собственное время функции делится между путями пропорционально
+    числу вызовов по каждому ребру (как в gprof2dot). Вес — микросекунды.
+    """
+    raw = stats.stats
+    callees: Dict[tuple, Dict[tuple, int]] = defaultdict(dict)
+    for func, (_cc, _nc, _tt, _ct, callers) in raw.items():
+        for caller, caller_stats in callers.items():
+            callees[caller][func] = caller_stats[1]
+
+    stacks: Dict[str, float] = defaultdict(float)
+
+    def walk(func: tuple, path: list, on_path: set, fraction: float) -> None:
+        _cc, _nc, tottime, _ct, _callers = raw[func]
+        own = tottime * fraction * 1e6
+        if own >= MIN_WEIGHT_US:
+            stacks[";".join(path)] += own
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, calls in callees.get(func, {}).items():
+            if callee in on_path or callee not in raw:
+                continue
+            total_calls = raw[callee][1] or 1
+            share = fraction * calls / total_calls
+            if raw[callee][3] * share * 1e6 < MIN_WEIGHT_US:
+                continue
+            on_path.add(callee)
+            walk(callee, path + [_label(*callee)], on_path, share)
+            on_path.discard(callee)
+
+    # Корни — вызовы, для которых вызывающий не записан (начало профиля)
+    for func, (_cc, nc, _tt, _ct, callers) in raw.items():
+        unattributed = nc - sum(caller_stats[1] for caller_stats in callers.values())
+        if nc and unattributed > 0:
+            walk(func, [_label(*func)], {func}, unattributed / nc)
+    return stacks
+
+
+class CommandProfiler:
+    """cProfile для одной команды с сохранением результата в файлы."""
+
+    def __init__(self, command: str, directory: Path = None):
+        self.command = command
+        self.directory = Path(directory or const.PROFILES_DIR)
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        """Начинает профилирование."""
+        self._profile.enable()
+
+    def stop(self) -> Path:
+        """Останавливает профилирование; возвращает путь к .pstats."""
+        self._profile.disable()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stem = self.directory / f"{_timestamp()}-{self.command}"
+        pstats_path = stem.with_suffix(".pstats")
+        self._profile.dump_stats(pstats_path)
+        write_collapsed(collapse_pstats(pstats.Stats(self._profile)), stem.with_suffix(".collapsed"))
+        return pstats_path
+
+
+class SamplingProfiler:
+    """Сэмплирующий профайлер одного потока."""
+
+    def __init__(self, name: str, interval_seconds: float = 0.01, directory: Path = None):
+        self.name = name
+        self.interval = interval_seconds
+        self.directory = Path(directory or const.PROFILES_DIR)
+        self.samples: Counter = Counter()
+        self._target: Optional[int] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_ident: int = None) -> None:
+        """Начинает сэмплирование потока (по умолчанию — текущего)."""
+        self._target = thread_ident or threading.get_ident()
+        self.samples = Counter()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Optional[Path]:
+        """Останавливает сэмплирование и сохраняет свёрнутые стеки."""
+        if self._thread is None:
+            return None
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        if not self.samples:
+            return None
+        path = self.directory / f"{_timestamp()}-{self.name}.collapsed"
+        write_collapsed(self.samples, path)
+        return path
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+
+class MemoryTracker:
+    """Снимки tracemalloc вокруг вызова: в лог пишется прирост памяти."""
+
+    def __init__(self, name: str, enabled: bool = False, top: int = 5):
+        self.name = name
+        self.enabled = enabled
+        self.top = top
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Контекст, внутри которого измеряется прирост памяти."""
+        if not self.enabled:
+            yield
+            return
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        # Пик считается только для этого вызова, а не с начала трассировки
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            growth = after.compare_to(before, "lineno")[:self.top]
+            if started:
+                # Трассировку, включённую этим вызовом, выключаем: она замедляет весь процесс
+                tracemalloc.stop()
+            logger.info(
+                f"Память {self.name}: текущая {current / 1024:.0f} КБ, пик {peak / 1024:.0f} КБ",
+                extra={"fields": {
+                    "memory_tracker": self.name,
+                    "current_bytes": current,
+                    "peak_bytes": peak,
+                    "top_growth": [str(stat) for stat in growth],
+                }},
+            )
+
+
+# Отслеживание памяти при загрузке истории (включается в config.json)
+history_memory = MemoryTracker(
+    "load_history",
+    enabled=bool(SettingsLoader().get("trace_history_memory", False)),
+)
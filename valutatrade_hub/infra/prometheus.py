@@ -0,0 +1,169 @@
+"""
+HTTP-эндпоинт /metrics в текстовом формате Prometheus.
+
+Гистограммы и счётчики берутся из реестра метрик (infra.metrics),
+при каждом запросе дополнительно вычисляются возраст rates.json и
+статистика кеша оценок. Сервер включается в config.json
+("metrics_http_enabled") и работает в фоновом потоке.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import valutatrade_hub.constants as const
+from valutatrade_hub.core.cache import valuation_cache
+from valutatrade_hub.infra.metrics import registry
+
+logger = logging.getLogger("valutatrade")
+
+PREFIX = "valutatrade"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Имена из реестра с меткой: api.<client>.<операция>, trades.<action>
+_LABELLED = (
+    (re.compile(r"^api\.(?P<value>[^.]+)\.(?P<name>.+)$"), "api_{name}", "client"),
+    (re.compile(r"^trades\.(?P<value>[^.]+)$"), "trades", "action"),
+)
+
+
+def _sanitize(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _split_name(name: str) -> Tuple[str, Dict[str, str]]:
+    """Имя метрики реестра -> (имя Prometheus, метки)."""
+    for pattern, template, label in _LABELLED:
+        match = pattern.match(name)
+        if match:
+            groups = match.groupdict()
+            metric = template.format(name=groups.get("name", ""))
+            return f"{PREFIX}_{_sanitize(metric)}", {label: groups["value"]}
+    return f"{PREFIX}_{_sanitize(name)}", {}
+
+
+def _escape(value) -> str:
+    """Экранирует значение метки (обратная косая черта, кавычки, перевод строки)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str], **extra) -> str:
+    merged = {**labels, **extra}
+    if not merged:
+        return ""
+    body = ",".join(f'{key}="{_escape(value)}"' for key, value in merged.items())
+    return "{" + body + "}"
+
+
+def rates_age_seconds() -> Optional[float]:
+    """Возраст курсов: время с last_refresh в rates.json (или с изменения файла)."""
+    try:
+        with const.RATES_FILE.open("r", encoding="utf-8") as f:
+            last_refresh = json.load(f).get("last_refresh")
+        if last_refresh:
+            return max(0.0, time.time() - datetime.fromisoformat(last_refresh).timestamp())
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        return max(0.0, time.time() - const.RATES_FILE.stat().st_mtime)
+    except OSError:
+        return None
+
+
+def render() -> str:
+    """Собирает все метрики в текстовом формате Prometheus."""
+    snapshot = registry.snapshot()
+    families: Dict[str, Tuple[str, List[str]]] = {}
+
+    def add(metric: str, kind: str, lines: List[str]) -> None:
+        families.setdefault(metric, (kind, []))[1].extend(lines)
+
+    for name, hist in snapshot["histograms"].items():
+        metric, labels = _split_name(name)
+        metric += "_seconds"
+        lines, cumulative = [], 0
+        for bound, count in zip(hist["buckets"], hist["bucket_counts"]):
+            cumulative += count
+            lines.append(f"{metric}_bucket{_labels(labels, le=repr(float(bound)))} {cumulative}")
+        lines.append(f"{metric}_bucket{_labels(labels, le='+Inf')} {hist['count']}")
+        lines.append(f"{metric}_sum{_labels(labels)} {hist['sum']!r}")
+        lines.append(f"{metric}_count{_labels(labels)} {hist['count']}")
+        add(metric, "histogram", lines)
+
+    for name, value in snapshot["counters"].items():
+        metric, labels = _split_name(name)
+        metric += "_total"
+        add(metric, "counter", [f"{metric}{_labels(labels)} {value:g}"])
+
+    # Значения, вычисляемые при запросе
+    age = rates_age_seconds()
+    if age is not None:
+        add(f"{PREFIX}_rates_age_seconds", "gauge", [f"{PREFIX}_rates_age_seconds {age:.3f}"])
+
+    cache = valuation_cache.stats()
+    add(f"{PREFIX}_valuation_cache_hits_total", "counter",
+        [f"{PREFIX}_valuation_cache_hits_total {cache['hits']}"])
+    add(f"{PREFIX}_valuation_cache_misses_total", "counter",
+        [f"{PREFIX}_valuation_cache_misses_total {cache['misses']}"])
+    add(f"{PREFIX}_valuation_cache_hit_ratio", "gauge",
+        [f"{PREFIX}_valuation_cache_hit_ratio {cache['hit_ratio']:.6f}"])
+    add(f"{PREFIX}_valuation_cache_entries", "gauge",
+        [f"{PREFIX}_valuation_cache_entries {cache['size']}"])
+
+    output = []
+    for metric, (kind, lines) in sorted(families.items()):
+        output.append(f"# TYPE {metric} {kind}")
+        output.extend(lines)
+    return "\n".join(output) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт /metrics; остальные пути — 404."""
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        # Запросы сборщика не пишутся в консоль
+        pass
+
+
+class MetricsServer:
+    """HTTP-сервер метрик в фоновом потоке."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9108):
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запускает сервер."""
+        if self._server is not None:
+            return
+        self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Метрики Prometheus: http://{self.host}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        """Останавливает сервер."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
@@ -0,0 +1,172 @@
+"""
+Трассировка операций (span'ы с идентификатором корреляции).
+
+Span — именованный интервал времени с родителем: команда CLI -> use case ->
+чтение/запись файлов -> запрос к API. Все span'ы одной команды имеют общий
+trace_id. Законченные span'ы пишутся в JSONL-файл (одна строка — один span),
+который конвертируется в формат Chrome trace viewer (chrome://tracing,
+Perfetto):
+
+    python -m valutatrade_hub.infra.tracing data/traces.jsonl trace.json
+
+Трассировка включается и выключается во время работы; в выключенном
+состоянии span() и finish_span() сводятся к проверке одного флага.
+"""
+
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+import valutatrade_hub.constants as const
+
+# Текущий span контекста выполнения (у каждого потока свой)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Открытый span."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attrs", "start_ns", "token")
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(8)
+        self.span_id = secrets.token_hex(4)
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.attrs = attrs
+        self.start_ns = time.time_ns()
+        self.token = None
+
+
+class Tracer:
+    """Запись span'ов в JSONL-файл."""
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[Path] = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def enable(self, path: Path = None) -> None:
+        """Включает трассировку (файл дописывается)."""
+        with self._lock:
+            self.path = Path(path or const.TRACE_FILE)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self._file is None:
+                self._file = self.path.open("a", encoding="utf-8")
+            self.enabled = True
+
+    def disable(self) -> None:
+        """Выключает трассировку и закрывает файл."""
+        with self._lock:
+            self.enabled = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def start_span(self, name: str, **attrs) -> Optional[Span]:
+        """Открывает span; при выключенной трассировке возвращает None."""
+        if not self.enabled:
+            return None
+        span = Span(name, _current_span.get(), attrs)
+        span.token = _current_span.set(span)
+        return span
+
+    def finish_span(self, span: Optional[Span], error: BaseException = None) -> None:
+        """Закрывает span и записывает его в файл."""
+        if span is None:
+            return
+        end_ns = time.time_ns()
+        try:
+            _current_span.reset(span.token)
+        except ValueError:
+            # span закрывается в другом контексте — просто восстанавливаем родителя
+            _current_span.set(None)
+        record = {
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "start_us": span.start_ns // 1000,
+            "duration_us": (end_ns - span.start_ns) // 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "status": "error" if error else "ok",
+        }
+        if span.attrs:
+            record["attrs"] = span.attrs
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Optional[Span]]:
+        """Контекст span'а."""
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            self.finish_span(span, error=e)
+            raise
+        self.finish_span(span)
+
+    def current_trace_id(self) -> Optional[str]:
+        """Идентификатор корреляции текущей операции."""
+        span = _current_span.get()
+        return span.trace_id if span else None
+
+
+tracer = Tracer()
+
+
+def to_chrome_trace(source: Path, target: Path) -> int:
+    """
+    Конвертирует JSONL со span'ами в Chrome trace (события "X").
+
+    Возвращает число событий.
+    """
+    events = []
+    with Path(source).open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            args = {"trace_id": record["trace_id"], "span_id": record["span_id"],
+                    "parent_id": record.get("parent_id"), "status": record.get("status")}
+            args.update(record.get("attrs", {}))
+            if "error" in record:
+                args["error"] = record["error"]
+            events.append({
+                "name": record["name"],
+                "cat": record["name"].split(".", 1)[0],
+                "ph": "X",
+                "ts": record["start_us"],
+                "dur": record["duration_us"],
+                "pid": record["pid"],
+                "tid": record["tid"],
+                "args": args,
+            })
+    with Path(target).open("w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(events)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Использование: python -m valutatrade_hub.infra.tracing <traces.jsonl> <trace.json>")
+        sys.exit(1)
+    count = to_chrome_trace(Path(sys.argv[1]), Path(sys.argv[2]))
+    print(f"Записано событий: {count}")
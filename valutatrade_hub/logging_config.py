@@ -1,58 +1,147 @@
 """
 Настройка логирования для ValutaTrade Hub.
+
+Логгер "valutatrade" пишет записи в очередь (QueueHandler), а запись в файл
+и консоль выполняет фоновый поток QueueListener. Поэтому форматирование
+и файловый ввод-вывод не выполняются в потоке сделки.
+В дочерних процессах (fork) потока QueueListener нет, поэтому там
+обработчики подключаются к логгеру напрямую.
+Формат actions.log задаёт "log_format" в config.json: "jsonl" (по умолчанию) —
+одна запись JSON на строку со структурированными полями из
+extra={"fields": {...}}; любое другое значение — строка формата
+logging.Formatter для текстового лога.
 """
 
+import atexit
+import json
 import logging
 import logging.handlers
+import os
+import queue
 from pathlib import Path
 from valutatrade_hub.infra.settings import SettingsLoader
 
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Форматирует запись как один JSON-объект в строке."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler без форматирования в вызывающем потоке.
+
+    Стандартный prepare() форматирует сообщение до постановки в очередь;
+    очередь здесь внутрипроцессная, поэтому запись передаётся как есть,
+    а сообщение собирается уже в потоке QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
 
 def setup_logging():
     """Настраивает логирование на основе конфигурации."""
+    global _listener
+
     settings = SettingsLoader()
     log_dir = Path(settings.get("log_dir", "./logs"))
     log_file = log_dir / "actions.log"
-    
+
     # Создаём директорию логов если нет
     log_dir.mkdir(exist_ok=True, parents=True)
-    
-    # Формат логов
-    log_format = settings.get("log_format", "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    # Формат времени
     date_format = "%Y-%m-%d %H:%M:%S"
-    
+
     # Основной логгер
     logger = logging.getLogger("valutatrade")
     logger.setLevel(logging.INFO)
-    
+
     # Убираем дублирование логов
     logger.propagate = False
-    
+
     # Если обработчиков ещё нет
     if not logger.handlers:
         # Файловый обработчик с ротацией
         file_handler = logging.handlers.RotatingFileHandler(
             filename=log_file,
-            maxBytes=10 * 1024 * 1024,  
+            maxBytes=10 * 1024 * 1024,
             backupCount=5,
             encoding='utf-8'
         )
         file_handler.setLevel(logging.INFO)
-        file_formatter = logging.Formatter(log_format, datefmt=date_format)
-        file_handler.setFormatter(file_formatter)
-        
+        log_format = settings.get("log_format", "jsonl")
+        if log_format == "jsonl":
+            file_handler.setFormatter(JsonLinesFormatter(datefmt=date_format))
+        else:
+            file_handler.setFormatter(logging.Formatter(log_format, datefmt=date_format))
+
         # Консольный обработчик
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.WARNING)  # Только ошибки в консоль
         console_formatter = logging.Formatter('%(levelname)s - %(message)s')
         console_handler.setFormatter(console_formatter)
-        
-        # Добавляем обработчики
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-    
+
+        # Очередь: логгер только кладёт записи, пишет фоновый поток
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(DeferredQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(stop_logging)
+
     return logger
 
 
+def _after_fork_in_child() -> None:
+    """
+    Переключает дочерний процесс на прямую запись.
+
+    Поток QueueListener не копируется при fork: записи из очереди никто
+    бы не читал. Рабочие процессы (пулы batch, sweep) пишут в те же
+    обработчики синхронно, как до введения очереди.
+    """
+    global _listener
+    if _listener is None:
+        return
+    handlers = _listener.handlers
+    _listener = None
+    logger = logging.getLogger("valutatrade")
+    for handler in list(logger.handlers):
+        if isinstance(handler, DeferredQueueHandler):
+            logger.removeHandler(handler)
+    for handler in handlers:
+        logger.addHandler(handler)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def stop_logging() -> None:
+    """Останавливает фоновый поток, дописав все записи из очереди."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 # Автоматическая настройка при импорте
-logger = setup_logging()
\ No newline at end of file
+logger = setup_logging()
@@ -8,6 +8,7 @@ from abc import ABC, abstractmethod # Для абстрактных классо
 from typing import Dict # Аннотации
 from valutatrade_hub.core.exceptions import ApiRequestError # Исключение
 from .config import ParserConfig # Конфигурация парсера
+from valutatrade_hub.infra.tracing import tracer # Трассировка запросов
 
 logger = logging.getLogger("valutatrade.parser")
 
@@ -52,7 +53,8 @@ class CoinGeckoClient(BaseApiClient):
             url = f"{self.config.COINGECKO_URL}?ids={ids_param}&vs_currencies=usd"
 
             logger.debug(f"Запрос к CoinGecko: {url}")
-            response = requests.get(url, timeout=self.config.REQUEST_TIMEOUT)
+            with tracer.span("http.get", client="CoinGecko", url=url):
+                response = requests.get(url, timeout=self.config.REQUEST_TIMEOUT)
             response.raise_for_status() 
 
             data = response.json()
@@ -92,7 +94,9 @@ class ExchangeRateApiClient(BaseApiClient):
             # Формируем полный URL из базового URL, API ключа и эндпоинта
             url = f"{self.config.EXCHANGERATE_API_URL}/{self.config.EXCHANGERATE_API_KEY}/latest/USD"
             logger.debug(f"Запрос к ExchangeRate-API: {url}")
-            response = requests.get(url, timeout=self.config.REQUEST_TIMEOUT)
+            # URL содержит API-ключ, поэтому в span пишется только клиент
+            with tracer.span("http.get", client="ExchangeRate-API"):
+                response = requests.get(url, timeout=self.config.REQUEST_TIMEOUT)
             response.raise_for_status()
             data = response.json()
 
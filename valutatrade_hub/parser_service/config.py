@@ -19,12 +19,17 @@ class ParserConfig:
     
     EXCHANGERATE_API_KEY: str = os.getenv("EXCHANGERATE_API_KEY", _DEBUG_API_KEY)
 
-    # URL-адреса запросов
+    # URL-адреса запросов (переменные окружения позволяют указать
+    # локальный stub-сервер: python -m valutatrade_hub.parser_service.stub_server)
     # URL для получения цен криптовалют
-    COINGECKO_URL: str = "https://api.coingecko.com/api/v3/simple/price"
+    COINGECKO_URL: str = field(default_factory=lambda: os.getenv(
+        "COINGECKO_URL", "https://api.coingecko.com/api/v3/simple/price"
+    ))
     
     # Базовый URL для ExchangeRate-API
-    EXCHANGERATE_API_URL: str = "https://v6.exchangerate-api.com/v6"
+    EXCHANGERATE_API_URL: str = field(default_factory=lambda: os.getenv(
+        "EXCHANGERATE_API_URL", "https://v6.exchangerate-api.com/v6"
+    ))
     
     # Списки отслеживаемых валют
     BASE_FIAT_CURRENCY: str = "USD"
@@ -39,11 +44,14 @@ class ParserConfig:
     })
 
     # Сетевые параметры
-    REQUEST_TIMEOUT: int = 10
+    REQUEST_TIMEOUT: float = field(default_factory=lambda: float(os.getenv("PARSER_REQUEST_TIMEOUT", "10")))
 
     # Пути к файлам
     RATES_FILE_PATH: str = "data/rates.json"
-    HISTORY_FILE_PATH: str = "data/exchange_rates.json"
+    HISTORY_FILE_PATH: str = "data/exchange_rates.json"  # Старый формат, только чтение
+    HISTORY_DIR_PATH: str = "data/history"
+    CANDLES_FILE_PATH: str = "data/candles.json"
+    STATS_FILE_PATH: str = "data/rate_stats.json"
 
     def __post_init__(self):
         """Проверка обязательных настроек после инициализации."""
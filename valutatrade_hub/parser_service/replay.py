@@ -0,0 +1,147 @@
+"""
+Запись и воспроизведение ответов провайдеров курсов.
+
+Кассета — файл JSON Lines, одна строка на вызов fetch_rates:
+    {"ts": 1718000000.0, "client": "coingecko", "rates": {"BTC_USD": 59337.2}}
+или, если вызов завершился ошибкой:
+    {"ts": 1718000060.0, "client": "coingecko", "error": "..."}
+
+RecordingClient оборачивает живой клиент и дописывает кассету.
+ReplayClient отдаёт кадры из кассеты или из истории курсов (каталог архива
+сегментов или старый exchange_rates.json): кадр
+выбирается по часам (реальным или VirtualClock) с ускорением speed,
+либо просто следующий при каждом вызове (sequential=True).
+"""
+
+import bisect
+import json
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.core.history_archive import HistoryArchive, ticks_from_records
+from valutatrade_hub.infra.clock import system_clock
+from .api_clients import BaseApiClient
+
+# Кадр: (время, курсы или None, ошибка или None)
+Frame = Tuple[float, Optional[Dict[str, float]], Optional[str]]
+
+
+class RecordingClient(BaseApiClient):
+    """Обёртка над клиентом, записывающая каждый ответ в кассету."""
+
+    def __init__(self, client: BaseApiClient, name: str, cassette: Path, clock=None):
+        self.client = client
+        self.name = name
+        self.cassette = Path(cassette)
+        self.clock = clock or system_clock
+        self._lock = threading.Lock()
+        self.cassette.parent.mkdir(parents=True, exist_ok=True)
+
+    def _write(self, entry: dict) -> None:
+        with self._lock, self.cassette.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def fetch_rates(self) -> Dict[str, float]:
+        """Вызывает живой клиент и записывает результат или ошибку."""
+        entry = {"ts": self.clock.time(), "client": self.name}
+        try:
+            rates = self.client.fetch_rates()
+        except ApiRequestError as e:
+            self._write({**entry, "error": str(e)})
+            raise
+        self._write({**entry, "rates": rates})
+        return rates
+
+
+class ReplayClient(BaseApiClient):
+    """Клиент, воспроизводящий записанные курсы."""
+
+    def __init__(self, frames: List[Frame], clock=None, speed: float = 1.0,
+                 sequential: bool = False, start_at: float = None):
+        if not frames:
+            raise ValueError("Нет кадров для воспроизведения")
+        self.frames = sorted(frames, key=lambda frame: frame[0])
+        self._times = [frame[0] for frame in self.frames]
+        self.clock = clock or system_clock
+        self.speed = speed
+        self.sequential = sequential
+        # Момент записи, соответствующий запуску воспроизведения
+        self.start_at = self._times[0] if start_at is None else start_at
+        self._started = self.clock.time()
+        self._position = 0
+
+    # Загрузка
+
+    @classmethod
+    def from_cassette(cls, path: Path, client: str = None, **kwargs) -> "ReplayClient":
+        """Кадры из кассеты (при заданном client — только его ответы)."""
+        frames: List[Frame] = []
+        with Path(path).open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if client is not None and entry.get("client") != client:
+                    continue
+                frames.append((float(entry["ts"]), entry.get("rates"), entry.get("error")))
+        return cls(frames, **kwargs)
+
+    @classmethod
+    def from_history(cls, path: Path, pairs: List[str] = None, start: float = None,
+                     end: float = None, **kwargs) -> "ReplayClient":
+        """
+        Кадры из истории: тики с одним временем — один кадр.
+
+        path — каталог архива сегментов (читается только диапазон [start, end))
+        или файл exchange_rates.json.
+        """
+        path = Path(path)
+        if path.is_dir():
+            ticks = HistoryArchive(path).iter_ticks(start, end)
+        else:
+            with path.open("r", encoding="utf-8") as f:
+                ticks = ticks_from_records(json.load(f))
+        wanted = set(pairs) if pairs else None
+        grouped: Dict[float, Dict[str, float]] = defaultdict(dict)
+        for ts, pair, rate, _source in ticks:
+            if wanted is not None and pair not in wanted:
+                continue
+            if (start is not None and ts < start) or (end is not None and ts >= end):
+                continue
+            grouped[ts][pair] = rate
+        return cls([(ts, rates, None) for ts, rates in grouped.items()], **kwargs)
+
+    # Воспроизведение
+
+    def rewind(self) -> None:
+        """Начинает воспроизведение заново с текущего момента часов."""
+        self._started = self.clock.time()
+        self._position = 0
+
+    @property
+    def exhausted(self) -> bool:
+        """Все кадры уже отданы."""
+        if self.sequential:
+            return self._position >= len(self.frames)
+        return self.recorded_time() >= self._times[-1]
+
+    def recorded_time(self) -> float:
+        """Время записи, соответствующее текущему моменту воспроизведения."""
+        return self.start_at + (self.clock.time() - self._started) * self.speed
+
+    def _current_frame(self) -> Frame:
+        if self.sequential:
+            index = min(self._position, len(self.frames) - 1)
+            self._position += 1
+            return self.frames[index]
+        index = bisect.bisect_right(self._times, self.recorded_time()) - 1
+        return self.frames[max(0, index)]
+
+    def fetch_rates(self) -> Dict[str, float]:
+        """Курсы кадра, соответствующего текущему времени."""
+        _ts, rates, error = self._current_frame()
+        if error is not None:
+            raise ApiRequestError(error)
+        return dict(rates or {})
@@ -8,6 +8,9 @@ from typing import Optional
 from .config import ParserConfig
 from .updater import RatesUpdater
 from .storage import RatesStorage
+from valutatrade_hub.infra.clock import system_clock
+from valutatrade_hub.infra.profiling import SamplingProfiler
+from valutatrade_hub.infra.settings import SettingsLoader
 
 logger = logging.getLogger("valutatrade.parser")
 
@@ -15,12 +18,42 @@ logger = logging.getLogger("valutatrade.parser")
 class RateUpdateScheduler:
     """Планировщик для автоматического обновления курсов."""
 
-    def __init__(self, config: ParserConfig, interval_minutes: int = 60):
+    def __init__(
+        self,
+        config: ParserConfig,
+        interval_minutes: float = 60,
+        profile: bool = None,
+        clock=None,
+        updater: RatesUpdater = None,
+    ):
         self.config = config
         self.interval = interval_minutes * 60  # в секундах
         self._stop_event = threading.Event()
         self._thread: Optional[threading.Thread] = None
 
+        # Часы: реальные или виртуальные (VirtualClock — для воспроизведения)
+        self.clock = clock or system_clock
+        # Готовый RatesUpdater (например, с ReplayClient); иначе создаётся в _run
+        self.updater = updater
+
+        # Сэмплирующий профайлер обновлений (по умолчанию — из config.json)
+        settings = SettingsLoader()
+
+        # Сжатие истории в свечи OHLC и окно хранения сырых тиков
+        self.compaction_interval = settings.get("history_compaction_interval_minutes", 60) * 60
+        self.retention_days = settings.get("history_retention_days", 30)
+        self.candle_retention_days = settings.get("candle_retention_days", {"1m": 30, "1h": 730, "1d": None})
+        self._last_compaction: Optional[float] = None
+
+        if profile is None:
+            profile = settings.get("profile_scheduler", False)
+        self._sampler: Optional[SamplingProfiler] = None
+        if profile:
+            self._sampler = SamplingProfiler(
+                "scheduler",
+                interval_seconds=settings.get("profile_sample_interval_ms", 10) / 1000,
+            )
+
     def start(self) -> None:
         """Запускает фоновый поток для периодического обновления."""
         if self._thread and self._thread.is_alive():
@@ -39,15 +72,31 @@ class RateUpdateScheduler:
             self._thread.join(timeout=5)
             logger.info("Планировщик остановлен.")
 
-    def _run(self) -> None:
+    def run_until(self, end_time: float) -> None:
+        """
+        Выполняет обновления в текущем потоке, пока часы не дойдут до end_time.
+
+        С VirtualClock интервалы не ждутся, и длинный период проигрывается
+        так быстро, как позволяют сами обновления.
+        """
+        self._stop_event.clear()
+        self._run(until=end_time)
+
+    def _make_updater(self) -> RatesUpdater:
+        if self.updater is not None:
+            return self.updater
+        return RatesUpdater(self.config, RatesStorage(self.config), clock=self.clock)
+
+    def _run(self, until: float = None) -> None:
         """Основной цикл планировщика."""
-        storage = RatesStorage(self.config)
-        updater = RatesUpdater(self.config, storage)
+        updater = self._make_updater()
 
         while not self._stop_event.is_set():
+            if until is not None and self.clock.time() >= until:
+                break
             try:
                 logger.info("Запланированное обновление курсов...")
-                result = updater.run_update()
+                result = self._profiled_update(updater)
                 if result["success"]:
                     logger.info(f"Обновлено {result['rates_count']} курсов.")
                 else:
@@ -55,10 +104,34 @@ class RateUpdateScheduler:
             except Exception as e:
                 logger.error(f"Ошибка в планировщике: {e}")
 
-            self._stop_event.wait(self.interval)
+            self._maybe_compact(updater.storage)
+            self.clock.wait(self._stop_event, self.interval)
+
+    def _profiled_update(self, updater: RatesUpdater) -> dict:
+        """Запускает обновление, при включённом профайлере — под сэмплированием."""
+        if self._sampler is None:
+            return updater.run_update()
+        self._sampler.start()
+        try:
+            return updater.run_update()
+        finally:
+            path = self._sampler.stop()
+            if path:
+                logger.info(f"Профиль обновления сохранён: {path}")
+
+    def _maybe_compact(self, storage: RatesStorage) -> None:
+        """Сжимает историю, если с прошлого сжатия прошёл compaction_interval."""
+        if self.compaction_interval <= 0:
+            return
+        now = self.clock.time()
+        if self._last_compaction is not None and now - self._last_compaction < self.compaction_interval:
+            return
+        self._last_compaction = now
+        try:
+            storage.compact_history(now, self.retention_days, self.candle_retention_days)
+        except Exception as e:
+            logger.error(f"Ошибка при сжатии истории: {e}")
 
     def run_once(self) -> None:
         """Выполняет одно обновление вне расписания."""
-        storage = RatesStorage(self.config)
-        updater = RatesUpdater(self.config, storage)
-        updater.run_update()
\ No newline at end of file
+        self._make_updater().run_update()
\ No newline at end of file
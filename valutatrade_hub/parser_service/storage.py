@@ -4,9 +4,17 @@
 
 import json
 import logging
-import uuid
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from valutatrade_hub.core import events
+from valutatrade_hub.core.candles import CandleStore
+from valutatrade_hub.core.history_archive import HistoryArchive, ticks_from_records
+from valutatrade_hub.core.locks import data_file_lock
+from valutatrade_hub.core.rate_history import RateHistory, parse_timestamp
+from valutatrade_hub.core.rate_stats import RateStats
+from valutatrade_hub.infra.metrics import registry, timed
+from valutatrade_hub.infra.settings import SettingsLoader
 from .config import ParserConfig
 
 logger = logging.getLogger("valutatrade.parser")
@@ -19,11 +27,24 @@ class RatesStorage:
         self.config = config
         self.rates_file = Path(config.RATES_FILE_PATH)
         self.history_file = Path(config.HISTORY_FILE_PATH)
+        self.archive = HistoryArchive(Path(config.HISTORY_DIR_PATH))
+        self.candles_file = Path(config.CANDLES_FILE_PATH)
+        self.stats_file = Path(config.STATS_FILE_PATH)
+
+        # Параметры скользящей статистики курсов
+        settings = SettingsLoader()
+        self.stats_window = settings.get("rate_stats_window", 24)
+        self.stats_ema_span = settings.get("rate_stats_ema_span", 12)
+        self.volatility_alert = settings.get("volatility_alert_threshold")
+
+        # Watermark свечей: (mtime файла свечей, время последнего свёрнутого тика)
+        self._watermark: Optional[tuple] = None
 
         # Создаем директории, если их нет
         self.rates_file.parent.mkdir(parents=True, exist_ok=True)
         self.history_file.parent.mkdir(parents=True, exist_ok=True)
 
+    @timed("storage.save_current_rates")
     def save_current_rates(self, data: Dict[str, Any]) -> None:
         """
         Сохраняет текущие курсы в rates.json (перезаписывает файл).
@@ -38,53 +59,160 @@ class RatesStorage:
 
             temp_file.replace(self.rates_file)
             logger.info(f"Текущие курсы сохранены в {self.rates_file}")
+            events.emit(events.RATES_UPDATED, pairs=data.get("pairs", {}))
         except Exception as e:
             logger.error(f"Ошибка при сохранении текущих курсов: {e}")
             raise
 
+    @timed("storage.save_to_history")
     def save_to_history(self, rates: Dict[str, float], timestamp: str) -> None:
         """
-        Добавляет записи в исторический журнал exchange_rates.json.
+        Дописывает тики в архив истории (сегмент текущего месяца).
 
         Args:
             rates: Словарь с курсами валютных пар.
             timestamp: Временная метка обновления.
         """
         try:
-            # Читаем существующую историю
-            history = self._load_history()
-
-            for pair, rate in rates.items():
-                # Формируем уникальный ID
-                from_curr, to_curr = pair.split("_")
-                record_id = f"{from_curr}_{to_curr}_{timestamp.replace(':', '-').replace('+', '-')}"
-
-                # Создаем запись
-                record = {
-                    "id": record_id,
-                    "from_currency": from_curr,
-                    "to_currency": to_curr,
-                    "rate": rate,
-                    "timestamp": timestamp,
-                    "source": self._get_source_for_pair(pair),
-                    "meta": {
-                        "record_id": str(uuid.uuid4())[:8],
-                        "status_code": 200,
-                    }
-                }
-
-                history.append(record)
-
-            # Сохраняем обновленную историю
-            self._save_history(history)
+            with data_file_lock(self.archive.directory):
+                self._append_history(rates, timestamp)
             logger.debug(f"В историю добавлено {len(rates)} записей")
 
         except Exception as e:
             logger.error(f"Ошибка при сохранении в историю: {e}")
             raise
 
+    def _append_history(self, rates: Dict[str, float], timestamp: str) -> None:
+        """Дописывает тики в архив (вызывается под блокировкой истории)."""
+        # Статистика обновляется инкрементально; без файла состояния — строится по истории
+        stats = RateStats.load(self.stats_file, self.stats_window, self.stats_ema_span)
+        if stats is None:
+            stats = RateStats.from_history(
+                RateHistory.load(self.history_file, archive_dir=self.archive.directory),
+                self.stats_window,
+                self.stats_ema_span,
+            )
+
+        ts = parse_timestamp(timestamp)
+        watermark = self._candle_watermark()
+        if ts <= watermark:
+            # Свечи до watermark уже построены и не пересчитываются: поздний тик
+            # не попал бы в них и пропал бы после окна retention
+            registry.inc("rates.late_ticks", len(rates))
+            logger.warning(
+                f"Тики на {timestamp} отклонены: история уже свёрнута в свечи "
+                f"до {datetime.fromtimestamp(watermark, timezone.utc).isoformat()}"
+            )
+            return
+
+        self.archive.append(
+            (ts, pair, rate, self._get_source_for_pair(pair)) for pair, rate in rates.items()
+        )
+
+        stats.update(rates, ts)
+        self._check_volatility(stats, rates)
+        stats.save(self.stats_file)
+
+    def _candle_watermark(self) -> float:
+        """Время последнего свёрнутого в свечи тика (файл свечей перечитывается при изменении)."""
+        try:
+            mtime = self.candles_file.stat().st_mtime_ns
+        except OSError:
+            return 0.0
+        if self._watermark is None or self._watermark[0] != mtime:
+            self._watermark = (mtime, CandleStore.load(self.candles_file).watermark)
+        return self._watermark[1]
+
+    def _check_volatility(self, stats: RateStats, rates: Dict[str, float]) -> None:
+        """
+        Предупреждает о парах, волатильность которых пересекла порог.
+
+        Состояние предупреждения хранится в статистике пары: пока пара выше
+        порога, предупреждение не повторяется на каждом обновлении.
+        """
+        if not self.volatility_alert:
+            return
+        for pair in rates:
+            summary = stats.get(pair)
+            above = bool(summary) and summary["volatility"] > self.volatility_alert
+            pair_stats = stats.pairs[pair]
+            if above == pair_stats.alerting:
+                continue
+            pair_stats.alerting = above
+            if above:
+                registry.inc("rates.volatility_alerts")
+                logger.warning(
+                    f"Высокая волатильность {pair}: {summary['volatility']:.2%} "
+                    f"за последние {self.stats_window} тиков"
+                )
+            else:
+                logger.info(f"Волатильность {pair} вернулась ниже порога {self.volatility_alert:.2%}")
+
+    @timed("storage.compact_history")
+    def compact_history(
+        self,
+        now: float,
+        retention_days: float,
+        candle_retention_days: Dict[str, Optional[float]] = None,
+    ) -> Dict[str, int]:
+        """
+        Сворачивает новые тики в свечи OHLC и удаляет сырые тики старше окна.
+
+        Свечи сохраняются раньше, чем урезается история: при сбое между
+        записями тики не теряются (повторное сжатие пропустит их по watermark).
+        Тики не новее watermark в историю не принимаются (см. _append_history),
+        поэтому свёртка только новых тиков ничего не теряет.
+
+        Args:
+            now: Текущее время (Unix, секунды).
+            retention_days: Сколько дней хранить сырые тики.
+            candle_retention_days: Окно хранения свечей по интервалам.
+
+        Returns:
+            Словарь со счётчиками: свёрнуто тиков, удалено тиков и свечей.
+        """
+        with data_file_lock(self.archive.directory):
+            store = CandleStore.load(self.candles_file)
+
+            # Старый exchange_rates.json только читается и постепенно урезается по retention
+            history = self._load_history()
+            legacy = [(tick, record) for record in history for tick in ticks_from_records([record])]
+
+            fresh = [
+                (ts, pair, rate)
+                for ts, pair, rate, _source in self.archive.iter_ticks(start=store.watermark)
+                if ts > store.watermark
+            ]
+            fresh += [(ts, pair, rate) for (ts, pair, rate, _source), _record in legacy if ts > store.watermark]
+            fresh.sort()
+            for ts, pair, rate in fresh:
+                store.add_tick(pair, ts, rate)
+            if fresh:
+                store.watermark = fresh[-1][0]
+            candles_removed = store.prune(now, candle_retention_days or {})
+            store.save()
+
+            cutoff = now - retention_days * 86400
+            ticks_removed = self.archive.drop_before(cutoff)
+            kept = [record for (ts, *_rest), record in legacy if ts >= cutoff]
+            if len(kept) < len(history):
+                self._save_history(kept)
+                ticks_removed += len(history) - len(kept)
+
+        stats = {
+            "ticks_compacted": len(fresh),
+            "ticks_removed": ticks_removed,
+            "candles_removed": candles_removed,
+        }
+        logger.info(
+            f"Сжатие истории: свёрнуто {stats['ticks_compacted']} тиков, "
+            f"удалено {stats['ticks_removed']} тиков и {stats['candles_removed']} свечей"
+        )
+        return stats
+
+    @timed("storage.load_history")
     def _load_history(self) -> List[Dict[str, Any]]:
-        """Загружает исторические данные из файла."""
+        """Загружает записи старого exchange_rates.json (если он ещё есть)."""
         if not self.history_file.exists():
             return []
 
@@ -93,11 +221,12 @@ class RatesStorage:
                 data = json.load(f)
                 return data if isinstance(data, list) else []
         except json.JSONDecodeError:
-            logger.warning(f"Файл {self.history_file} поврежден. Будет создан новый.")
+            logger.warning(f"Файл {self.history_file} поврежден и будет пропущен.")
             return []
 
+    @timed("storage.save_history")
     def _save_history(self, data: List[Dict[str, Any]]) -> None:
-        """Сохраняет исторические данные в файл."""
+        """Перезаписывает старый exchange_rates.json (только при урезании по retention)."""
         temp_file = self.history_file.with_suffix(".tmp")
         with open(temp_file, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
@@ -115,6 +244,7 @@ class RatesStorage:
             return "ExchangeRate-API"
         return "unknown"
 
+    @timed("storage.load_current_rates")
     def load_current_rates(self) -> Dict[str, Any]:
         """Загружает текущие курсы из rates.json."""
         if not self.rates_file.exists():
@@ -0,0 +1,271 @@
+"""
+Локальный stub-сервер провайдеров курсов.
+
+Эмулирует форматы ответов CoinGecko (/api/v3/simple/price) и
+ExchangeRate-API (/v6/<key>/latest/USD) и умеет вносить сбои: задержку
+с заданным распределением, ошибки 500, ответы 429 с Retry-After и
+медленную отдачу тела. Генератор случайных чисел детерминирован (--seed).
+
+Запуск:
+    python -m valutatrade_hub.parser_service.stub_server --port 8765 \\
+        --coins 5000 --latency-ms 80 --latency-dist exponential \\
+        --error-rate 0.02 --rate-limit-rate 0.05 --slow-body-ms 200
+
+Клиенты направляются на сервер переменными окружения:
+    COINGECKO_URL=http://127.0.0.1:8765/api/v3/simple/price
+    EXCHANGERATE_API_URL=http://127.0.0.1:8765/v6
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+# Известные монеты (id CoinGecko -> цена в USD); остальные генерируются как coin-<n>
+KNOWN_COINS: Dict[str, float] = {
+    "bitcoin": 60000.0,
+    "ethereum": 3000.0,
+    "solana": 150.0,
+    "ripple": 0.5,
+    "cardano": 0.4,
+    "dogecoin": 0.12,
+}
+
+# Фиатные валюты: единиц за 1 USD
+KNOWN_FIAT: Dict[str, float] = {
+    "USD": 1.0, "EUR": 0.926, "GBP": 0.787, "RUB": 92.5, "JPY": 151.2,
+    "CNY": 7.23, "CHF": 0.905, "CAD": 1.36, "AUD": 1.52, "INR": 83.4,
+    "BRL": 5.05, "KZT": 447.0, "TRY": 32.1, "SEK": 10.6, "PLN": 3.97,
+}
+
+
+@dataclass
+class StubOptions:
+    """Параметры вселенной активов и внесения сбоев."""
+
+    coins: int = 100  # Размер вселенной монет (включая KNOWN_COINS)
+    latency_ms: float = 0.0  # Средняя задержка ответа
+    latency_dist: str = "fixed"  # fixed | uniform | exponential
+    error_rate: float = 0.0  # Доля ответов 500
+    rate_limit_rate: float = 0.0  # Доля ответов 429
+    retry_after: int = 1  # Значение заголовка Retry-After для 429
+    slow_body_ms: float = 0.0  # Время отдачи тела по частям
+    api_key: Optional[str] = None  # Если задан — другие ключи получают invalid-key
+    seed: int = 0
+
+
+class StubProvider:
+    """Состояние сервера: цены и детерминированный генератор сбоев."""
+
+    def __init__(self, options: StubOptions):
+        self.options = options
+        self._rng = random.Random(options.seed)
+        self._lock = threading.Lock()
+        self.coins: Dict[str, float] = dict(KNOWN_COINS)
+        for n in range(max(0, options.coins - len(KNOWN_COINS))):
+            self.coins[f"coin-{n}"] = round(self._rng.lognormvariate(0, 2), 6)
+        self.fiat: Dict[str, float] = dict(KNOWN_FIAT)
+        self.requests = 0
+
+    def _draw(self) -> float:
+        with self._lock:
+            self.requests += 1
+            return self._rng.random()
+
+    def latency(self) -> float:
+        """Задержка очередного ответа в секундах."""
+        mean = self.options.latency_ms / 1000
+        if mean <= 0:
+            return 0.0
+        with self._lock:
+            if self.options.latency_dist == "uniform":
+                return self._rng.uniform(0, 2 * mean)
+            if self.options.latency_dist == "exponential":
+                return self._rng.expovariate(1 / mean)
+        return mean
+
+    def fault(self) -> Optional[int]:
+        """Код ошибки для очередного запроса (или None)."""
+        draw = self._draw()
+        if draw < self.options.rate_limit_rate:
+            return 429
+        if draw < self.options.rate_limit_rate + self.options.error_rate:
+            return 500
+        return None
+
+    def _jitter(self, price: float) -> float:
+        with self._lock:
+            return price * (1 + self._rng.gauss(0, 0.001))
+
+    def simple_price(self, ids: str, vs_currencies: str) -> dict:
+        """Ответ в формате CoinGecko /simple/price."""
+        currencies = [c.strip().lower() for c in vs_currencies.split(",") if c.strip()]
+        result = {}
+        for coin_id in (i.strip() for i in ids.split(",")):
+            if coin_id in self.coins:
+                usd = self._jitter(self.coins[coin_id])
+                prices = {}
+                for currency in currencies:
+                    per_usd = self.fiat.get(currency.upper())
+                    if per_usd is not None:
+                        prices[currency] = usd * per_usd
+                result[coin_id] = prices
+        return result
+
+    def latest(self, key: str, base: str) -> dict:
+        """Ответ в формате ExchangeRate-API /latest/<base>."""
+        if self.options.api_key is not None and key != self.options.api_key:
+            return {"result": "error", "error-type": "invalid-key"}
+        base_per_usd = self.fiat.get(base.upper())
+        if base_per_usd is None:
+            return {"result": "error", "error-type": "unsupported-code"}
+        rates = {code: self._jitter(per_usd / base_per_usd) for code, per_usd in self.fiat.items()}
+        rates[base.upper()] = 1.0
+        return {
+            "result": "success",
+            "base_code": base.upper(),
+            "time_last_update_unix": int(time.time()),
+            "conversion_rates": rates,
+        }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Маршрутизация запросов к StubProvider."""
+
+    provider: StubProvider = None  # Устанавливается в StubServer
+
+    def do_GET(self) -> None:
+        provider = self.provider
+        delay = provider.latency()
+        if delay:
+            time.sleep(delay)
+
+        status = provider.fault()
+        if status == 429:
+            self._send_json(429, {"status": {"error_code": 429, "error_message": "rate limited"}},
+                            headers={"Retry-After": str(provider.options.retry_after)})
+            return
+        if status == 500:
+            self._send_json(500, {"error": "internal error"})
+            return
+
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        if url.path.rstrip("/").endswith("/simple/price"):
+            query = parse_qs(url.query)
+            body = provider.simple_price(
+                query.get("ids", [""])[0], query.get("vs_currencies", ["usd"])[0]
+            )
+            self._send_json(200, body, slow=True)
+        elif len(parts) == 4 and parts[0] == "v6" and parts[2] == "latest":
+            self._send_json(200, provider.latest(parts[1], parts[3]), slow=True)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _send_json(self, status: int, data: dict, headers: Dict[str, str] = None, slow: bool = False) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        slow_seconds = self.provider.options.slow_body_ms / 1000 if slow else 0
+        if slow_seconds <= 0:
+            self.wfile.write(body)
+            return
+        # Медленное тело: 10 частей с равными паузами
+        chunk = max(1, len(body) // 10)
+        for offset in range(0, len(body), chunk):
+            self.wfile.write(body[offset:offset + chunk])
+            self.wfile.flush()
+            time.sleep(slow_seconds / 10)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class StubServer:
+    """Stub-сервер в фоновом потоке (для бенчмарков внутри процесса)."""
+
+    def __init__(self, options: StubOptions = None, host: str = "127.0.0.1", port: int = 0):
+        self.provider = StubProvider(options or StubOptions())
+        handler = type("StubHandler", (_StubHandler,), {"provider": self.provider})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def coingecko_url(self) -> str:
+        """URL для COINGECKO_URL."""
+        return f"http://{self.host}:{self.port}/api/v3/simple/price"
+
+    @property
+    def exchangerate_url(self) -> str:
+        """URL для EXCHANGERATE_API_URL."""
+        return f"http://{self.host}:{self.port}/v6"
+
+    def start(self) -> "StubServer":
+        """Запускает сервер."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Обслуживает запросы в текущем потоке (до Ctrl+C)."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        """Останавливает сервер."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stub-сервер CoinGecko и ExchangeRate-API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--coins", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "exponential"], default="fixed")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--slow-body-ms", type=float, default=0.0)
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    options = StubOptions(
+        coins=args.coins, latency_ms=args.latency_ms, latency_dist=args.latency_dist,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after, slow_body_ms=args.slow_body_ms,
+        api_key=args.api_key, seed=args.seed,
+    )
+    server = StubServer(options, host=args.host, port=args.port)
+    print(f"Stub-сервер: http://{server.host}:{server.port}")
+    print(f"   COINGECKO_URL={server.coingecko_url}")
+    print(f"   EXCHANGERATE_API_URL={server.exchangerate_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,12 @@ from typing import Dict, Any # Для логирование
 from datetime import datetime, timezone # Для времени
 from .config import ParserConfig # Конфигурация парсера
 from .api_clients import CoinGeckoClient, ExchangeRateApiClient # Классы API клиентов
+from .replay import RecordingClient # Запись ответов провайдеров в кассету
 from .storage import RatesStorage # Работа с JSON
 from valutatrade_hub.core.exceptions import ApiRequestError # Исключения
+from valutatrade_hub.infra.metrics import registry, timed, timer # Метрики задержек
+from valutatrade_hub.infra.clock import system_clock # Часы (реальные или виртуальные)
+from valutatrade_hub.infra.settings import SettingsLoader # Настройки (режим записи)
 
 logger = logging.getLogger("valutatrade.parser")
 
@@ -16,14 +20,29 @@ logger = logging.getLogger("valutatrade.parser")
 class RatesUpdater:
     """Координирует процесс обновления курсов."""
 
-    def __init__(self, config: ParserConfig, storage: RatesStorage):
+    def __init__(self, config: ParserConfig, storage: RatesStorage, clock=None):
         self.config = config
         self.storage = storage
+        self.clock = clock or system_clock
         self.clients = {
             "coingecko": CoinGeckoClient(config),
             "exchangerate": ExchangeRateApiClient(config),
         }
+        # Режим записи: "rates_record_file" в config.json (или update-rates --record)
+        record_file = SettingsLoader().get("rates_record_file")
+        if record_file:
+            self.record(record_file)
 
+    def record(self, cassette) -> None:
+        """Оборачивает клиентов в RecordingClient: каждый ответ дописывается в кассету."""
+        self.clients = {
+            name: client if isinstance(client, RecordingClient)
+            else RecordingClient(client, name, cassette, clock=self.clock)
+            for name, client in self.clients.items()
+        }
+        logger.info(f"Ответы провайдеров записываются в {cassette}")
+
+    @timed("updater.run_update")
     def run_update(self, source: str = None) -> Dict[str, Any]:
         """
         Запускает обновление курсов.
@@ -44,7 +63,7 @@ class RatesUpdater:
 
         all_rates = {}
         errors = []
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = datetime.fromtimestamp(self.clock.time(), timezone.utc).isoformat()
 
         # Определяем, какие клиенты нужно опросить
         clients_to_run = {}
@@ -61,17 +80,20 @@ class RatesUpdater:
         for client_name, client in clients_to_run.items():
             try:
                 logger.info(f"Получение данных от {client_name}...")
-                rates = client.fetch_rates()
+                with timer(f"api.{client_name}.fetch_rates"):
+                    rates = client.fetch_rates()
                 all_rates.update(rates)
                 logger.info(f"{client_name}: OK ({len(rates)} курсов)")
             except ApiRequestError as e:
                 error_msg = f"Ошибка при получении данных от {client_name}: {e}"
                 logger.error(error_msg)
                 errors.append(error_msg)
+                registry.inc(f"api.{client_name}.errors")
                 # Продолжаем работу с другими источниками
 
         if not all_rates and errors:
             # Если ни один источник не сработал
+            registry.inc("updater.runs_failed")
             raise ApiRequestError(f"Все источники данных недоступны. Ошибки: {errors}")
     
         # Формируем итоговый объект для сохранения
@@ -123,9 +145,12 @@ class RatesUpdater:
         except Exception as e:
             error_msg = f"Ошибка при сохранении данных: {e}"
             logger.error(error_msg)
+            registry.inc("updater.runs_failed")
             raise ApiRequestError(error_msg)
 
         logger.info(f"Обновление завершено. Сохранено {len(all_pairs_data)} курсов.")
+        registry.inc("updater.runs")
+        registry.inc("updater.rates_saved", len(all_pairs_data))
         return {
         "success": True,
         "rates_count": len(all_pairs_data),